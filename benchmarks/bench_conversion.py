@@ -0,0 +1,287 @@
+"""
+Benchmark of the column-vectorized IMIPROJECTS.csv conversion against the former per-row loop
+
+    python benchmarks/bench_conversion.py [--scales 1 100 1000] [--repeat 3]
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from bench_utils import ROOT, load_script, best_of
+
+parse_ul_data = load_script("parse-ul-data.py")
+DatsObj = parse_ul_data.DatsObj
+
+
+def build_imi_projects_rowwise(df):
+    """
+    The conversion loop as it was in the __main__ block of parse-ul-data.py, kept as the baseline
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a list of DatsObj
+    """
+    imi_projects = []
+    for i in range(0, len(df)):
+
+        if df["StartDate"][i] != "-":
+            start_date = DatsObj("Date", [("date", df["StartDate"][i]),
+                                            ("type", DatsObj("Annotation", [("value", "start date"),
+                                                                            ("valueIRI", "")]))
+                                            ])
+        else:
+            start_date = DatsObj("Date", [("date", "None"),
+                                            ("type", DatsObj("Annotation", [("value", "start date"),
+                                                                            ("valueIRI", "")]))
+                                            ])
+
+        # print(start_date)
+
+        if df["EndDate"][i] != "-":
+            end_date = DatsObj("Date", [("date", df["EndDate"][i]),
+                                            ("type", DatsObj("Annotation", [("value", "end date"),
+                                                                            ("valueIRI", "")]))
+                                            ])
+        else:
+            end_date = DatsObj("Date", [("date", "None"),
+                                            ("type", DatsObj("Annotation", [("value", "end date"),
+                                                                            ("valueIRI", "")]))
+                                            ])
+
+        d_kwds = []
+        if df["Keywords"][i] != "" and not isinstance(df["Keywords"][i], float):
+            kwds = df["Keywords"][i].split(":")
+            for kwd in kwds:
+                d_kwd = DatsObj("Annotation", [("value", kwd), ("valueIRI", "")])
+                d_kwds.append(d_kwd)
+
+        d_grant = ""
+        if df["GrantAgreementNo"][i] != "":
+            d_grant = DatsObj("Grant", [
+                ("name", "IMI grant #:" + str(df["GrantAgreementNo"][i])),
+                ("extraProperties", [])
+                 ])
+
+        grant_extra_props = []
+        if df["EFPIAFunding"][i] != "":
+            efpia_funds = DatsObj("CategoryValuesPair", [("category", "EFPIA funding"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", str(df["EFPIAFunding"][i])),
+                                                                           ("valueIRI", "")])])])
+            grant_extra_props.append(efpia_funds)
+
+        if df["IMIFunding"][i] != "":
+            imi_funds = DatsObj("CategoryValuesPair", [("category", "IMI funding"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", str(df["IMIFunding"][i])),
+                                                                           ("valueIRI", "")])])])
+            grant_extra_props.append(imi_funds)
+
+        if df["OtherFunding"][i] != "":
+            other_funds = DatsObj("CategoryValuesPair", [("category", "Other funding"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", str(df["OtherFunding"][i])),
+                                                                           ("valueIRI", "")])])])
+            grant_extra_props.append(other_funds)
+
+        if df["TotalCost"][i] != "":
+            other_funds = DatsObj("CategoryValuesPair", [("category", "Total Cost"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", str(df["TotalCost"][i])),
+                                                                           ("valueIRI", "")])])])
+            grant_extra_props.append(other_funds)
+
+        d_orgs = []
+
+        # DEALING WITH EFPIA
+        if not isinstance(df["EFPIAcompanies"][i], float):
+
+            role = DatsObj("Annotation", [("value", "EFPIA partner"),
+                                          ("valueIRI", "")])
+
+            efpia_orgs = df["EFPIAcompanies"][i].split(':')
+
+            for org in efpia_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        # DEALING WITH UNIVERSITIES
+        if not isinstance(df["Univerisities"][i], float):
+
+            role = DatsObj("Annotation", [("value", "University"),
+                                          ("valueIRI", "")])
+
+            uni_orgs = df["Univerisities"][i].split(':')
+
+            for org in uni_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        # DEALING WITH SMES
+        if not isinstance(df["SMEs"][i], float):
+
+            role = DatsObj("Annotation", [("value", "SME"),
+                                          ("valueIRI", "")])
+
+            sme_orgs = df["SMEs"][i].split(':')
+
+            for org in sme_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        # DEALING WITH PATIENT ORGs
+        if not isinstance(df["PatientOrganisations"][i], float):
+
+            role = DatsObj("Annotation", [("value", "Patient Organisations"),
+                                          ("valueIRI", "")])
+
+            patient_orgs = df["PatientOrganisations"][i].split(':')
+
+            for org in patient_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        # DEALING WITH PATIENT ORGs
+        if not isinstance(df["ThirdParties"][i], float):
+
+            role = DatsObj("Annotation", [("value", "Third Parties"),
+                                          ("valueIRI", "")])
+
+            thirdp_orgs = df["ThirdParties"][i].split(':')
+
+            for org in thirdp_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        # DEALING WITH PARTNERS
+        if not isinstance(df["Partners"][i], float):
+
+            role = DatsObj("Annotation", [("value", "Partners"),
+                                          ("valueIRI", "")])
+
+            partners_orgs = df["Partners"][i].split(':')
+
+            for org in partners_orgs:
+                d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
+                d_orgs.append(d_org)
+
+        if df["Project Coordinator Name"][i] != "" and df["Project Contact  email"][i] != "":
+
+            person_bits = df["Project Coordinator Name"][i].split(",")
+            d_person = DatsObj("Person",[
+                    ("fullName", person_bits[0]),
+                    ("email", df["Project Contact  email"][i]),
+                    ("affiliations",[person_bits[1]])
+                        ])
+
+        dataset_extra_props = []
+
+        if df["IMIProgram"][i] != "":
+            imi_prog = DatsObj("CategoryValuesPair", [("category", "IMI Program"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["IMIProgram"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(imi_prog)
+
+        if df["IMICall"][i] != "":
+            imi_call = DatsObj("CategoryValuesPair", [("category", "IMI Call"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", str(df["IMICall"][i])),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(imi_call)
+
+        if df["Project Status Group (based on End Date)"][i] != "":
+            imi_status = DatsObj("CategoryValuesPair", [("category", "Project Status Group"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["Project Status Group (based on End Date)"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(imi_status)
+
+        if df["TypeOfAction"][i] != "":
+            imi_toa = DatsObj("CategoryValuesPair", [("category", "Type of Action"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["TypeOfAction"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(imi_toa)
+
+        if df["FAIRification"][i] != "":
+            fairified = DatsObj("CategoryValuesPair", [("category", "FAIRification"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["FAIRification"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(fairified)
+
+        if df["FAIRplus: responsible public partner"][i] != "":
+            fairplus_resp = DatsObj("CategoryValuesPair", [("category", "FAIRplus: responsible public partner"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["FAIRplus: responsible public partner"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(fairplus_resp)
+
+        if df["FAIRplus: responsible EFPIA partner"][i] != "":
+            fairplus_efpia_resp = DatsObj("CategoryValuesPair", [("category", "FAIRplus: responsible EFPIA partner"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["FAIRplus: responsible EFPIA partner"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(fairplus_efpia_resp)
+
+        if df["EFPIA project lead"][i] != "":
+            fairplus_efpia_resp = DatsObj("CategoryValuesPair", [("category", "EFPIA project lead"),
+                                                      ("categoryIRI", ""),
+                                                      ("values", [DatsObj("Annotation",
+                                                                          [("value", df["EFPIA project lead"][i]),
+                                                                           ("valueIRI", "")])])])
+            dataset_extra_props.append(fairplus_efpia_resp)
+
+        imi_project = DatsObj("Dataset", [
+            ("identifier", DatsObj("Identifier", [("identifier", "IMI-Cat#" + str(i))])),
+            ("title", df["Project Acronym"][i]),
+            ("description", df["ShortDescription"][i] + ". SUMMARY: " + df["Summary"][i]),
+            ("distributions", []),
+            ("creators", [d_orgs, d_person]),
+            ("keywords", d_kwds),
+            ("dates", [start_date,end_date]),
+            ("types", []),
+            ("producedBy", []),
+            ("storedIn", ""),
+            ("isAbout", [d_kwds]),
+            ("version", ""),
+            ("isAbout", []),
+            ("extraProperties", [dataset_extra_props])
+           ])
+
+        imi_projects.append(imi_project)
+
+    return imi_projects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "IMIPROJECTS.csv"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+
+    print("%8s %8s %12s %12s %8s" % ("scale", "rows", "rowwise (s)", "columns (s)", "speedup"))
+    for scale in args.scales:
+        scaled = pd.concat([df] * scale, ignore_index=True)
+        rowwise = best_of(lambda: build_imi_projects_rowwise(scaled), args.repeat)
+        columns = best_of(lambda: list(parse_ul_data.build_imi_projects(scaled)), args.repeat)
+        print("%8d %8d %12.3f %12.3f %7.1fx" % (scale, len(scaled), rowwise, columns, rowwise / columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Size and consumer-side read time of the IMI catalogue in each output encoding
+
+    python benchmarks/bench_formats.py [--scale 10] [--repeat 3]
+
+zstd and MessagePack are skipped when the zstandard or msgpack packages are missing.
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+
+import pandas as pd
+
+from bench_utils import ROOT, load_script, best_of
+
+parse_ul_data = load_script("parse-ul-data.py")
+# importable once load_script put the repository on sys.path
+from dats_formats import COMPRESSIONS, FORMATS, catalogue_filename, read_catalogue, write_catalogue
+
+REQUIREMENTS = {"zstd": "zstandard", "msgpack": "msgpack"}
+
+
+def available(option):
+    requirement = REQUIREMENTS.get(option)
+    return requirement is None or importlib.util.find_spec(requirement) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "IMIPROJECTS.csv"))
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.concat([pd.read_csv(args.input)] * args.scale, ignore_index=True)
+    projects = list(parse_ul_data.build_imi_projects(df))
+    catalogue = parse_ul_data.build_imi_catalogue([])
+
+    print("%d projects" % len(projects))
+    print("%-36s %12s %10s %10s" % ("file", "size (KiB)", "write (s)", "read (s)"))
+    with tempfile.TemporaryDirectory() as output_dir:
+        for output_format in FORMATS:
+            for compression in COMPRESSIONS:
+                if not (available(output_format) and available(compression)):
+                    continue
+                filename = catalogue_filename("IMI_datacatalogue_as_DATS", output_format, compression)
+                path = os.path.join(output_dir, filename)
+                write = best_of(lambda: write_catalogue(catalogue, projects, path), args.repeat)
+                read = best_of(lambda: read_catalogue(path), args.repeat)
+                print("%-36s %12.1f %10.3f %10.3f" % (filename, os.path.getsize(path) / 1024.0, write, read))
+
+
+if __name__ == '__main__':
+    main()
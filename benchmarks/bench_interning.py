@@ -0,0 +1,65 @@
+"""
+Heap used by the converted IMI projects, and size of the JSON-LD, with and without sharing interned DATS objects
+
+    python benchmarks/bench_interning.py [--input input/IMIPROJECTS.csv]
+"""
+import argparse
+import json
+import os
+import tracemalloc
+
+import pandas as pd
+
+from bench_utils import ROOT, load_script
+
+parse_ul_data = load_script("parse-ul-data.py")
+# importable once load_script put the repository on sys.path
+from dats_interning import DatsInterner, FrozenDatsObj, ReferenceSerializer
+
+
+class UnsharedInterner(DatsInterner):
+    """
+    Builds a new object on every request, as the converter did before interning
+    """
+
+    def intern(self, json_schema_prefix, atts):
+        self.requests += 1
+        return FrozenDatsObj(json_schema_prefix, atts)
+
+
+def projects_heap(df, interner):
+    """
+
+    :return: a (list of DatsObj, MiB allocated while building them) tuple
+    """
+    tracemalloc.start()
+    projects = list(parse_ul_data.build_imi_projects(df, interner))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return projects, current / (1024.0 * 1024.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "IMIPROJECTS.csv"))
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+
+    unshared = UnsharedInterner()
+    _, unshared_heap = projects_heap(df, unshared)
+    interner = DatsInterner()
+    projects, shared_heap = projects_heap(df, interner)
+
+    print("%d projects, %d interning requests, %d distinct objects" % (len(df), interner.requests, len(interner)))
+    print("%-24s %12s %12s" % ("", "unshared", "interned"))
+    print("%-24s %12.2f %12.2f" % ("projects heap (MiB)", unshared_heap, shared_heap))
+
+    catalogue = parse_ul_data.build_imi_catalogue(projects)
+    plain = len(json.dumps(catalogue.toJSON()))
+    referenced = len(json.dumps(ReferenceSerializer(interner).to_json(catalogue)))
+    print("%-24s %12d %12d" % ("JSON size (bytes)", plain, referenced))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the records.json to DATS conversion, on copies of the export scaled up to tens of thousands of records
+
+    python benchmarks/bench_records.py [--scales 1 100 1000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import uuid
+
+from bench_utils import ROOT, load_script, best_of
+
+parse_json_datacat_ul = load_script("parse-json-datacat-ul.py")
+
+
+def scale_records(records, scale):
+    """
+    Copies of the records, each with its own id
+
+    :param records: a list of dict
+    :param scale: an int
+    :return: a list of dict
+    """
+    scaled = []
+    for _ in range(scale):
+        for record in records:
+            record = copy.copy(record)
+            record["id"] = str(uuid.uuid4())
+            scaled.append(record)
+    return scaled
+
+
+def convert(records, debug=False):
+    datasets = list(parse_json_datacat_ul.build_datasets(records, debug))
+    return json.dumps(parse_json_datacat_ul.build_catalogue(datasets).toJSON())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "records.json"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.input) as json_doc:
+        records = json.load(json_doc)["docs"]
+
+    print("%8s %8s %12s %14s %12s" % ("scale", "records", "convert (s)", "records/s", "debug (s)"))
+    for scale in args.scales:
+        scaled = scale_records(records, scale)
+        plain = best_of(lambda: convert(scaled), args.repeat)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            debug = best_of(lambda: convert(scaled, debug=True), args.repeat)
+        print("%8d %8d %12.3f %14.0f %12.3f" % (scale, len(scaled), plain, len(scaled) / plain, debug))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Time and peak memory of reading a large catalogue export with json.load versus the streaming iter_records
+
+    python benchmarks/bench_records_reader.py [--scales 100 1000 5000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import ROOT, load_script
+
+
+def read(mode, path):
+    """
+    Go through every record of an export, either loading it whole or streaming it
+
+    :param mode: a string, "load" or "stream"
+    :param path: a string
+    :return: an int, the number of records
+    """
+    count = 0
+    with open(path) as json_doc:
+        if mode == "load":
+            records = json.load(json_doc)["docs"]
+        else:
+            records = load_script("parse-json-datacat-ul.py").iter_records(json_doc)
+        for _ in records:
+            count += 1
+    return count
+
+
+def measure(mode, path):
+    """
+    Run read() in a child process
+
+    :return: a (seconds, peak RSS in MiB) tuple
+    """
+    command = [sys.executable, os.path.realpath(__file__), "--child", mode, path]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, rusage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        raise RuntimeError("%s exited with status %d" % (" ".join(command), status))
+    return elapsed, rusage.ru_maxrss / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "records.json"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        read(*args.child)
+        return
+
+    with open(args.input) as json_doc:
+        records = json.load(json_doc)["docs"]
+
+    print("%8s %8s %8s %12s %12s %12s %12s" % ("scale", "records", "MiB", "load (s)", "load MiB",
+                                                "stream (s)", "stream MiB"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            path = os.path.join(tmp_dir, "records-x%d.json" % scale)
+            with open(path, "w") as f:
+                json.dump({"docs": records * scale}, f)
+            load_time, load_rss = measure("load", path)
+            stream_time, stream_rss = measure("stream", path)
+            print("%8d %8d %8.0f %12.2f %12.1f %12.2f %12.1f" % (scale, len(records) * scale,
+                                                                 os.path.getsize(path) / 2 ** 20, load_time,
+                                                                 load_rss, stream_time, stream_rss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency of validating one project through the resident service, against a new dats_validation.py process per file
+
+    python benchmarks/bench_service.py output/IMI_datacatalogue_as_DATS.json [--requests 500] [--clients 4]
+
+The service runs in this process, on a free local port; clients post the projects of the catalogue one at a
+time to /validate, as a curation UI does on save.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import ROOT
+
+sys.path.insert(0, ROOT)
+from dats_formats import iter_catalogue
+from dats_service import DatsService, JobPool, ServiceMetrics, make_server, percentile
+
+
+def client(port, documents, latencies):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    for document in documents:
+        start = time.perf_counter()
+        connection.request("POST", "/validate", body=document, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError("/validate answered %d" % response.status)
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("catalogue", help="a catalogue file, in any encoding of dats_formats")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cold-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    parts = [json.dumps(part).encode("utf-8") for part in iter_catalogue(args.catalogue)[1]]
+    documents = [parts[i % len(parts)] for i in range(args.requests)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        project_file = os.path.join(work_dir, "project.json")
+        with open(project_file, "wb") as f:
+            f.write(parts[0])
+        cold = []
+        for _ in range(args.cold_runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "dats_validation.py"), project_file,
+                            "--processes", "1"], cwd=ROOT, check=True, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            cold.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    service = DatsService(context_mapping=None)
+    service.warm()
+    pool = JobPool(args.workers, 64, ServiceMetrics())
+    pool.warm(service.warm_worker)
+    server = make_server(service, pool, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    warm_up = time.perf_counter() - start
+
+    latencies = []
+    clients = [threading.Thread(target=client, args=(server.server_address[1], documents[i::args.clients],
+                                                     latencies))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    pool.shutdown()
+
+    latencies.sort()
+    print("new process per file: median %.1f ms" % (statistics.median(cold) * 1000))
+    print("service: warmed up in %.2f s, %d requests from %d clients in %.2f s (%.0f requests/s)" %
+          (warm_up, len(latencies), args.clients, elapsed, len(latencies) / elapsed))
+    print("service latency: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms" %
+          tuple(percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99)))
+
+
+if __name__ == '__main__':
+    main()
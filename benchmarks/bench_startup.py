@@ -0,0 +1,96 @@
+"""
+Start-up cost of the converter scripts: import time, --help and time to first output of a small run
+
+    python benchmarks/bench_startup.py [--repeat 5] [--budget-ms 100]
+
+Each measure runs in a new interpreter. The import time is the time spent loading a script as a module (its
+imports and module-level code, not main), which must stay under --budget-ms and must not load any of
+HEAVY_MODULES: the script exits with status 1 otherwise, so that it can guard the start-up time of the converters.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_utils import ROOT
+
+SCRIPTS = {"parse-ul-data.py": ["--input", os.path.join(ROOT, "input", "IMIPROJECTS.csv")],
+           "parse-json-datacat-ul.py": ["--input", os.path.join(ROOT, "input", "records.json")]}
+
+# modules only some code paths need, which the scripts import on demand
+HEAVY_MODULES = ["pandas", "numpy", "jsonschema", "pyarrow", "openpyxl", "requests", "urllib.request",
+                 "concurrent.futures", "ccmm", "dats_interning", "dats_jsonld", "dats_validation"]
+
+IMPORT_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("probe", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def import_time(script):
+    """
+
+    :return: a (seconds, list of the HEAVY_MODULES loaded) tuple
+    """
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE, os.path.join(ROOT, script)] +
+                                     HEAVY_MODULES, cwd=ROOT)
+    probe = json.loads(output)
+    return probe["seconds"], probe["heavy"]
+
+
+def time_to_first_output(command):
+    """
+    Run a command and time the first line it writes, to stdout or stderr, and its end
+
+    :return: a (seconds to the first line, seconds to the end) tuple
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    process.stdout.readline()
+    first = time.perf_counter() - start
+    process.stdout.read()
+    if process.wait() != 0:
+        raise RuntimeError("%s exited with status %d" % (" ".join(command), process.returncode))
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--output-dir", default="/tmp", help="where the small runs write their catalogue")
+    args = parser.parse_args()
+
+    over_budget = False
+    print("%-26s %11s %10s %15s %10s  %s" % ("script", "import (ms)", "help (ms)", "1st output (ms)", "run (ms)",
+                                               "heavy modules loaded"))
+    for script, options in SCRIPTS.items():
+        command = [sys.executable, os.path.join(ROOT, script)]
+        imports = [import_time(script) for _ in range(args.repeat)]
+        import_ms = statistics.median(seconds for seconds, _ in imports) * 1000
+        heavy = imports[0][1]
+        help_ms = statistics.median(time_to_first_output(command + ["--help"])[1]
+                                    for _ in range(args.repeat)) * 1000
+        runs = [time_to_first_output(command + options + ["--output-dir", args.output_dir, "--no-validation"])
+                for _ in range(args.repeat)]
+        first_ms = statistics.median(first for first, _ in runs) * 1000
+        run_ms = statistics.median(end for _, end in runs) * 1000
+        print("%-26s %11.1f %10.1f %15.1f %10.1f  %s" % (script, import_ms, help_ms, first_ms, run_ms,
+                                                         ", ".join(heavy) or "-"))
+        if heavy or import_ms > args.budget_ms:
+            over_budget = True
+
+    if over_budget:
+        print("start-up over budget: more than %.0f ms, or heavy modules imported" % args.budget_ms)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
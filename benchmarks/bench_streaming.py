@@ -0,0 +1,90 @@
+"""
+Check that the peak memory of parse-ul-data.py --streaming, validation included, stays flat whatever the size of
+the sheet
+
+    python benchmarks/bench_streaming.py [--scales 10 100] [--tolerance 0.25] [--chunksize 1000]
+
+IMIPROJECTS.csv is repeated at each of the two scales, and converted with and without --streaming, each run in its
+own process. The script exits with status 1 if the streaming peak RSS at the larger scale exceeds the one at the
+smaller scale by more than --tolerance (a fraction of it). The in-memory mode is reported for comparison only.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_utils import ROOT
+
+# runs the converter in this process, then prints its peak RSS: ru_maxrss, as read by a parent, would be the
+# parent's own when the child is spawned by vfork and exec
+CHILD = """
+import runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit as e:
+    if e.code:
+        raise
+with open("/proc/self/status") as status:
+    print([line.split()[1] for line in status if line.startswith("VmHWM:")][0])
+"""
+
+
+def peak_rss(command):
+    """
+    Run parse-ul-data.py in a child process and report its peak resident set size
+
+    :param command: a list of str, the script and its arguments
+    :return: a float, MiB
+    """
+    output = subprocess.check_output([sys.executable, "-c", CHILD] + command, cwd=ROOT, stderr=subprocess.DEVNULL)
+    return int(output.split()[-1]) / 1024.0
+
+
+def repeat_rows(input_path, scale, output_path):
+    """
+    Write the rows of a CSV file scale times, header once
+    """
+    with open(input_path, encoding="utf-8") as f:
+        header = f.readline()
+        rows = f.read()
+    if rows and not rows.endswith("\n"):
+        rows += "\n"
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(header)
+        for _ in range(scale):
+            f.write(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "IMIPROJECTS.csv"))
+    parser.add_argument("--scales", type=int, nargs=2, default=[10, 100])
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="the growth of the streaming peak RSS allowed between the two scales")
+    parser.add_argument("--chunksize", type=int, default=1000)
+    args = parser.parse_args()
+
+    script = os.path.join(ROOT, "parse-ul-data.py")
+    streaming = {}
+    print("%8s %14s %14s" % ("scale", "in-memory MiB", "streaming MiB"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in sorted(args.scales):
+            scaled_input = os.path.join(tmp_dir, "IMIPROJECTS-x%d.csv" % scale)
+            repeat_rows(args.input, scale, scaled_input)
+
+            command = [script, "--input", scaled_input, "--output-dir", tmp_dir]
+            in_memory = peak_rss(command)
+            streaming[scale] = peak_rss(command + ["--streaming", "--chunksize", str(args.chunksize)])
+            print("%8d %14.1f %14.1f" % (scale, in_memory, streaming[scale]))
+
+    small, large = sorted(args.scales)
+    growth = streaming[large] / streaming[small] - 1
+    print("streaming peak RSS grew by %.1f%% from %dx to %dx, tolerance %.1f%%" % (growth * 100, small, large,
+                                                                                  args.tolerance * 100))
+    sys.exit(1 if growth > args.tolerance else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark suite of both converters on synthetic inputs, with per-stage results kept to catch regressions
+
+    python benchmarks/bench_suite.py [--scales 10 100 1000] [--seed 0] [--baseline benchmarks/results/baseline.json]
+
+For each scale, generate_inputs writes (once, under benchmarks/data) IMIPROJECTS.csv and records.json, then each case
+of CASES runs as its own process with --report, so that the run report of dats_instrumentation gives the wall time,
+CPU time, peak memory and item count of every stage. The reports are collected into benchmarks/results/<date>.json.
+
+Given a baseline, a former results file, the suite lists the stages that got slower by more than --tolerance and
+exits with status 1 if there is any. Only results from the same machine are comparable.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+from bench_utils import ROOT
+from generate_inputs import write_inputs
+
+# name, script, input file, options, largest scale the case runs at (None: all)
+CASES = [("imi", "parse-ul-data.py", "IMIPROJECTS.csv", [], 100),
+         ("imi-streaming", "parse-ul-data.py", "IMIPROJECTS.csv", ["--streaming"], None),
+         ("records", "parse-json-datacat-ul.py", "records.json", [], None)]
+
+# stages faster than this are too noisy to compare
+MIN_COMPARED_SECONDS = 0.05
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(script, input_file, options, validate):
+    """
+    Run a converter with --report
+
+    :return: a dict, the run report
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        report_path = os.path.join(output_dir, "report.json")
+        command = [sys.executable, os.path.join(ROOT, script), "--input", input_file, "--output-dir", output_dir,
+                   "--report", report_path] + options
+        if not validate:
+            command.append("--no-validation")
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(report_path) as f:
+            return json.load(f)
+
+
+def regressions(results, baseline, tolerance):
+    """
+    The stages slower than in the baseline
+
+    :param results: a dict, as written by the suite
+    :param baseline: a dict, as written by the suite
+    :param tolerance: a float, e.g. 0.2 for 20% slower
+    :return: a list of (case, stage, baseline seconds, seconds) tuples
+    """
+    slower = []
+    for case, report in results["cases"].items():
+        former = baseline["cases"].get(case)
+        if former is None:
+            continue
+        for name, stats in report["stages"].items():
+            former_stats = former["stages"].get(name)
+            if former_stats is None or former_stats["wall_seconds"] < MIN_COMPARED_SECONDS:
+                continue
+            if stats["wall_seconds"] > former_stats["wall_seconds"] * (1 + tolerance):
+                slower.append((case, name, former_stats["wall_seconds"], stats["wall_seconds"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", nargs="+", choices=[case[0] for case in CASES], default=None)
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "benchmarks", "data"))
+    parser.add_argument("--output", default=None, help="benchmarks/results/<date>.json by default")
+    parser.add_argument("--baseline", default=None, help="a former results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--validate", action="store_true", help="also time the validation of the catalogues")
+    args = parser.parse_args()
+
+    results = {"started": datetime.datetime.now().isoformat(),
+               "revision": git_revision(),
+               "python": platform.python_version(),
+               "machine": platform.platform(),
+               "seed": args.seed,
+               "cases": {}}
+
+    print("%-24s %8s %-16s %10s %10s %10s" % ("case", "items", "stage", "wall (s)", "cpu (s)", "rss (MiB)"))
+    for scale in args.scales:
+        data_dir = os.path.join(args.data_dir, "x%d-seed%d" % (scale, args.seed))
+        if not os.path.isdir(data_dir):
+            write_inputs(data_dir, scale, args.seed)
+
+        for name, script, input_name, options, max_scale in CASES:
+            if (args.cases and name not in args.cases) or (max_scale is not None and scale > max_scale):
+                continue
+            case = "%s-x%d" % (name, scale)
+            report = run_case(script, os.path.join(data_dir, input_name), options, args.validate)
+            results["cases"][case] = report
+            for stage, stats in report["stages"].items():
+                print("%-24s %8d %-16s %10.3f %10.3f %10.1f" % (case, stats["items"], stage, stats["wall_seconds"],
+                                                               stats["cpu_seconds"], stats["peak_rss_mib"]))
+
+    output = args.output
+    if output is None:
+        output = os.path.join(ROOT, "benchmarks", "results", datetime.date.today().isoformat() + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to %s" % output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for case, stage, former, seconds in slower:
+            print("REGRESSION %s %s: %.3fs -> %.3fs" % (case, stage, former, seconds))
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
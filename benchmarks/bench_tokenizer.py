@@ -0,0 +1,66 @@
+"""
+Benchmark of the tokenization of the multi-valued free-text fields of records.json: the chains of "in" tests and
+str.split the converter used to run on each field, against the precompiled FIELD_TOKENIZERS, without and with the
+cache of tokenize_cached
+
+    python benchmarks/bench_tokenizer.py [--scale 1000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+
+from bench_utils import ROOT, load_script, best_of
+
+parse_json_datacat_ul = load_script("parse-json-datacat-ul.py")
+
+
+def split_chain(value, separators):
+    for separator in separators:
+        if separator in value:
+            return [token.lstrip() for token in value.split(separator)]
+    return [value.lstrip()]
+
+
+def split_all(value, separators):
+    tokens = []
+    for separator in separators:
+        if separator in value:
+            tokens.extend(token.lstrip() for token in value.split(separator))
+    return tokens or [value.lstrip()]
+
+
+# the tokenization of each field before FIELD_RULES
+LEGACY_SPLITTERS = {"study_type": lambda value: [token.lstrip() for token in value.split(";")],
+                    "subjects_number_per_cohort": lambda value: split_all(value, ["; ", "\n"]),
+                    "secondary_analysis": lambda value: split_chain(value, [": ", ";"]),
+                    "reference_publications": lambda value: split_all(value, ["DOI:", ";"]),
+                    "body_system_or_organ_class": lambda value: split_chain(value, [": ", ";"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "input", "records.json"))
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.input) as json_doc:
+        records = json.load(json_doc)["docs"] * args.scale
+
+    print("%-28s %8s %12s %12s %12s %8s" % ("field", "values", "legacy (s)", "table (s)", "cached (s)", "speedup"))
+    for field, _, pattern, token_parser in parse_json_datacat_ul.FIELD_TOKENIZERS:
+        values = [record[field] for record in records if field in record]
+        legacy_split = LEGACY_SPLITTERS[field]
+        legacy = best_of(lambda: [legacy_split(value) for value in values], args.repeat)
+        table = best_of(lambda: [parse_json_datacat_ul.tokenize(value, pattern, token_parser) for value in values],
+                        args.repeat)
+        cached = best_of(lambda: [parse_json_datacat_ul.tokenize_cached(value, pattern, token_parser)
+                                  for value in values], args.repeat)
+        print("%-28s %8d %12.4f %12.4f %12.4f %7.2fx" % (field, len(values), legacy, table, cached, legacy / cached))
+
+    whole = best_of(lambda: [parse_json_datacat_ul.record_tokens(record) for record in records], args.repeat)
+    print("record_tokens on %d records: %.3fs" % (len(records), whole))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Helpers shared by the benchmark scripts: loading the converter scripts as modules and timing calls
+"""
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def load_script(script_name):
+    """
+    Load one of the converter scripts (whose names are not importable as such) as a module
+
+    :param script_name: a string, e.g. "parse-ul-data.py"
+    :return: a module
+    """
+    if ROOT not in sys.path:
+        # the scripts import the modules sitting next to them
+        sys.path.insert(0, ROOT)
+    module_name = os.path.splitext(script_name)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(function, repeat=3):
+    """
+    Run a callable several times and keep the fastest wall time
+
+    :param function: a callable taking no argument
+    :param repeat: an int
+    :return: a float, seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
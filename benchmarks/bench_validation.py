@@ -0,0 +1,79 @@
+"""
+Validation of a whole catalogue with the function compiled from dataset_schema.json, against the Draft4Validator
+of jsonschema it stands in for
+
+    python benchmarks/bench_validation.py output/IMI_datacatalogue_as_DATS.json [--scale 10] [--invalid 5] \
+        [--max-errors 10] [--schemas ../DATS/dats-tools/json-schemas]
+
+The catalogue is scaled by repeating its parts. Each measure runs on the valid catalogue, then on a copy whose
+first --invalid parts lost their title:
+
+    jsonschema    sorted(iter_errors), as the converters validated so far
+    compiled      the yes/no answer of the compiled function alone
+    fast          FastValidator.errors: the compiled answer, then jsonschema for the errors of an invalid catalogue
+    fast first-N  FastValidator.errors stopping at the first --max-errors errors
+
+The script exits with status 1 if the compiled function and jsonschema disagree on either catalogue.
+"""
+import argparse
+import copy
+import os
+import sys
+
+from bench_utils import ROOT, best_of
+
+sys.path.insert(0, ROOT)
+from dats_formats import read_catalogue
+from dats_validation import get_registry
+
+
+def scaled(catalogue, scale, invalid):
+    """
+    The catalogue with its parts repeated scale times, and a copy of it whose first invalid parts have no title
+    """
+    catalogue = dict(catalogue, hasPart=catalogue.get("hasPart", []) * scale)
+    broken = dict(catalogue, hasPart=list(catalogue["hasPart"]))
+    for index in range(min(invalid, len(broken["hasPart"]))):
+        part = broken["hasPart"][index] = copy.copy(broken["hasPart"][index])
+        part.pop("title", None)
+    return catalogue, broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("catalogue", help="a catalogue file, in any encoding of dats_formats")
+    parser.add_argument("--schemas", default=os.path.join(ROOT, "../DATS/dats-tools/json-schemas"))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--invalid", type=int, default=5, help="parts made invalid in the second catalogue")
+    parser.add_argument("--max-errors", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    registry = get_registry(args.schemas)
+    validator = registry.get_validator("dataset_schema.json")
+    fast = registry.get_fast_validator("dataset_schema.json")
+    valid, invalid = scaled(read_catalogue(args.catalogue), args.scale, args.invalid)
+
+    measures = [("jsonschema", lambda instance: sorted(validator.iter_errors(instance), key=lambda e: e.path)),
+                ("compiled", fast.is_valid),
+                ("fast", lambda instance: sorted(fast.errors(instance), key=lambda e: e.path)),
+                ("fast first-%d" % args.max_errors,
+                 lambda instance: sorted(fast.errors(instance, args.max_errors), key=lambda e: e.path))]
+
+    disagree = False
+    print("%d parts, %d of them invalid in the second catalogue" % (len(valid["hasPart"]), args.invalid))
+    print("%-16s %12s %14s %14s" % ("validator", "valid (s)", "invalid (s)", "errors found"))
+    for name, function in measures:
+        valid_seconds = best_of(lambda: function(valid), args.repeat)
+        invalid_seconds = best_of(lambda: function(invalid), args.repeat)
+        found = function(invalid)
+        print("%-16s %12.4f %14.4f %14s" % (name, valid_seconds, invalid_seconds,
+                                           "-" if isinstance(found, bool) else len(found)))
+    if fast.is_valid(valid) != validator.is_valid(valid) or fast.is_valid(invalid) != validator.is_valid(invalid):
+        print("the compiled function and jsonschema disagree")
+        disagree = True
+    sys.exit(1 if disagree else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Time and peak memory of reading the IMI projects from an .xlsx workbook, streamed by dats_xlsx.read_xlsx, against
+IMIPROJECTS.csv read by pandas and against pandas.read_excel, which loads the whole workbook
+
+    python benchmarks/bench_xlsx.py [--scales 1 10 100] [--chunksize 1000]
+
+The inputs are generated by generate_inputs.generate_imi_projects; the workbooks hold typed cells as Excel would:
+dates as dates, grant numbers as numbers. Each read runs in its own process. The "same" column tells whether the
+streamed workbook gives the very DataFrame the CSV gives.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from bench_utils import ROOT
+from generate_inputs import IMI_INPUT, generate_imi_projects
+
+sys.path.insert(0, ROOT)
+from dats_xlsx import read_xlsx
+
+MODES = ["csv", "csv-chunks", "xlsx-stream", "read_excel"]
+
+
+def cell_value(value):
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%d/%m/%Y")
+        except ValueError:
+            return value
+    return value.item() if hasattr(value, "item") else value
+
+
+def write_workbook(df, path):
+    """
+    Write a DataFrame read from IMIPROJECTS.csv as a workbook, row by row
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("IMIPROJECTS")
+    worksheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        worksheet.append([cell_value(value) for value in row])
+    workbook.save(path)
+
+
+def read(mode, path, chunksize):
+    """
+    Go through every row of the projects
+
+    :return: an int, the number of rows
+    """
+    if mode == "csv":
+        return len(pd.read_csv(path))
+    if mode == "csv-chunks":
+        return sum(len(chunk) for chunk in pd.read_csv(path, chunksize=chunksize))
+    if mode == "xlsx-stream":
+        return sum(len(chunk) for chunk in read_xlsx(path, chunksize=chunksize))
+    return len(pd.read_excel(path, engine="openpyxl"))
+
+
+def peak_rss():
+    """
+    The peak RSS of this process, in MiB: ru_maxrss would be that of the parent, which the child inherits when
+    spawned by vfork and exec
+    """
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+
+
+def measure(mode, path, chunksize):
+    """
+    Run read() in a child process
+
+    :return: a (seconds, peak RSS in MiB) tuple
+    """
+    command = [sys.executable, os.path.realpath(__file__), "--child", mode, path, "--chunksize", str(chunksize)]
+    start = time.perf_counter()
+    output = subprocess.check_output(command)
+    return time.perf_counter() - start, float(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=IMI_INPUT)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--chunksize", type=int, default=1000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        read(args.child[0], args.child[1], args.chunksize)
+        print(peak_rss())
+        return
+
+    df = pd.read_csv(args.input)
+    print("%8s %8s %9s %9s  %s  %5s" % ("scale", "rows", "csv MiB", "xlsx MiB",
+                                         "  ".join("%11s %9s" % (mode + " (s)", "MiB") for mode in MODES), "same"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            csv_path = os.path.join(tmp_dir, "IMIPROJECTS-x%d.csv" % scale)
+            xlsx_path = os.path.join(tmp_dir, "IMIPROJECTS-x%d.xlsx" % scale)
+            projects = generate_imi_projects(df, scale)
+            projects.to_csv(csv_path, index=False)
+            write_workbook(projects, xlsx_path)
+
+            same = pd.read_csv(csv_path).equals(read_xlsx(xlsx_path))
+            measures = [measure(mode, xlsx_path if mode in ("xlsx-stream", "read_excel") else csv_path,
+                                args.chunksize) for mode in MODES]
+            print("%8d %8d %9.1f %9.1f  %s  %5s" % (scale, len(projects), os.path.getsize(csv_path) / 2 ** 20,
+                                                     os.path.getsize(xlsx_path) / 2 ** 20,
+                                                     "  ".join("%11.2f %9.1f" % m for m in measures), same))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Synthetic inputs for the benchmarks: IMIPROJECTS.csv and records.json scaled up with realistic values
+
+    python benchmarks/generate_inputs.py --scale 100 --output-dir benchmarks/data/x100 [--seed 0]
+
+Rather than copying the inputs, each generated row or record is drawn from the originals column by column, so that
+the values keep their distribution (missing values, lengths, number of items) without repeating whole rows:
+
+- IMIPROJECTS.csv keeps its column set; the ':'-delimited columns get items drawn from the items of the column, some
+  of them new organization names, Partners keeps its name:amount pairs, the funding columns their "18 170 217"
+  format, and a few dates are the "-" sentinel
+- records.json keeps the fields of the records it copies, with free-text cohorts and publications written in the
+  mixed ";", ": ", newline and "DOI:" styles of the export
+
+The same seed gives the same files.
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+
+import pandas as pd
+
+from bench_utils import ROOT
+
+IMI_INPUT = os.path.join(ROOT, "input", "IMIPROJECTS.csv")
+RECORDS_INPUT = os.path.join(ROOT, "input", "records.json")
+
+MULTI_VALUE_COLUMNS = ["Keywords", "EFPIAcompanies", "Univerisities", "SMEs", "PatientOrganisations",
+                       "ThirdParties", "Disease / Therapeutic Area"]
+ORGANIZATION_COLUMNS = ["EFPIAcompanies", "Univerisities", "SMEs", "PatientOrganisations", "ThirdParties"]
+FUNDING_COLUMNS = ["IMIFunding", "EFPIAFunding", "OtherFunding", "TotalCost"]
+DATE_SENTINEL_RATE = 0.03
+NEW_ORGANIZATION_RATE = 0.05
+
+COHORT_NAMES = ["healthy controls", "primary tumor", "metastatic tumor", "pre-diabetics", "type 2 diabetes patients",
+                "severe asthma", "mild-moderate asthma", "Alzheimer's disease patients", "MCI", "Parkinson's disease"]
+ASSAYS = ["Genomics variant array", "Transcriptome array", "Methylation array", "RNASeq", "Metabolomics",
+          "Proteomics", "Whole genome sequencing", "Exome sequencing", "Clinical imaging", "MicroRNA array"]
+ORGANS = ["brain", "lung", "liver", "colon", "blood", "skin", "kidney", "heart"]
+STUDY_TYPES = ["OBSERVATIONAL", "INTERVENTIONAL", "Xenografts", "3D cell cultures", "Cohort study"]
+
+
+def format_amount(amount):
+    """
+
+    :param amount: an int
+    :return: a string, with spaces between the groups of thousands, e.g. "18 170 217"
+    """
+    return "{:,}".format(amount).replace(",", " ")
+
+
+def column_items(df, column):
+    """
+
+    :return: a list of str, the ':'-delimited items found in a column
+    """
+    return [item for value in df[column].dropna() for item in str(value).split(":") if item]
+
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ven", "tu", "sel", "dor", "ni", "bra", "co", "fen", "gal", "hu", "ix", "ju"]
+
+
+def pseudo_word(number):
+    """
+    A made-up word, different for each number, e.g. "Lomi" for 33
+    """
+    syllables = []
+    while True:
+        number, digit = divmod(number, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+        if not number:
+            break
+    return "".join(syllables).capitalize()
+
+
+def organization_variant(name, number):
+    """
+    A new organization, e.g. "Lomi Universite de Lyon, Lyon, France" from "Universite de Lyon, Lyon, France"
+    """
+    return "%s %s" % (pseudo_word(number), name)
+
+
+def generate_imi_projects(df, scale, seed=0):
+    """
+    Draw scale times as many projects as in the sheet
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :param scale: an int
+    :param seed: an int
+    :return: a pandas DataFrame, with the columns of df
+    """
+    rng = random.Random(seed)
+    rows = len(df) * scale
+    columns = {column: df[column].tolist() for column in df.columns}
+    pools = {column: column_items(df, column) for column in MULTI_VALUE_COLUMNS}
+    partner_names = column_items(df, "Partners")[0::2]
+    dates = [pd.Timestamp(2008, 1, 1) + pd.Timedelta(days=days) for days in range(0, 5000, 7)]
+
+    generated = {column: [] for column in df.columns}
+    for i in range(rows):
+        for column in df.columns:
+            generated[column].append(rng.choice(columns[column]))
+
+        generated["Project Acronym"][i] = "%s-%d" % (generated["Project Acronym"][i], i)
+        generated["GrantAgreementNo"][i] = 900000 + i
+
+        start = rng.choice(dates)
+        end = start + pd.Timedelta(days=rng.randrange(365, 2555))
+        generated["StartDate"][i] = "-" if rng.random() < DATE_SENTINEL_RATE else start.strftime("%d/%m/%Y")
+        generated["EndDate"][i] = "-" if rng.random() < DATE_SENTINEL_RATE else end.strftime("%d/%m/%Y")
+
+        for column in MULTI_VALUE_COLUMNS:
+            value = generated[column][i]
+            if not isinstance(value, str):
+                continue
+            items = rng.sample(pools[column], min(len(pools[column]), value.count(":") + 1))
+            if column in ORGANIZATION_COLUMNS:
+                items = [organization_variant(item, rng.getrandbits(24))
+                         if rng.random() < NEW_ORGANIZATION_RATE else item for item in items]
+            generated[column][i] = ":".join(items)
+
+        partners = generated["Partners"][i]
+        if isinstance(partners, str):
+            names = rng.sample(partner_names, min(len(partner_names), (partners.count(":") + 1) // 2))
+            generated["Partners"][i] = ":".join("%s:%s" % (name, format_amount(rng.randrange(10000, 5000000)))
+                                                for name in names)
+
+        for column in FUNDING_COLUMNS:
+            if isinstance(generated[column][i], str):
+                generated[column][i] = format_amount(rng.randrange(100000, 100000000))
+
+    return pd.DataFrame(generated, columns=df.columns)
+
+
+def cohort_text(rng):
+    """
+    Cohorts in one of the styles of subjects_number_per_cohort, e.g. "(1) 261 primary tumor (2) 61 metastatic tumor"
+    """
+    cohorts = [(rng.choice(COHORT_NAMES), rng.randrange(10, 5000)) for _ in range(rng.randrange(1, 5))]
+    style = rng.randrange(3)
+    if style == 0:
+        return " ".join("(%d) %d %s" % (i + 1, count, name) for i, (name, count) in enumerate(cohorts))
+    if style == 1:
+        return "\n".join("Cohort %s: %d" % (chr(ord("A") + i), count) for i, (_, count) in enumerate(cohorts))
+    return "; ".join("%d %s" % (count, name) for name, count in cohorts)
+
+
+def reference_text(rng):
+    """
+    Publications in one of the styles of reference_publications: DOIs, PubMed links, or citations
+    """
+    count = rng.randrange(1, 6)
+    style = rng.randrange(3)
+    if style == 0:
+        return " ".join("DOI: 10.%d/j.%d.%d" % (rng.randrange(1000, 1200), rng.randrange(2000, 2020),
+                                                  rng.randrange(100, 9999)) for _ in range(count))
+    if style == 1:
+        return "\n".join("https://www.ncbi.nlm.nih.gov/pubmed/%d" % rng.randrange(10000000, 30000000)
+                         for _ in range(count))
+    return "; ".join("Author %d et al., Journal %d (%d)" % (rng.randrange(100), rng.randrange(50),
+                                                             rng.randrange(2000, 2020)) for _ in range(count)) + ";"
+
+
+def list_text(rng, items, separator):
+    return separator.join(rng.sample(items, rng.randrange(1, len(items) + 1)))
+
+
+def generate_records(records, scale, seed=0):
+    """
+    Draw scale times as many records as in the export
+
+    :param records: a list of dict, the docs of records.json
+    :param scale: an int
+    :param seed: an int
+    :return: a list of dict
+    """
+    rng = random.Random(seed)
+    generated = []
+    for i in range(len(records) * scale):
+        record = dict(rng.choice(records))
+        record["id"] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        record["title"] = "%s %d" % (record["title"], i)
+        if "name" in record:
+            record["name"] = "%s_%d" % (record["name"], i)
+        if "subjects_number_per_cohort" in record:
+            record["subjects_number_per_cohort"] = cohort_text(rng)
+        if "reference_publications" in record:
+            record["reference_publications"] = reference_text(rng)
+        if "secondary_analysis" in record:
+            record["secondary_analysis"] = list_text(rng, ASSAYS, rng.choice([", ", ": ", ";"]))
+        if "body_system_or_organ_class" in record:
+            record["body_system_or_organ_class"] = list_text(rng, ORGANS, rng.choice([": ", ";"]))
+        if "study_type" in record:
+            record["study_type"] = list_text(rng, STUDY_TYPES, "; ")
+        for field in ["disease", "project_name", "notes", "samples_type", "data_type", "platform"]:
+            if field in record:
+                record[field] = rng.choice(records).get(field, record[field])
+        generated.append(record)
+    return generated
+
+
+def write_inputs(output_dir, scale, seed=0, imi_input=IMI_INPUT, records_input=RECORDS_INPUT):
+    """
+    Write IMIPROJECTS.csv and records.json, scale times bigger than the inputs, to output_dir
+
+    :return: an (IMIPROJECTS.csv path, records.json path) tuple
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    imi_path = os.path.join(output_dir, "IMIPROJECTS.csv")
+    records_path = os.path.join(output_dir, "records.json")
+
+    generate_imi_projects(pd.read_csv(imi_input), scale, seed).to_csv(imi_path, index=False, encoding="utf-8-sig")
+    with open(records_input) as f:
+        records = json.load(f)["docs"]
+    with open(records_path, "w", encoding="utf-8") as f:
+        json.dump({"docs": generate_records(records, scale, seed)}, f, indent=1)
+    return imi_path, records_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=None, help="benchmarks/data/x<scale> by default")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(ROOT, "benchmarks", "data", "x%d" % args.scale)
+    for path in write_inputs(output_dir, args.scale, args.seed):
+        print("%s (%.1f MiB)" % (path, os.path.getsize(path) / (1024.0 * 1024.0)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Output encodings of the DATS catalogues, and the matching readers.
+
+A catalogue is written as one of
+
+- json: the DATS JSON document, as validated against dataset_schema.json
+- jsonl: JSON Lines, the catalogue without its parts on the first line, then one part (project or dataset) per line
+- msgpack: MessagePack, the same sequence as jsonl, one object after the other
+
+each either uncompressed, or gzip or zstd compressed while it is written. The encoding is given by the file
+extension, e.g. IMI_datacatalogue_as_DATS.jsonl.zst, so that readers need no other information:
+
+    catalogue = read_catalogue("output/IMI_datacatalogue_as_DATS.msgpack.gz")
+
+zstd and MessagePack need the zstandard and msgpack packages.
+"""
+import gzip
+import io
+import json
+
+from dats_instrumentation import stage
+from dats_writers import write_catalogue_streaming
+
+FORMATS = ["json", "jsonl", "msgpack"]
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def catalogue_filename(basename, output_format="json", compression="none"):
+    """
+
+    :param basename: a string, e.g. "IMI_datacatalogue_as_DATS"
+    :param output_format: a string, one of FORMATS
+    :param compression: a string, one of COMPRESSIONS
+    :return: a string, e.g. "IMI_datacatalogue_as_DATS.jsonl.gz"
+    """
+    if output_format not in FORMATS:
+        raise ValueError("Unknown output format %s, expected one of %s" % (output_format, ", ".join(FORMATS)))
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown compression %s, expected one of %s" % (compression, ", ".join(COMPRESSIONS)))
+    return basename + "." + output_format + COMPRESSIONS[compression]
+
+
+def encoding_of(path):
+    """
+
+    :param path: a string, a catalogue file name
+    :return: an (output format, compression) tuple
+    """
+    compression = "none"
+    for name, extension in COMPRESSIONS.items():
+        if extension and path.endswith(extension):
+            compression = name
+            path = path[:-len(extension)]
+    output_format = path.rsplit(".", 1)[-1]
+    if output_format not in FORMATS:
+        raise ValueError("Cannot tell the format of %s from its extension" % path)
+    return output_format, compression
+
+
+def open_binary(path, mode, compression):
+    """
+    Open a file, compressing what is written to it or decompressing what is read from it on the fly
+
+    :param path: a string
+    :param mode: "rb" or "wb"
+    :param compression: a string, one of COMPRESSIONS
+    :return: a binary file object
+    """
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "zstd":
+        import zstandard
+
+        raw = open(path, mode)
+        if mode == "wb":
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(path, mode)
+
+
+def write_catalogue(catalogue, parts, path, jsonld_f=None, annotator=None, references=None, check=None):
+    """
+    Write a catalogue in the encoding given by the extension of path, one part at a time
+
+    :param catalogue: a DatsObj, whose hasPart is left empty
+    :param parts: an iterable of DatsObj
+    :param path: a string, see catalogue_filename
+    :param jsonld_f: a text file object the JSON-LD is written to in the same pass, json format only
+    :param annotator: a JsonLdAnnotator, required with jsonld_f
+    :param references: a ReferenceSerializer, see write_catalogue_streaming
+    :param check: a function called with the JSON of each part as it is written, see write_catalogue_streaming
+    :return: an int, the number of parts written
+    """
+    output_format, compression = encoding_of(path)
+    if output_format == "json":
+        with io.TextIOWrapper(open_binary(path, "wb", compression), encoding="utf-8") as f:
+            return write_catalogue_streaming(catalogue, parts, f, jsonld_f, annotator, references, check)
+    if jsonld_f is not None:
+        raise ValueError("JSON-LD can only be written together with the json format")
+
+    if output_format == "jsonl":
+        def encode(obj):
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+    else:
+        import msgpack
+
+        encode = msgpack.Packer(use_bin_type=True).pack
+
+    catalogue.set("hasPart", [])
+    count = 0
+    with open_binary(path, "wb", compression) as f:
+        f.write(encode(catalogue.toJSON()))
+        for part in parts:
+            with stage("to_json", items=1):
+                part_json = part.toJSON()
+            if check is not None:
+                check(part_json)
+            with stage("write", items=1):
+                f.write(encode(part_json))
+            count += 1
+    return count
+
+
+def iter_catalogue(path):
+    """
+    Read a catalogue part by part
+
+    :param path: a string, a file written by write_catalogue
+    :return: an (envelope, parts) tuple: the catalogue without its parts, and a generator of the parts
+    """
+    output_format, compression = encoding_of(path)
+    f = open_binary(path, "rb", compression)
+
+    if output_format == "json":
+        with f:
+            catalogue = json.load(io.TextIOWrapper(f, encoding="utf-8"))
+        parts = catalogue.get("hasPart", [])
+        catalogue["hasPart"] = []
+        return catalogue, iter(parts)
+
+    if output_format == "jsonl":
+        objects = (json.loads(line) for line in f if line.strip())
+    else:
+        import msgpack
+
+        objects = iter(msgpack.Unpacker(f, raw=False))
+
+    def parts():
+        with f:
+            yield from objects
+
+    try:
+        envelope = next(objects)
+    except StopIteration:
+        f.close()
+        raise ValueError("%s holds no catalogue" % path)
+    return envelope, parts()
+
+
+def read_catalogue(path):
+    """
+    Read a whole catalogue, whatever its encoding
+
+    :param path: a string, a file written by write_catalogue
+    :return: a dict, the DATS JSON of the catalogue
+    """
+    catalogue, parts = iter_catalogue(path)
+    catalogue["hasPart"] = list(parts)
+    return catalogue
@@ -0,0 +1,255 @@
+"""
+Per-stage instrumentation of the conversion pipelines: wall time, CPU time, memory and item counts.
+
+The converters and the shared modules mark their stages with
+
+    with stage("to_json", items=1):
+        part_json = part.toJSON()
+
+which costs next to nothing unless a RunReport is active. Stages nest, and each records its exclusive time: while
+"to_json" runs inside "write", its time is not charged to "write". Streaming pipelines interleave their stages item
+by item, so a stage is usually entered many times and its figures are totals.
+
+Peak memory is the resident set high-water mark of the process when a stage ends, and with trace_memory the peak of
+the memory allocated by Python during the stage (tracemalloc, which slows the run down). The report is written as
+JSON, e.g. with the --report option of the converters; --profile also dumps cProfile statistics, which snakeviz,
+flameprof or gprof2dot turn into flame graphs.
+
+The active report is per thread: the jobs the service runs concurrently in its worker threads each record into the
+report they started, if any, and a report only ever sees the stages of its own thread. Memory figures remain those
+of the whole process.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import cProfile
+import datetime
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mib():
+    """
+
+    :return: a float, the resident set high-water mark of the process, in MiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KiB elsewhere
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+class StageStats(object):
+    """
+    Totals of one stage
+    """
+
+    __slots__ = ["wall", "cpu", "calls", "items", "peak_rss_mib", "peak_traced_mib"]
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.items = 0
+        self.peak_rss_mib = 0.0
+        self.peak_traced_mib = None
+
+    def to_json(self):
+        stats = OrderedDict([("wall_seconds", round(self.wall, 6)),
+                             ("cpu_seconds", round(self.cpu, 6)),
+                             ("calls", self.calls),
+                             ("items", self.items),
+                             ("peak_rss_mib", round(self.peak_rss_mib, 2))])
+        if self.peak_traced_mib is not None:
+            stats["peak_traced_mib"] = round(self.peak_traced_mib, 2)
+        return stats
+
+
+class RunReport(object):
+    """
+    The stages of one run, see stage
+    """
+
+    def __init__(self, name, trace_memory=False):
+        """
+
+        :param name: a string, e.g. the name of the script
+        :param trace_memory: a boolean, True to trace the memory allocated in each stage with tracemalloc
+        """
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stages = OrderedDict()
+        self.metadata = OrderedDict()
+        self._stack = []
+        self._started = datetime.datetime.now().isoformat()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, items=0):
+        """
+        Time a stage; the items of the stage can also be counted by adding to the items of the yielded StageStats
+
+        :param name: a string, e.g. "read", "build", "to_json", "write", "schema_loading", "validation"
+        :param items: an int, the number of items the stage handles
+        """
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        if self._stack:
+            # pause the enclosing stage
+            parent = self._stack[-1]
+            parent[0].wall += wall - parent[1]
+            parent[0].cpu += cpu - parent[2]
+        if self.trace_memory:
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        entry = [stats, wall, cpu]
+        self._stack.append(entry)
+        try:
+            yield stats
+        finally:
+            wall, cpu = time.perf_counter(), time.process_time()
+            stats.wall += wall - entry[1]
+            stats.cpu += cpu - entry[2]
+            stats.calls += 1
+            stats.items += items
+            self._stack.pop()
+            if self._stack:
+                # resume the enclosing stage
+                self._stack[-1][1], self._stack[-1][2] = wall, cpu
+            if self.trace_memory:
+                peak = (tracemalloc.get_traced_memory()[1] - traced_before) / (1024.0 * 1024.0)
+                stats.peak_traced_mib = max(stats.peak_traced_mib or 0.0, peak)
+            stats.peak_rss_mib = peak_rss_mib()
+
+    def to_json(self):
+        """
+
+        :return: a dict, the run report
+        """
+        return OrderedDict([("run", self.name),
+                            ("started", self._started),
+                            ("wall_seconds", round(time.perf_counter() - self._wall, 6)),
+                            ("cpu_seconds", round(time.process_time() - self._cpu, 6)),
+                            ("peak_rss_mib", round(peak_rss_mib(), 2)),
+                            ("metadata", self.metadata),
+                            ("stages", OrderedDict((name, stats.to_json()) for name, stats in self.stages.items()))])
+
+    def write(self, path):
+        """
+
+        :param path: a string, the JSON file to write the report to
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def log(self):
+        for name, stats in self.stages.items():
+            logger.info("%-16s %9.3fs wall %9.3fs cpu %8d calls %8d items", name, stats.wall, stats.cpu,
+                        stats.calls, stats.items)
+
+
+# the active RunReport of each thread, in its report attribute
+_local = threading.local()
+
+
+@contextmanager
+def _no_stage(name, items=0):
+    yield None
+
+
+def stage(name, items=0):
+    """
+    Time a stage in the active RunReport, do nothing when there is none
+
+    :param name: a string
+    :param items: an int
+    :return: a context manager
+    """
+    report = getattr(_local, "report", None)
+    if report is None:
+        return _no_stage(name, items)
+    return report.stage(name, items)
+
+
+def instrumented(name, iterable, items_per_step=1):
+    """
+    Charge the time spent producing each item of an iterable to a stage, e.g. the reading of a csv file chunk by
+    chunk, or the building of DATS objects by a generator
+
+    :param name: a string
+    :param iterable: an iterable
+    :param items_per_step: an int, or a callable returning the number of items in each element
+    :return: a generator
+    """
+    iterator = iter(iterable)
+    sentinel = object()
+    while True:
+        with stage(name) as stats:
+            item = next(iterator, sentinel)
+            if stats is not None and item is not sentinel:
+                stats.items += items_per_step(item) if callable(items_per_step) else items_per_step
+        if item is sentinel:
+            return
+        yield item
+
+
+def start_report(name, trace_memory=False):
+    """
+    Make a new RunReport the active one of the current thread
+
+    :param name: a string
+    :param trace_memory: a boolean
+    :return: a RunReport
+    """
+    _local.report = RunReport(name, trace_memory)
+    return _local.report
+
+
+def stop_report():
+    """
+    Leave the current thread without an active RunReport, e.g. at the end of a job of the service
+
+    :return: the RunReport which was active, or None
+    """
+    report = getattr(_local, "report", None)
+    _local.report = None
+    return report
+
+
+def active_report():
+    """
+
+    :return: the active RunReport of the current thread, or None
+    """
+    return getattr(_local, "report", None)
+
+
+@contextmanager
+def profiled(path):
+    """
+    Run a block under cProfile and dump the statistics to path, None to not profile
+
+    :param path: a string, e.g. "run.prof"
+    """
+    if path is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info("cProfile statistics written to %s", path)
@@ -0,0 +1,158 @@
+"""
+Flyweights for DATS objects: identical annotations, organizations and the like are built once and shared.
+
+The IMI sheet repeats the same content over and over (the "start date" and "end date" annotations, the
+"EFPIA partner" or "SME" roles, big pharma partners of dozens of projects, the IMI Program of every project), so
+DatsInterner hands out one shared, frozen DatsObj per distinct content. Plain DATS JSON is unchanged, every
+occurrence being written in full; JSON-LD can instead give each shared object a blank node @id, written in full
+the first time and as an @id reference afterwards, see ReferenceSerializer.
+"""
+from ccmm.dats.datsobj import DatsObj
+
+
+class FrozenDatsObj(DatsObj):
+    """
+    A DatsObj shared through a DatsInterner, which must not be changed once built
+    """
+
+    def __init__(self, json_schema_prefix, atts=[], id=None):
+        self._frozen = False
+        super(FrozenDatsObj, self).__init__(json_schema_prefix, atts, id)
+        self._frozen = True
+
+    def set(self, att, val):
+        if self._frozen:
+            raise TypeError("%s is interned and shared, it cannot be changed" % self.json_schema_prefix)
+        super(FrozenDatsObj, self).set(att, val)
+
+
+def _content_key(value):
+    """
+    A hashable key for an attribute value, nested DatsObj being compared by identity: they are interned too
+    """
+    if isinstance(value, DatsObj):
+        return "obj", id(value)
+    if isinstance(value, list):
+        return "list", tuple(_content_key(item) for item in value)
+    if isinstance(value, dict):
+        return "dict", tuple((k, _content_key(v)) for k, v in value.items())
+    return "value", value
+
+
+class DatsInterner(object):
+    """
+    One shared FrozenDatsObj per distinct (schema, attributes) content
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self.requests = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj):
+        return isinstance(obj, FrozenDatsObj) and self._objects.get(obj._intern_key) is obj
+
+    def intern(self, json_schema_prefix, atts):
+        """
+        Return the shared DatsObj with this content, building it the first time it is asked for
+
+        :param json_schema_prefix: a string, e.g. "Annotation"
+        :param atts: a list of (attribute, value) tuples, whose DatsObj values should be interned themselves
+        :return: a FrozenDatsObj
+        """
+        self.requests += 1
+        key = (json_schema_prefix, tuple((att, _content_key(value)) for att, value in atts))
+        obj = self._objects.get(key)
+        if obj is None:
+            obj = FrozenDatsObj(json_schema_prefix, atts)
+            obj._intern_key = key
+            self._objects[key] = obj
+        return obj
+
+    def annotation(self, value, value_iri=""):
+        """
+
+        :param value: a string
+        :param value_iri: a string
+        :return: a FrozenDatsObj, an Annotation
+        """
+        return self.intern("Annotation", [("value", value), ("valueIRI", value_iri)])
+
+    def organization(self, name, roles=(), identifier=None):
+        """
+
+        :param name: a string
+        :param roles: a sequence of role values, e.g. ["EFPIA partner"]
+        :param identifier: a string, e.g. the id of the organization in an OrganizationRegistry
+        :return: a FrozenDatsObj, an Organization
+        """
+        atts = [("name", name)]
+        if identifier is not None:
+            atts.append(("identifier", self.intern("Identifier", [("identifier", identifier)])))
+        if roles:
+            atts.append(("roles", [self.annotation(role) for role in roles]))
+        return self.intern("Organization", atts)
+
+    def category_values(self, category, values):
+        """
+
+        :param category: a string
+        :param values: a list of str
+        :return: a FrozenDatsObj, a CategoryValuesPair
+        """
+        return self.intern("CategoryValuesPair", [("category", category),
+                                                  ("categoryIRI", ""),
+                                                  ("values", [self.annotation(value) for value in values])])
+
+
+class ReferenceSerializer(object):
+    """
+    Converts DatsObj to JSON like DatsObj.toJSON, but writes each interned object in full only once, with a blank
+    node @id, and as {"@id": ...} wherever it appears again. This is only valid JSON-LD, not DATS JSON: the DATS
+    schemas require the content of every object.
+
+    A serializer remembers the objects it wrote, so that the parts of a document can be converted one after the other.
+    """
+
+    def __init__(self, interner, prefix="_:dats"):
+        """
+
+        :param interner: a DatsInterner, whose objects are written by reference
+        :param prefix: a string, the prefix of the blank node identifiers
+        """
+        self.interner = interner
+        self.prefix = prefix
+        self._ids = {}
+
+    def to_json(self, value):
+        """
+
+        :param value: a DatsObj, or a list or plain value holding some
+        :return: the JSON value, a dict for a DatsObj
+        """
+        if isinstance(value, list):
+            return [self.to_json(item) for item in value]
+        if not isinstance(value, DatsObj):
+            return value
+
+        shared = value in self.interner
+        if shared:
+            node_id = self._ids.get(id(value))
+            if node_id is not None:
+                return {"@id": node_id}
+            node_id = self.prefix + str(len(self._ids))
+            self._ids[id(value)] = node_id
+        elif value.id is not None:
+            node_id = value.id
+        else:
+            node_id = None
+
+        node = {}
+        if node_id is not None:
+            node["@id"] = node_id
+        node["@type"] = value.json_schema_prefix
+        for att, att_value in value.atts.items():
+            node[att] = self.to_json(att_value)
+        return node
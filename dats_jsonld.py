@@ -0,0 +1,318 @@
+"""
+JSON-LD for DATS: annotation of in-memory DATS JSON, and cache of the contexts referred to by
+dats_context_mapping.json.
+
+Contexts are kept in an in-memory LRU backed by an on-disk store, which can be pre-seeded from a local copy of
+DATS/dats-tools/json-contexts. Stale entries are revalidated with ETag/Last-Modified, and in offline mode the
+network is never used, so that JSON-LD can be produced on air-gapped build nodes:
+
+    python dats_jsonld.py seed --mapping dats_context_mapping.json --contexts ../DATS/dats-tools/json-contexts
+"""
+from collections import OrderedDict
+from os.path import isfile, join
+import argparse
+import hashlib
+import logging
+import json
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "imi-datacatalogue", "jsonld-contexts")
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+class ContextNotCachedError(IOError):
+    """
+    Raised in offline mode when a context is neither in memory nor on disk
+    """
+
+
+class ContextCache(object):
+    """
+    JSON-LD contexts by URL: in-memory LRU, then on-disk store, then network (unless offline)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, offline=False, max_entries=128, max_age=DEFAULT_MAX_AGE):
+        """
+
+        :param cache_dir: a string, the directory of the on-disk store
+        :param offline: a boolean, True to never use the network
+        :param max_entries: an int, the size of the in-memory LRU
+        :param max_age: an int, seconds a fetched context is fresh for when the server gives no max-age
+        """
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._memory = OrderedDict()
+        self._seeded = set()
+        self._lock = threading.RLock()
+
+    def _entry_path(self, url):
+        return join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _remember(self, url, entry):
+        self._memory[url] = entry
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, url):
+        path = self._entry_path(url)
+        if not isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save(self, url, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(url)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+    def put(self, url, context, expires=None, etag=None, last_modified=None):
+        """
+        Store a context, e.g. one read from a local copy of the DATS contexts
+
+        :param url: a string
+        :param context: a dict, the parsed JSON-LD context
+        :param expires: a float, the epoch time the entry goes stale at, None for never
+        :param etag: a string
+        :param last_modified: a string
+        """
+        entry = {"url": url, "context": context, "expires": expires, "etag": etag, "last_modified": last_modified}
+        with self._lock:
+            self._save(url, entry)
+            self._remember(url, entry)
+
+    def _fetch(self, url, entry):
+        import requests
+
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        logger.info("Fetching JSON-LD context %s", url)
+        response = requests.get(url, headers=headers, timeout=30)
+
+        max_age = self.max_age
+        cache_control = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if cache_control:
+            max_age = int(cache_control.group(1))
+        expires = time.time() + max_age
+
+        if response.status_code == 304 and entry is not None:
+            entry = dict(entry, expires=expires)
+        else:
+            response.raise_for_status()
+            entry = {"url": url, "context": response.json(), "expires": expires,
+                     "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        self._save(url, entry)
+        return entry
+
+    def get(self, url):
+        """
+        Return the context published at a URL
+
+        :param url: a string
+        :return: a dict, the parsed JSON-LD context
+        """
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is None:
+                entry = self._load(url)
+
+            stale = entry is None or (entry["expires"] is not None and entry["expires"] < time.time())
+            if stale:
+                if self.offline:
+                    if entry is None:
+                        raise ContextNotCachedError("JSON-LD context %s is not cached and the cache is offline" % url)
+                    logger.debug("Using stale JSON-LD context %s in offline mode", url)
+                else:
+                    entry = self._fetch(url, entry)
+
+            self._remember(url, entry)
+            return entry["context"]
+
+    def seed(self, contexts_path, urls):
+        """
+        Pre-seed the cache with the local copies of contexts, matched to their URL by file name.
+        A directory is only read once per process.
+
+        :param contexts_path: a string, e.g. DATS/dats-tools/json-contexts
+        :param urls: an iterable of context URLs, e.g. the values of dats_context_mapping.json
+        :return: a list of the URLs which were seeded
+        """
+        key = (os.path.realpath(contexts_path), frozenset(urls))
+        if key in self._seeded:
+            return []
+        self._seeded.add(key)
+
+        local_files = {}
+        for directory, _, files in os.walk(contexts_path):
+            for filename in files:
+                local_files.setdefault(filename, join(directory, filename))
+
+        seeded = []
+        for url in key[1]:
+            local_file = local_files.get(url.rstrip("/").split("/")[-1])
+            if local_file is None:
+                continue
+            with open(local_file, 'r', encoding='utf-8') as f:
+                self.put(url, json.load(f))
+            seeded.append(url)
+        return seeded
+
+
+class JsonLdAnnotator(object):
+    """
+    Turns the DATS JSON of a DatsObj (the dict returned by toJSON) into JSON-LD in place, by adding @context and
+    @type to every nested object: hasPart datasets, creators, dates, extraProperties and so on
+    """
+
+    def __init__(self, context_mapping, base_schema="dataset_schema.json", contexts=None):
+        """
+
+        :param context_mapping: a dict of schema file name to context URL, see load_context_mapping
+        :param base_schema: a string, the schema of the root object
+        :param contexts: a ContextCache, to embed the contexts themselves rather than their URL
+        """
+        self.context_mapping = context_mapping
+        self.base_schema = base_schema
+        self.contexts = contexts
+        self._schema_names = {}
+
+    def schema_name(self, node_type, field):
+        """
+        The schema of a nested object, from its DATS @type (e.g. CategoryValuesPair gives
+        category_values_pair_schema.json) or else from the field holding it
+
+        :param node_type: a string or None
+        :param field: a string
+        :return: a string or None
+        """
+        key = (node_type, field)
+        if key not in self._schema_names:
+            candidates = []
+            if node_type:
+                candidates.append(re.sub(r'(?<!^)(?=[A-Z])', '_', node_type).lower() + "_schema.json")
+            candidates.append(field + "_schema.json")
+            self._schema_names[key] = next((c for c in candidates if c in self.context_mapping), None)
+        return self._schema_names[key]
+
+    def context_of(self, url):
+        if self.contexts is None:
+            return url
+        return self.contexts.get(url).get("@context", url)
+
+    def annotate(self, node, field=None, parent_context=None):
+        """
+
+        :param node: a dict or a list, as returned by DatsObj.toJSON
+        :param field: a string, the field holding node in its parent, None for the root object
+        :param parent_context: a string, the context URL in scope, which is not repeated on nested objects
+        :return: node, annotated
+        """
+        if isinstance(node, list):
+            for item in node:
+                self.annotate(item, field, parent_context)
+            return node
+        if not isinstance(node, dict) or list(node) == ["@id"]:
+            # an @id reference to a node annotated where it is written in full
+            return node
+
+        if field is None:
+            context = self.context_mapping[self.base_schema]
+        else:
+            schema = self.schema_name(node.get("@type"), field)
+            context = self.context_mapping.get(schema) if schema else None
+            if "@type" not in node:
+                node["@type"] = field.capitalize()
+
+        if context is not None and context != parent_context:
+            node["@context"] = self.context_of(context)
+        else:
+            context = parent_context
+
+        for key, value in node.items():
+            if not key.startswith("@") and isinstance(value, (dict, list)):
+                self.annotate(value, key, context)
+        return node
+
+
+_context_mappings = {}
+
+
+def load_context_mapping(mapping_path):
+    """
+    Read dats_context_mapping.json, only once per process
+
+    :param mapping_path: a string
+    :return: a dict of schema file name to context URL
+    """
+    key = os.path.realpath(mapping_path)
+    if key not in _context_mappings:
+        with open(key, 'r') as mappings:
+            _context_mappings[key] = json.load(mappings)["contexts"]
+    return _context_mappings[key]
+
+
+_context_cache = None
+
+
+def get_context_cache():
+    """
+    Return the process-wide ContextCache, configured from the DATS_JSONLD_CACHE_DIR and DATS_JSONLD_OFFLINE
+    environment variables unless configure_context_cache was called
+
+    :return: a ContextCache
+    """
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = ContextCache(cache_dir=os.environ.get("DATS_JSONLD_CACHE_DIR", DEFAULT_CACHE_DIR),
+                                      offline=os.environ.get("DATS_JSONLD_OFFLINE", "") not in ("", "0"))
+    return _context_cache
+
+
+def configure_context_cache(**kwargs):
+    """
+    Replace the process-wide ContextCache
+
+    :param kwargs: the arguments of ContextCache
+    :return: a ContextCache
+    """
+    global _context_cache
+    _context_cache = ContextCache(**kwargs)
+    return _context_cache
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Manage the local cache of DATS JSON-LD contexts")
+    parser.add_argument("command", choices=["seed", "fetch"],
+                        help="seed: copy the local contexts into the cache, fetch: download the missing ones")
+    parser.add_argument("--mapping", default="dats_context_mapping.json", help="the DATS context mapping file")
+    parser.add_argument("--contexts", default=os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                                           "../DATS/dats-tools/json-contexts"),
+                        help="a local copy of DATS/dats-tools/json-contexts")
+    parser.add_argument("--cache-dir", default=os.environ.get("DATS_JSONLD_CACHE_DIR", DEFAULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    cache = configure_context_cache(cache_dir=args.cache_dir, offline=args.command == "seed")
+    urls = sorted(set(load_context_mapping(args.mapping).values()))
+    if args.command == "seed":
+        seeded = cache.seed(args.contexts, urls)
+        logger.info("%d of %d contexts seeded into %s", len(seeded), len(urls), args.cache_dir)
+    else:
+        for url in urls:
+            cache.get(url)
+        logger.info("%d contexts cached in %s", len(urls), args.cache_dir)
@@ -0,0 +1,176 @@
+"""
+Merge of the two catalogues: each dataset of the data catalogue export becomes a part of its IMI project.
+
+The datasets name their project in the "project name" extra property, e.g. "IMI OncoTrack" or "IMI European
+Prevention for Alzheimer Dementia (EPAD)", the projects are titled by their acronym, e.g. "Onco Track" or "EPAD".
+Both are reduced to a normalized acronym (case, accents, blanks, punctuation and the "IMI" prefix dropped), the
+projects are indexed by it in a dictionary, then the datasets are streamed and looked up one by one, so that the
+merge is linear in the size of the catalogues.
+
+    python dats_merge.py output/IMI_datacatalogue_as_DATS.json output/UL_datacatalogue_as_DATS.json \
+        --output output/IMI_datacatalogue_with_datasets.json --unmatched output/unmatched_datasets.json
+
+The datasets of no project are left out of the merged catalogue and listed in the unmatched report.
+"""
+import argparse
+import json
+import logging
+import re
+import unicodedata
+
+from dats_formats import iter_catalogue, write_catalogue
+from dats_instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+PROJECT_NAME_CATEGORY = "project name"
+
+
+def normalize_acronym(name):
+    """
+    Case, accent, punctuation and blank insensitive form of a project acronym, without the "IMI" prefix
+
+    :param name: a string, e.g. "IMI OncoTrack" or "Onco Track"
+    :return: a string, e.g. "oncotrack"
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower().strip()
+    name = re.sub(r"^(imi[\s_-]+)+", "", name)
+    return "".join(re.findall(r"[a-z0-9]+", name))
+
+
+def acronym_keys(name):
+    """
+    The normalized acronyms a project name may refer to: the whole name, and the acronyms given in parentheses
+
+    :param name: a string, e.g. "IMI European Prevention for Alzheimer Dementia (EPAD)"
+    :return: a list of str, e.g. ["europeanpreventionforalzheimerdementiaepad", "epad"]
+    """
+    keys = [normalize_acronym(name)] + [normalize_acronym(acronym) for acronym in re.findall(r"\(([^()]+)\)", name)]
+    return [key for key in dict.fromkeys(keys) if key]
+
+
+def project_name_of(dataset):
+    """
+
+    :param dataset: a dict, the DATS JSON of a dataset converted by parse-json-datacat-ul.py
+    :return: a string, the value of its "project name" extra property, None if it has none
+    """
+    for pair in dataset.get("extraProperties", []):
+        if isinstance(pair, dict) and pair.get("category") == PROJECT_NAME_CATEGORY and pair.get("values"):
+            return pair["values"][0].get("value")
+    return None
+
+
+class JsonObj(object):
+    """
+    DATS JSON already serialized, which the writers of dats_formats accept in place of a DatsObj
+    """
+
+    __slots__ = ["json"]
+
+    def __init__(self, json_dict):
+        self.json = json_dict
+
+    def set(self, key, value):
+        self.json[key] = value
+
+    def toJSON(self):
+        return self.json
+
+
+class ProjectIndex(object):
+    """
+    The projects of a catalogue by normalized acronym
+    """
+
+    def __init__(self, projects):
+        """
+
+        :param projects: an iterable of dict, the DATS JSON of the projects
+        """
+        self.projects = []
+        self._by_acronym = {}
+        for project in projects:
+            self.projects.append(project)
+            key = normalize_acronym(project.get("title", ""))
+            if not key:
+                continue
+            if key in self._by_acronym:
+                logger.warning("projects %s and %s have the same acronym, datasets go to the first one",
+                               self._by_acronym[key].get("title"), project.get("title"))
+                continue
+            self._by_acronym[key] = project
+
+    def find(self, project_name):
+        """
+
+        :param project_name: a string, e.g. "IMI OncoTrack"
+        :return: a dict, the DATS JSON of the project, None if no project has this acronym
+        """
+        for key in acronym_keys(project_name):
+            project = self._by_acronym.get(key)
+            if project is not None:
+                return project
+        return None
+
+
+def attach_datasets(index, datasets):
+    """
+    Add each dataset to the hasPart of its project
+
+    :param index: a ProjectIndex
+    :param datasets: an iterable of dict, the DATS JSON of the datasets
+    :return: a (number of datasets attached, list of unmatched datasets) tuple, each unmatched dataset given as a
+             dict of its identifier, title and project name
+    """
+    attached = 0
+    unmatched = []
+    for dataset in datasets:
+        project_name = project_name_of(dataset)
+        project = index.find(project_name) if project_name else None
+        if project is None:
+            unmatched.append({"identifier": dataset.get("identifier", {}).get("identifier"),
+                              "title": dataset.get("title"),
+                              "project name": project_name})
+            continue
+        project.setdefault("hasPart", []).append(dataset)
+        attached += 1
+    return attached, unmatched
+
+
+def merge_catalogues(projects_path, datasets_path, output_path):
+    """
+    Write the catalogue of projects with the datasets of the other catalogue as their parts
+
+    :param projects_path: a string, a catalogue written by parse-ul-data.py, in any encoding of dats_formats
+    :param datasets_path: a string, a catalogue written by parse-json-datacat-ul.py, in any encoding of dats_formats
+    :param output_path: a string, the merged catalogue, whose encoding is given by its extension
+    :return: a (number of datasets attached, list of unmatched datasets) tuple, see attach_datasets
+    """
+    envelope, projects = iter_catalogue(projects_path)
+    index = ProjectIndex(instrumented("read", projects))
+    attached, unmatched = attach_datasets(index, instrumented("merge", iter_catalogue(datasets_path)[1]))
+    write_catalogue(JsonObj(envelope), (JsonObj(project) for project in index.projects), output_path)
+    return attached, unmatched
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Attach the datasets of the data catalogue to their IMI projects")
+    parser.add_argument("projects", help="the catalogue written by parse-ul-data.py")
+    parser.add_argument("datasets", help="the catalogue written by parse-json-datacat-ul.py")
+    parser.add_argument("--output", default="./output/IMI_datacatalogue_with_datasets.json",
+                        help="the merged catalogue, in the encoding given by its extension")
+    parser.add_argument("--unmatched", default=None, help="write the datasets of no project to this JSON file")
+    args = parser.parse_args()
+
+    attached, unmatched = merge_catalogues(args.projects, args.datasets, args.output)
+    logger.info("%d datasets attached to their project, %d unmatched", attached, len(unmatched))
+    for dataset in unmatched:
+        logger.debug("unmatched: %s (%s)", dataset["title"], dataset["project name"])
+    if args.unmatched:
+        with open(args.unmatched, 'w', encoding='utf-8') as f:
+            json.dump(unmatched, f, indent=2)
@@ -0,0 +1,319 @@
+"""
+Catalogue-wide registry of the organizations taking part in IMI projects.
+
+The organization columns of the IMI sheet name the same organization in several ways: "Novartis Pharma AG, Basel,
+Switzerland" among the EFPIAcompanies, "Novartis Pharma AG" among the Partners, with or without a trailing blank,
+accents or "&". Names are normalized, then matched against the organizations already registered in the same
+blocks, so that matching stays linear in the number of names. Two names match when they have the same words up to
+a typo in one of them ("Patient'Organizations" and "Patients' Organizations"), but not when a word differs
+("Universita Degli Studi Di Firenze" and "... Di Siena", "Astellas Pharma Europe LTD" and "... BV"). The location
+following the name only tells organizations apart when both names have one:
+
+    >>> registry = OrganizationRegistry()
+    >>> registry.resolve("Patients' Organizations") is registry.resolve("Patient'Organizations")
+    True
+    >>> registry.resolve("Universita Degli Studi Di Firenze") is registry.resolve("Universita Degli Studi Di Siena")
+    False
+    >>> registry.resolve("Firalis SAS, Huningue, France") is registry.resolve("Firalis SAS")
+    True
+    >>> registry.resolve("Institut Pasteur, Paris, France") is registry.resolve("Institut Pasteur, Lille, France")
+    False
+
+resolve_all resolves the names of a whole sheet in the order of their normalized forms, so that the organizations,
+their names and their identifiers depend on the names of the sheet only, not on the order of its rows. An
+organization is named after the first of its names in that order, the one without location when there is one:
+
+    >>> registry = OrganizationRegistry()
+    >>> registry.resolve_all(["Firalis SAS, Huningue, France", "Firalis SAS"])
+    >>> registry.get("Firalis SAS, Huningue, France").name
+    'Firalis SAS'
+
+The registry maps every organization to its projects and roles, and every name variant to its organization, so
+that "all the projects of organization X" is a dictionary lookup. It is written next to the catalogue as
+organizations.json:
+
+    {"organizations": {"IMI-Org#...": {"name": ..., "aliases": [...], "locations": [...],
+                                       "projects": {"IMI-Cat#115303": [roles]}}},
+     "names": {normalized name: "IMI-Org#..."}}
+
+which can be queried with
+
+    python dats_organizations.py output/organizations.json "Novartis Pharma AG"
+
+The examples above are checked by python -m doctest dats_organizations.py
+"""
+from difflib import SequenceMatcher
+import argparse
+import hashlib
+import json
+import re
+import unicodedata
+
+# names which are not organizations, e.g. the totals of the Partners column
+NOT_ORGANIZATIONS = {"total cost"}
+
+# letters of the typo'd word a name is blocked with, at its start and at its end
+BLOCK_AFFIX = 2
+FUZZY_THRESHOLD = 0.8
+
+
+def normalize_organization_name(name):
+    """
+    Case, accent, punctuation and blank insensitive form of an organization name
+
+    :param name: a string, e.g. "Sanofi-Aventis Recherche & Developpement, Chilly Mazarin, France "
+    :return: a string, e.g. "sanofi aventis recherche and developpement, chilly mazarin, france"
+    """
+    if not name.isascii():
+        name = unicodedata.normalize("NFKD", name)
+        name = "".join(c for c in name if not unicodedata.combining(c))
+    name = name.lower().replace("&", " and ")
+    parts = [" ".join(re.findall(r"[a-z0-9]+", part)) for part in name.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+def same_place(location, locations):
+    """
+    Whether a location is compatible with the locations of an organization: any location is when either is unknown,
+    and "basel" is with "basel, switzerland"
+
+    :param location: a string, the normalized location following a name, e.g. "leiden, netherlands", or ""
+    :param locations: a list of such strings
+    :return: a boolean
+    """
+    if not location or not locations:
+        return True
+    parts = location.split(", ")
+    for other in locations:
+        other_parts = other.split(", ")
+        common = min(len(parts), len(other_parts))
+        if parts[:common] == other_parts[:common]:
+            return True
+    return False
+
+
+def is_organization_name(name):
+    """
+    The Partners column interleaves organization names with their funding, e.g. "Biomonitor A/S:627 000"
+
+    :param name: a string
+    :return: a boolean
+    """
+    normalized = normalize_organization_name(name)
+    return bool(normalized) and not re.match(r"^[\d ]+$", normalized) and normalized not in NOT_ORGANIZATIONS
+
+
+class RegisteredOrganization(object):
+    """
+    A canonical organization: its name, the other names it goes by, the locations found in them, and its projects with
+    the roles it has in them
+    """
+
+    __slots__ = ["id", "name", "base", "aliases", "locations", "projects"]
+
+    def __init__(self, identifier, name, base, location=""):
+        self.id = identifier
+        self.name = name
+        self.base = base
+        self.aliases = [name]
+        self.locations = [location] if location else []
+        self.projects = {}
+
+    def to_json(self):
+        return {"name": self.name, "aliases": self.aliases, "locations": self.locations,
+                "projects": {project: roles for project, roles in self.projects.items()}}
+
+
+class OrganizationRegistry(object):
+    """
+    Organizations by normalized name, with a blocking index for fuzzy matching and a project index
+    """
+
+    def __init__(self, threshold=FUZZY_THRESHOLD):
+        """
+
+        :param threshold: a float, the similarity from which two words are the same word with a typo
+        """
+        self.threshold = threshold
+        self.organizations = {}
+        self._names = {}
+        self._blocks = {}
+
+    def __len__(self):
+        return len(self.organizations)
+
+    @staticmethod
+    def _block_keys(base):
+        """
+        The blocks of a name, such that two names of the same words up to a typo in one of them share one: for each
+        word, the other words with the first, then the last, letters of that word. Common words alone ("university
+        of") make no block, and names differing in any word may still meet.
+        """
+        words = base.split()
+        keys = []
+        for position, word in enumerate(words):
+            others = " ".join(words[:position] + ["*"] + words[position + 1:])
+            keys.append(others + " " + word[:BLOCK_AFFIX] + "-")
+            keys.append(others + " -" + word[-BLOCK_AFFIX:])
+        return keys
+
+    def _similar(self, base, other):
+        words, other_words = base.split(), other.split()
+        if len(words) != len(other_words):
+            return False
+        return all(word == other_word or self._similar_words(word, other_word)
+                   for word, other_word in zip(words, other_words))
+
+    def _similar_words(self, word, other_word):
+        matcher = SequenceMatcher(None, word, other_word)
+        # the quick ratios are upper bounds of ratio, which most words compared are far from
+        return (matcher.real_quick_ratio() >= self.threshold and matcher.quick_ratio() >= self.threshold
+                and matcher.ratio() >= self.threshold)
+
+    def _match(self, base, location):
+        """
+        The organization of the blocks of a name whose name, without its location, is the same or close enough, and
+        whose locations do not tell it apart
+        """
+        candidates = {}
+        for key in self._block_keys(base):
+            for organization in self._blocks.get(key, ()):
+                if same_place(location, organization.locations):
+                    candidates.setdefault(organization.id, organization)
+        for organization in candidates.values():
+            if organization.base == base:
+                return organization
+        for organization in candidates.values():
+            if self._similar(organization.base, base):
+                return organization
+        return None
+
+    def resolve(self, name):
+        """
+        Return the organization a name refers to, registering it the first time it is met
+
+        :param name: a string, as found in the sheet
+        :return: a RegisteredOrganization
+        """
+        key = normalize_organization_name(name)
+        organization = self._names.get(key)
+        if organization is not None:
+            return organization
+
+        base, _, location = key.partition(", ")
+        organization = self._match(base, location)
+        if organization is None:
+            identifier = "IMI-Org#" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+            organization = RegisteredOrganization(identifier, name.strip(), base, location)
+            self.organizations[identifier] = organization
+            for block_key in self._block_keys(base):
+                self._blocks.setdefault(block_key, []).append(organization)
+        else:
+            if name.strip() not in organization.aliases:
+                organization.aliases.append(name.strip())
+            if location and location not in organization.locations:
+                organization.locations.append(location)
+        self._names[key] = organization
+        # the name without its location also finds the organization
+        self._names.setdefault(base, organization)
+        return organization
+
+    def resolve_all(self, names):
+        """
+        Resolve the names of a whole sheet in the order of their normalized forms, before any project is converted,
+        so that the organizations do not depend on the order in which the names are met
+
+        :param names: an iterable of str
+        """
+        keys = {}
+        for name in names:
+            keys.setdefault(name.strip(), normalize_organization_name(name))
+        for name in sorted(keys, key=lambda name: (keys[name], name)):
+            self.resolve(name)
+
+    def register(self, name, project, role):
+        """
+        Record that an organization takes part in a project
+
+        :param name: a string
+        :param project: a string, the project identifier
+        :param role: a string, e.g. "EFPIA partner"
+        :return: a RegisteredOrganization
+        """
+        organization = self.resolve(name)
+        roles = organization.projects.setdefault(project, [])
+        if role not in roles:
+            roles.append(role)
+        return organization
+
+    def get(self, name):
+        """
+
+        :param name: a string, any of the names of an organization
+        :return: a RegisteredOrganization or None
+        """
+        key = normalize_organization_name(name)
+        organization = self._names.get(key)
+        if organization is None:
+            base, _, location = key.partition(", ")
+            organization = self._names.get(base)
+            if organization is not None and not same_place(location, organization.locations):
+                return None
+        return organization
+
+    def projects_of(self, name):
+        """
+        All the projects of an organization
+
+        :param name: a string, any of the names of an organization
+        :return: a dict of project identifier to list of roles, empty for an unknown organization
+        """
+        organization = self.get(name)
+        return organization.projects if organization is not None else {}
+
+    def to_json(self):
+        return {"organizations": {identifier: organization.to_json()
+                                  for identifier, organization in self.organizations.items()},
+                "names": {key: organization.id for key, organization in self._names.items()}}
+
+    def dump(self, f):
+        json.dump(self.to_json(), f)
+
+
+class OrganizationIndex(object):
+    """
+    Read-only lookups in an organizations.json, for the tools working on the catalogue output
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def projects_of(self, name):
+        """
+
+        :param name: a string, any of the names of an organization
+        :return: a dict of project identifier to list of roles, empty for an unknown organization
+        """
+        key = normalize_organization_name(name)
+        identifier = self.index["names"].get(key)
+        if identifier is None:
+            base, _, location = key.partition(", ")
+            identifier = self.index["names"].get(base)
+            if identifier is None or not same_place(location, self.index["organizations"][identifier]["locations"]):
+                return {}
+        return self.index["organizations"][identifier]["projects"]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="List the projects of an organization")
+    parser.add_argument("index", help="an organizations.json written by parse-ul-data.py")
+    parser.add_argument("name", help="any of the names of the organization")
+    args = parser.parse_args()
+
+    print(json.dumps(OrganizationIndex.load(args.index).projects_of(args.name), indent=2))
@@ -0,0 +1,377 @@
+"""
+Compilation of JSON schemas (draft 4) into Python functions answering whether an instance is valid.
+
+jsonschema interprets a schema for every instance: for each keyword of each subschema it looks up the keyword
+function, dispatches on the type of the instance and builds a generator of errors. Most instances are valid and
+their callers only want a yes or no, so the schema is instead turned into Python source once, with one function
+per $ref'd schema, the keywords inlined as plain tests which return False on the first failure, e.g.
+
+    def check_0(v0):
+        if not isinstance(v0, dict): return False
+        if 'title' not in v0: return False
+        if 'identifier' in v0:
+            v1 = v0['identifier']
+            if not check_1(v1): return False
+        ...
+        return True
+
+The semantics are those of the Draft4Validator of jsonschema, formats being checked by the same FormatChecker, so
+that both always agree: the detail of the errors is left to jsonschema, see dats_validation.FastValidator.
+
+    python dats_schema_compiler.py ../DATS/dats-tools/json-schemas dataset_schema.json
+
+prints the source compiled from a schema.
+"""
+from os.path import join
+from urllib.parse import unquote, urldefrag, urljoin
+import argparse
+import re
+
+TYPE_TESTS = {"object": "isinstance({v}, dict)",
+              "array": "isinstance({v}, list)",
+              "string": "isinstance({v}, str)",
+              "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+              "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+              "boolean": "isinstance({v}, bool)",
+              "null": "{v} is None"}
+
+OBJECT_KEYWORDS = ["required", "minProperties", "maxProperties", "properties", "patternProperties",
+                   "additionalProperties", "dependencies"]
+ARRAY_KEYWORDS = ["minItems", "maxItems", "uniqueItems", "items"]
+STRING_KEYWORDS = ["minLength", "maxLength", "pattern"]
+NUMBER_KEYWORDS = ["minimum", "maximum", "multipleOf"]
+
+
+class NotCompilable(Exception):
+    """
+    A schema which cannot be compiled, e.g. referring to a schema out of the store
+    """
+
+
+def _unbool(value):
+    # True == 1 and False == 0 in Python, not in JSON
+    if value is True or value is False:
+        return ("bool", value)
+    return value
+
+
+def _enum(instance, values):
+    if instance == 0 or instance == 1:
+        return any(_unbool(instance) == _unbool(value) for value in values)
+    return instance in values
+
+
+def _json_key(value):
+    # a hashable form of a JSON value, in which true differs from 1 and false from 0 at any depth, 1 == 1.0
+    if value is True or value is False:
+        return "bool", value
+    if isinstance(value, (int, float)):
+        return "number", value
+    if isinstance(value, list):
+        return "array", tuple(_json_key(item) for item in value)
+    if isinstance(value, dict):
+        return "object", frozenset((key, _json_key(item)) for key, item in value.items())
+    return "value", value
+
+
+def _unique(items):
+    keys = [_json_key(item) for item in items]
+    return len(set(keys)) == len(keys)
+
+
+def _multiple_of(instance, divisor):
+    if isinstance(divisor, float):
+        quotient = instance / divisor
+        return int(quotient) == quotient
+    return not instance % divisor
+
+
+def resolve_pointer(document, fragment):
+    """
+
+    :param document: a dict, a schema
+    :param fragment: a string, a JSON pointer such as "/definitions/date", "" for the whole document
+    :return: the subschema
+    """
+    for part in unquote(fragment).split("/")[1:] if fragment else []:
+        part = part.replace("~1", "/").replace("~0", "~")
+        if isinstance(document, list):
+            part = int(part)
+        try:
+            document = document[part]
+        except (KeyError, IndexError):
+            raise NotCompilable("Unresolvable JSON pointer %s" % fragment)
+    return document
+
+
+class SchemaCompiler(object):
+    """
+    Generates the source of the functions checking a schema and the schemas it refers to
+    """
+
+    def __init__(self, store):
+        """
+
+        :param store: a dict of schema URI to parsed schema, see dats_validation.SchemaRegistry.store
+        """
+        self.store = store
+        self.constants = []
+        self.lines = []
+        self._functions = {}
+        self._pending = []
+        self._variables = 0
+
+    def constant(self, value):
+        self.constants.append(value)
+        return "_c[%d]" % (len(self.constants) - 1)
+
+    def function_for(self, schema, base_uri, key):
+        """
+        The name of the function checking a schema, queued for generation the first time
+        """
+        name = self._functions.get(key)
+        if name is None:
+            name = self._functions[key] = "check_%d" % len(self._functions)
+            self._pending.append((name, schema, base_uri))
+        return name
+
+    def ref_function(self, ref, base_uri):
+        url, fragment = urldefrag(urljoin(base_uri, ref))
+        document = self.store.get(url)
+        if document is None:
+            raise NotCompilable("Cannot resolve %s from %s" % (ref, base_uri))
+        return self.function_for(resolve_pointer(document, fragment), url, url + "#" + fragment)
+
+    def subschema_function(self, schema, base_uri):
+        return self.function_for(schema, base_uri, ("subschema", id(schema), base_uri))
+
+    def compile(self, schema, base_uri):
+        """
+
+        :param schema: a dict
+        :param base_uri: a string, the URI of the schema, against which its $refs are resolved
+        :return: a string, the name of the function checking the schema
+        """
+        name = self.function_for(schema, base_uri, urldefrag(base_uri)[0] + "#")
+        while self._pending:
+            function_name, function_schema, function_base = self._pending.pop()
+            self._variables = 0
+            self.lines.append("def %s(v0):" % function_name)
+            self.lines.extend(self.emit(function_schema, function_base, "v0", 1))
+            self.lines.append("    return True")
+            self.lines.append("")
+        return name
+
+    def variable(self):
+        self._variables += 1
+        return "v%d" % self._variables
+
+    def emit(self, schema, base_uri, v, depth):
+        """
+        The lines checking that the value of variable v is valid against schema, returning False otherwise
+
+        :return: a list of str
+        """
+        pad = "    " * depth
+        if not isinstance(schema, dict):
+            return []
+        if isinstance(schema.get("id"), str):
+            base_uri = urljoin(base_uri, schema["id"])
+        if "$ref" in schema:
+            # as in draft 4, the other keywords of a schema with a $ref are ignored
+            return [pad + "if not %s(%s): return False" % (self.ref_function(schema["$ref"], base_uri), v)]
+
+        lines = []
+        types = schema.get("type")
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            if any(t not in TYPE_TESTS for t in types):
+                raise NotCompilable("Unknown type in %s" % types)
+            lines.append(pad + "if not (%s): return False" % " or ".join(TYPE_TESTS[t].format(v=v) for t in types))
+
+        if "enum" in schema:
+            lines.append(pad + "if not _enum(%s, %s): return False" % (v, self.constant(schema["enum"])))
+        if "format" in schema:
+            lines.append(pad + "if not _format(%s, %r): return False" % (v, schema["format"]))
+        for subschema in schema.get("allOf", []):
+            lines.extend(self.emit(subschema, base_uri, v, depth))
+        if "anyOf" in schema:
+            calls = ["%s(%s)" % (self.subschema_function(s, base_uri), v) for s in schema["anyOf"]]
+            lines.append(pad + "if not (%s): return False" % " or ".join(calls))
+        if "oneOf" in schema:
+            calls = ["%s(%s)" % (self.subschema_function(s, base_uri), v) for s in schema["oneOf"]]
+            lines.append(pad + "if (%s) != 1: return False" % " + ".join(calls))
+        if "not" in schema:
+            lines.append(pad + "if %s(%s): return False" % (self.subschema_function(schema["not"], base_uri), v))
+
+        for keywords, type_name, emit in [(OBJECT_KEYWORDS, "object", self.emit_object),
+                                          (ARRAY_KEYWORDS, "array", self.emit_array),
+                                          (STRING_KEYWORDS, "string", self.emit_string),
+                                          (NUMBER_KEYWORDS, "number", self.emit_number)]:
+            if not any(keyword in schema for keyword in keywords):
+                continue
+            if types == [type_name] or (type_name == "number" and types == ["integer"]):
+                lines.extend(emit(schema, base_uri, v, depth))
+            else:
+                # the keywords of a type only apply to the instances of that type
+                block = emit(schema, base_uri, v, depth + 1)
+                if block:
+                    lines.append(pad + "if %s:" % TYPE_TESTS[type_name].format(v=v))
+                    lines.extend(block)
+        return lines
+
+    def emit_object(self, schema, base_uri, v, depth):
+        pad = "    " * depth
+        lines = []
+        for name in schema.get("required", []):
+            lines.append(pad + "if %r not in %s: return False" % (name, v))
+        if "minProperties" in schema:
+            lines.append(pad + "if len(%s) < %d: return False" % (v, schema["minProperties"]))
+        if "maxProperties" in schema:
+            lines.append(pad + "if len(%s) > %d: return False" % (v, schema["maxProperties"]))
+
+        properties = schema.get("properties", {})
+        for name, subschema in properties.items():
+            value = self.variable()
+            block = self.emit(subschema, base_uri, value, depth + 1)
+            if block:
+                lines.append(pad + "if %r in %s:" % (name, v))
+                lines.append(pad + "    %s = %s[%r]" % (value, v, name))
+                lines.extend(block)
+
+        patterns = [re.compile(pattern) for pattern in schema.get("patternProperties", {})]
+        for pattern, subschema in zip(patterns, schema.get("patternProperties", {}).values()):
+            pattern = self.constant(pattern)
+            key, value = self.variable(), self.variable()
+            block = self.emit(subschema, base_uri, value, depth + 2)
+            if block:
+                lines.append(pad + "for %s, %s in %s.items():" % (key, value, v))
+                lines.append(pad + "    if %s.search(%s):" % (pattern, key))
+                lines.extend(block)
+
+        additional = schema.get("additionalProperties", True)
+        if additional is not True:
+            key, value = self.variable(), self.variable()
+            known = self.constant(frozenset(properties))
+            test = "%s not in %s" % (key, known)
+            if patterns:
+                test += " and not any(p.search(%s) for p in %s)" % (key, self.constant(patterns))
+            if additional is False:
+                lines.append(pad + "for %s in %s:" % (key, v))
+                lines.append(pad + "    if %s: return False" % test)
+            else:
+                block = self.emit(additional, base_uri, value, depth + 2)
+                if block:
+                    lines.append(pad + "for %s, %s in %s.items():" % (key, value, v))
+                    lines.append(pad + "    if %s:" % test)
+                    lines.extend(block)
+
+        for name, dependency in schema.get("dependencies", {}).items():
+            if isinstance(dependency, dict):
+                block = self.emit(dependency, base_uri, v, depth + 1)
+            else:
+                block = [pad + "    if %r not in %s: return False" % (required, v) for required in dependency]
+            if block:
+                lines.append(pad + "if %r in %s:" % (name, v))
+                lines.extend(block)
+        return lines
+
+    def emit_array(self, schema, base_uri, v, depth):
+        pad = "    " * depth
+        lines = []
+        if "minItems" in schema:
+            lines.append(pad + "if len(%s) < %d: return False" % (v, schema["minItems"]))
+        if "maxItems" in schema:
+            lines.append(pad + "if len(%s) > %d: return False" % (v, schema["maxItems"]))
+        if schema.get("uniqueItems"):
+            lines.append(pad + "if not _unique(%s): return False" % v)
+
+        items = schema.get("items", {})
+        if isinstance(items, dict):
+            item = self.variable()
+            block = self.emit(items, base_uri, item, depth + 1)
+            if block:
+                lines.append(pad + "for %s in %s:" % (item, v))
+                lines.extend(block)
+            return lines
+
+        for index, subschema in enumerate(items):
+            item = self.variable()
+            block = self.emit(subschema, base_uri, item, depth + 1)
+            if block:
+                lines.append(pad + "if len(%s) > %d:" % (v, index))
+                lines.append(pad + "    %s = %s[%d]" % (item, v, index))
+                lines.extend(block)
+        additional = schema.get("additionalItems", True)
+        if additional is False:
+            lines.append(pad + "if len(%s) > %d: return False" % (v, len(items)))
+        elif isinstance(additional, dict):
+            item = self.variable()
+            block = self.emit(additional, base_uri, item, depth + 1)
+            if block:
+                lines.append(pad + "for %s in %s[%d:]:" % (item, v, len(items)))
+                lines.extend(block)
+        return lines
+
+    def emit_string(self, schema, base_uri, v, depth):
+        pad = "    " * depth
+        lines = []
+        if "minLength" in schema:
+            lines.append(pad + "if len(%s) < %d: return False" % (v, schema["minLength"]))
+        if "maxLength" in schema:
+            lines.append(pad + "if len(%s) > %d: return False" % (v, schema["maxLength"]))
+        if "pattern" in schema:
+            lines.append(pad + "if not %s.search(%s): return False" % (self.constant(re.compile(schema["pattern"])), v))
+        return lines
+
+    def emit_number(self, schema, base_uri, v, depth):
+        pad = "    " * depth
+        lines = []
+        if "minimum" in schema:
+            operator = "<=" if schema.get("exclusiveMinimum", False) else "<"
+            lines.append(pad + "if %s %s %s: return False" % (v, operator, self.constant(schema["minimum"])))
+        if "maximum" in schema:
+            operator = ">=" if schema.get("exclusiveMaximum", False) else ">"
+            lines.append(pad + "if %s %s %s: return False" % (v, operator, self.constant(schema["maximum"])))
+        if "multipleOf" in schema:
+            lines.append(pad + "if not _multiple_of(%s, %s): return False" % (v, self.constant(schema["multipleOf"])))
+        return lines
+
+
+def compile_schema(schema, base_uri, store, format_checker=None):
+    """
+    Compile a schema into a function telling whether an instance is valid
+
+    :param schema: a dict, the parsed schema
+    :param base_uri: a string, the URI of the schema, e.g. file:///.../dataset_schema.json
+    :param store: a dict of schema URI to parsed schema, where $refs are looked up
+    :param format_checker: a jsonschema FormatChecker, None to ignore formats as jsonschema does without one
+    :return: a function of one argument returning a boolean, whose source attribute holds its generated source
+    :raise NotCompilable: when a $ref cannot be resolved from the store
+    """
+    compiler = SchemaCompiler(store)
+    name = compiler.compile(schema, base_uri)
+    source = "\n".join(compiler.lines)
+    namespace = {"_c": compiler.constants,
+                 "_enum": _enum,
+                 "_unique": _unique,
+                 "_multiple_of": _multiple_of,
+                 "_format": format_checker.conforms if format_checker is not None else lambda instance, f: True}
+    exec(compile(source, "<compiled %s>" % base_uri, "exec"), namespace)
+    function = namespace[name]
+    function.source = source
+    return function
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Print the Python source compiled from a JSON schema")
+    parser.add_argument("schemas", help="the directory holding the json schemas")
+    parser.add_argument("schema", help="the schema file name, e.g. dataset_schema.json")
+    args = parser.parse_args()
+
+    from dats_validation import get_registry
+
+    registry = get_registry(args.schemas)
+    print(compile_schema(registry.schemas()[args.schema], "file://" + join(registry.schemas_path, args.schema),
+                         registry.store()).source)
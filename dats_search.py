@@ -0,0 +1,437 @@
+"""
+Inverted index over the DATS catalogues written by parse-ul-data.py and parse-json-datacat-ul.py, and its queries.
+
+The index is built as a stage after the converters, from catalogues in any of the encodings of dats_formats:
+
+    python dats_search.py build output/IMI_datacatalogue_as_DATS.json output/UL_datacatalogue_as_DATS.json \
+        --index output/catalogue.idx
+    python dats_search.py query output/catalogue.idx 'diabetes AND org:novartis* -title:pilot'
+
+Terms come from the title, description, keywords, organization names, diseases and extraProperties (tags, samples
+types and the like) of every part of the catalogues. Each term is indexed on its own and, except for the
+description which makes up most of the text, qualified by its field (title:, keyword:, org:, disease:, property:).
+
+Queries combine terms with AND (implicit between terms), OR, NOT (or a leading -) and parentheses; term* matches
+every term starting with term. Matching parts are ranked by the sum over the matched terms of their weighted term
+frequency times inverse document frequency.
+
+The index file is memory-mapped by the readers. It holds, after a header, the sorted term table (fixed-size records
+giving each term and the location of its postings, searched by bisection), the postings (document number and score,
+sorted by document), and the document table (identifier and title).
+"""
+from array import array
+from bisect import bisect_left
+import argparse
+import json
+import logging
+import math
+import mmap
+import re
+import struct
+import sys
+import time
+import unicodedata
+
+import numpy as np
+
+from dats_formats import iter_catalogue
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DATSIDX1"
+# magic, number of documents, number of terms, offsets of the term strings, postings and documents
+HEADER = struct.Struct("<8sIIQQQ")
+# term offset in the term strings, term length, first posting, number of postings
+TERM = struct.Struct("<IIQI")
+POSTING = np.dtype([("doc", "<u4"), ("score", "<f4")])
+# identifier offset, identifier length, title offset, title length, in the document strings
+DOCUMENT = struct.Struct("<QIQI")
+
+FIELD_WEIGHTS = {"title": 3.0, "keyword": 2.0, "org": 2.0, "disease": 2.0, "property": 1.5, "description": 1.0}
+UNQUALIFIED_FIELDS = {"description"}
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+              "that", "the", "this", "to", "was", "were", "which", "will", "with"}
+
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_COMBINING = re.compile("[\u0300-\u036f]")
+
+
+def tokenize(text):
+    """
+
+    :param text: a string
+    :return: a list of lower case, accent-free words, stop words removed
+    """
+    if not text.isascii():
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    return [word for word in _WORDS.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def _organization_names(value):
+    if isinstance(value, list):
+        for item in value:
+            yield from _organization_names(item)
+    elif isinstance(value, dict):
+        if value.get("@type") == "Organization" and value.get("name"):
+            yield value["name"]
+        for key in ("affiliations", "creators"):
+            if key in value:
+                yield from _organization_names(value[key])
+    elif isinstance(value, str) and value:
+        # affiliations of the IMI coordinators are plain strings
+        yield value
+
+
+def _annotation_values(value):
+    if isinstance(value, list):
+        for item in value:
+            yield from _annotation_values(item)
+    elif isinstance(value, dict) and value.get("value"):
+        yield str(value["value"])
+
+
+def document_fields(part):
+    """
+    The searchable text of a part of a catalogue
+
+    :param part: a dict, the DATS JSON of a project or dataset
+    :return: a list of (field, text) tuples
+    """
+    fields = [("title", part.get("title", "")), ("description", part.get("description", ""))]
+    fields.extend(("keyword", value) for value in _annotation_values(part.get("keywords", [])))
+    fields.extend(("org", name) for name in _organization_names(part.get("creators", [])))
+    for about in part.get("isAbout", []):
+        if isinstance(about, dict) and about.get("@type") == "Disease":
+            fields.append(("disease", about.get("name", "")))
+    for properties in part.get("extraProperties", []):
+        for pair in properties if isinstance(properties, list) else [properties]:
+            fields.extend(("property", value) for value in _annotation_values(pair.get("values", [])))
+    return fields
+
+
+def part_identifier(part):
+    identifier = part.get("identifier", {})
+    return identifier.get("identifier", "") if isinstance(identifier, dict) else str(identifier)
+
+
+def build_index(catalogue_paths, index_path):
+    """
+    Index the parts of catalogues and write the index file
+
+    :param catalogue_paths: a list of catalogue files, in any encoding of dats_formats
+    :param index_path: a string
+    :return: a (number of documents, number of terms) tuple
+    """
+    term_ids = {}
+    term_column, doc_column, score_column = array("I"), array("I"), array("f")
+    documents = []
+
+    for catalogue_path in catalogue_paths:
+        _, parts = iter_catalogue(catalogue_path)
+        for part in parts:
+            doc = len(documents)
+            documents.append((part_identifier(part), part.get("title", "")))
+            scores = {}
+            for field, text in document_fields(part):
+                weight = FIELD_WEIGHTS[field]
+                qualified = field not in UNQUALIFIED_FIELDS
+                for word in tokenize(text):
+                    scores[word] = scores.get(word, 0.0) + weight
+                    if qualified:
+                        term = field + ":" + word
+                        scores[term] = scores.get(term, 0.0) + weight
+            for term, score in scores.items():
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(term_ids)
+                term_column.append(term_id)
+                doc_column.append(doc)
+                score_column.append(score)
+
+    terms = sorted(term_ids)
+    rank = np.empty(len(terms), dtype=np.uint32)
+    for position, term in enumerate(terms):
+        rank[term_ids[term]] = position
+
+    term_ranks = rank[np.frombuffer(term_column, dtype=np.uint32)]
+    del term_column
+    postings = np.empty(len(term_ranks), dtype=POSTING)
+    postings["doc"] = np.frombuffer(doc_column, dtype=np.uint32)
+    postings["score"] = np.frombuffer(score_column, dtype=np.float32)
+    del doc_column, score_column
+    # documents are numbered in order, so a stable sort on the term keeps the postings of a term sorted by document
+    order = np.argsort(term_ranks, kind="stable")
+    postings = postings[order]
+    counts = np.bincount(term_ranks, minlength=len(terms)) if len(terms) else np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(terms) else counts
+
+    term_strings = bytearray()
+    term_table = bytearray()
+    for term, start, count in zip(terms, starts.tolist(), counts.tolist()):
+        encoded = term.encode("utf-8")
+        term_table += TERM.pack(len(term_strings), len(encoded), start, count)
+        term_strings += encoded
+
+    document_strings = bytearray()
+    document_table = bytearray()
+    for identifier, title in documents:
+        identifier, title = identifier.encode("utf-8"), title.encode("utf-8")
+        document_table += DOCUMENT.pack(len(document_strings), len(identifier),
+                                        len(document_strings) + len(identifier), len(title))
+        document_strings += identifier + title
+
+    strings_offset = HEADER.size + len(term_table)
+    postings_offset = strings_offset + len(term_strings)
+    postings_offset += -postings_offset % POSTING.itemsize
+    documents_offset = postings_offset + postings.nbytes
+    with open(index_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(documents), len(terms), strings_offset, postings_offset, documents_offset))
+        f.write(term_table)
+        f.write(term_strings)
+        f.write(b"\0" * (postings_offset - strings_offset - len(term_strings)))
+        f.write(postings.tobytes())
+        f.write(document_table)
+        f.write(document_strings)
+
+    return len(documents), len(terms)
+
+
+class SearchIndex(object):
+    """
+    A memory-mapped index file, see build_index
+    """
+
+    def __init__(self, index_path):
+        """
+
+        :param index_path: a string
+        """
+        with open(index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.documents, self.terms, self._strings, self._postings, self._documents = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a catalogue search index" % index_path)
+        self._document_strings = self._documents + self.documents * DOCUMENT.size
+        self._term_keys = _TermKeys(self)
+
+    def close(self):
+        self._mmap.close()
+
+    def term(self, position):
+        offset, length, _, _ = TERM.unpack_from(self._mmap, HEADER.size + position * TERM.size)
+        return self._mmap[self._strings + offset:self._strings + offset + length].decode("utf-8")
+
+    def postings(self, position):
+        """
+
+        :param position: an int, the rank of a term in the term table
+        :return: a numpy array of (doc, score) records, a view on the file
+        """
+        _, _, start, count = TERM.unpack_from(self._mmap, HEADER.size + position * TERM.size)
+        return np.frombuffer(self._mmap, dtype=POSTING, count=count,
+                             offset=self._postings + start * POSTING.itemsize)
+
+    def find(self, term, prefix=False, max_expansions=10000):
+        """
+
+        :param term: a string
+        :param prefix: a boolean, True for all the terms starting with term
+        :return: a list of term positions
+        """
+        position = bisect_left(self._term_keys, term)
+        if not prefix:
+            return [position] if position < self.terms and self.term(position) == term else []
+        positions = []
+        while position < self.terms and len(positions) < max_expansions and self.term(position).startswith(term):
+            positions.append(position)
+            position += 1
+        return positions
+
+    def document(self, doc):
+        """
+
+        :param doc: an int
+        :return: an (identifier, title) tuple
+        """
+        id_offset, id_length, title_offset, title_length = DOCUMENT.unpack_from(self._mmap,
+                                                                                self._documents + doc * DOCUMENT.size)
+        base = self._document_strings
+        return (self._mmap[base + id_offset:base + id_offset + id_length].decode("utf-8"),
+                self._mmap[base + title_offset:base + title_offset + title_length].decode("utf-8"))
+
+    def match(self, term, prefix=False):
+        """
+
+        :param term: a string, possibly qualified by a field, e.g. "org:novartis"
+        :param prefix: a boolean
+        :return: a (mask, scores) tuple of arrays over the documents
+        """
+        mask = np.zeros(self.documents, dtype=bool)
+        scores = np.zeros(self.documents, dtype=np.float32)
+        for position in self.find(term, prefix):
+            postings = self.postings(position)
+            idf = math.log(1.0 + self.documents / float(len(postings)))
+            mask[postings["doc"]] = True
+            scores[postings["doc"]] += postings["score"] * idf
+        return mask, scores
+
+    def search(self, query, limit=20):
+        """
+
+        :param query: a string, see parse_query
+        :param limit: an int, the number of results, None for all
+        :return: a list of (identifier, title, score) tuples, best first
+        """
+        mask, scores = evaluate(parse_query(query), self)
+        docs = np.flatnonzero(mask)
+        ranked = docs[np.argsort(-scores[docs], kind="stable")]
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.document(doc) + (float(scores[doc]),) for doc in ranked.tolist()]
+
+
+class _TermKeys(object):
+    """
+    The sorted terms of an index as a sequence, for bisect
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.terms
+
+    def __getitem__(self, position):
+        return self.index.term(position)
+
+
+_QUERY_TOKENS = re.compile(r'\s*(\(|\)|-|[^\s()]+)')
+
+
+def parse_query(query):
+    """
+    Parse a query into a tree of ("and", a, b), ("or", a, b), ("not", a) and ("term", term, prefix) nodes
+
+    :param query: a string, e.g. 'diabetes AND (org:novartis* OR org:sanofi*) NOT mouse'
+    :return: a tuple
+    """
+    tokens = [token for token in _QUERY_TOKENS.findall(query) if token]
+    position = [0]
+
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else None
+
+    def take():
+        position[0] += 1
+        return tokens[position[0] - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in (")", "OR"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() in ("NOT", "-"):
+            take()
+            return ("not", parse_not())
+        if peek() == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Unbalanced parentheses in %r" % query)
+            take()
+            return node
+        if peek() is None or peek() == ")":
+            raise ValueError("Incomplete query %r" % query)
+        return parse_term(take())
+
+    def parse_term(token):
+        prefix = token.endswith("*")
+        field, _, text = token.rstrip("*").rpartition(":")
+        words = tokenize(text)
+        if not words:
+            raise ValueError("Nothing to search for in %r" % token)
+        node = None
+        for i, word in enumerate(words):
+            term = ("term", (field.lower() + ":" if field else "") + word, prefix and i == len(words) - 1)
+            node = term if node is None else ("and", node, term)
+        return node
+
+    if not tokens:
+        raise ValueError("Empty query")
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError("Unexpected %r in %r" % (peek(), query))
+    return node
+
+
+def evaluate(node, index):
+    """
+
+    :param node: a query tree, see parse_query
+    :param index: a SearchIndex
+    :return: a (mask, scores) tuple of arrays over the documents
+    """
+    kind = node[0]
+    if kind == "term":
+        return index.match(node[1], node[2])
+    if kind == "not":
+        mask, _ = evaluate(node[1], index)
+        return ~mask, np.zeros(index.documents, dtype=np.float32)
+    left_mask, left_scores = evaluate(node[1], index)
+    right_mask, right_scores = evaluate(node[2], index)
+    mask = left_mask & right_mask if kind == "and" else left_mask | right_mask
+    return mask, (left_scores + right_scores) * mask
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Build and query a search index over DATS catalogues")
+    commands = parser.add_subparsers(dest="command")
+    build_parser = commands.add_parser("build", help="index catalogues")
+    build_parser.add_argument("catalogues", nargs="+", help="catalogue files, in any encoding of dats_formats")
+    build_parser.add_argument("--index", default="output/catalogue.idx", help="the index file to write")
+    query_parser = commands.add_parser("query", help="search an index")
+    query_parser.add_argument("index", help="an index file written by build")
+    query_parser.add_argument("query", help="e.g. 'diabetes AND org:novartis*'")
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        documents, terms = build_index(args.catalogues, args.index)
+        logger.info("%d documents, %d terms indexed into %s in %.2fs", documents, terms, args.index,
+                    time.perf_counter() - start)
+    elif args.command == "query":
+        index = SearchIndex(args.index)
+        start = time.perf_counter()
+        try:
+            results = index.search(args.query, args.limit)
+        except ValueError as e:
+            parser.error(str(e))
+        elapsed = time.perf_counter() - start
+        if args.json:
+            print(json.dumps([{"identifier": identifier, "title": title, "score": score}
+                              for identifier, title, score in results], indent=2))
+        else:
+            for identifier, title, score in results:
+                print("%8.2f  %s  %s" % (score, identifier, title))
+        logger.info("%d results in %.1f ms", len(results), elapsed * 1000)
+    else:
+        parser.print_help()
+        sys.exit(1)
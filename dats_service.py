@@ -0,0 +1,413 @@
+"""
+Resident conversion, validation and JSON-LD service, for callers which cannot pay for a new process on every
+request, such as a curation UI validating on save.
+
+The schemas and their validators (dats_validation), the JSON-LD contexts (dats_jsonld), pandas and the converter
+scripts are loaded once when the service starts. Jobs run on a bounded pool of worker threads; when all the
+workers are busy and --max-queue jobs already wait, new jobs are turned down with 503 rather than queued without
+limit. The service listens on a local TCP port or on a Unix socket:
+
+    python dats_service.py --port 8765 [--workers 4] [--max-queue 64]
+    python dats_service.py --unix-socket /tmp/dats.sock
+
+    POST /validate[?schema=...&max_errors=N]      a DATS JSON document -> {"valid": ..., "errors": [...]}
+    POST /jsonld                                   a DATS JSON document -> its JSON-LD
+    POST /convert?source=imi                       an IMIPROJECTS csv -> the DATS catalogue
+    POST /convert?source=records                   a records.json export -> the DATS catalogue
+    GET  /metrics                                  latency percentiles per endpoint, queue depth, jobs in flight
+    GET  /health
+
+e.g.
+
+    curl --unix-socket /tmp/dats.sock --data-binary @output/IMI_datacatalogue_as_DATS.json localhost/validate
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from dats_instrumentation import stop_report
+from dats_jsonld import ContextNotCachedError, JsonLdAnnotator, get_context_cache, load_context_mapping
+from dats_validation import get_registry
+
+logger = logging.getLogger(__name__)
+
+LOCAL = os.path.dirname(os.path.realpath(__file__))
+DATS_schemasPath = os.path.join(LOCAL, "../DATS/dats-tools/json-schemas")
+DATS_contextsPath = os.path.join(LOCAL, "../DATS/dats-tools/json-contexts")
+
+CONVERTERS = {"imi": "parse-ul-data.py", "records": "parse-json-datacat-ul.py"}
+
+# latencies kept per endpoint for the percentiles of /metrics
+LATENCY_WINDOW = 1024
+
+
+class ServiceBusy(Exception):
+    """
+    All the workers are busy and the queue is full
+    """
+
+
+class ServiceMetrics(object):
+    """
+    Request latencies per endpoint, over the last LATENCY_WINDOW requests, and the state of the job queue
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {}
+        self._errors = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.started = time.time()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def job_queued(self):
+        with self._lock:
+            self.queued += 1
+
+    def job_started(self):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def job_done(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def job_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def to_json(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                endpoints[endpoint] = {"requests": self._counts[endpoint],
+                                       "errors": self._errors.get(endpoint, 0),
+                                       "p50_ms": round(percentile(ordered, 0.5) * 1000, 3),
+                                       "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+                                       "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+                                       "max_ms": round(ordered[-1] * 1000, 3)}
+            return {"uptime_seconds": round(time.time() - self.started, 3),
+                    "queue_depth": self.queued,
+                    "in_flight": self.in_flight,
+                    "rejected": self.rejected,
+                    "endpoints": endpoints}
+
+
+def percentile(ordered, fraction):
+    """
+
+    :param ordered: a sorted, non-empty list of numbers
+    :param fraction: a float between 0 and 1
+    :return: the nearest-rank percentile
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class JobPool(object):
+    """
+    A pool of worker threads in front of a queue of at most max_queue jobs
+    """
+
+    def __init__(self, workers, max_queue, metrics):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dats-worker")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def run(self, function, *args):
+        """
+        Run a job on a worker and wait for its result
+
+        :raise ServiceBusy: when the pool cannot take one more job
+        """
+        if not self._slots.acquire(blocking=False):
+            self.metrics.job_rejected()
+            raise ServiceBusy("%d jobs running and %d queued" % (self.workers, self.max_queue))
+        self.metrics.job_queued()
+        try:
+            return self._executor.submit(self._job, function, args).result()
+        finally:
+            self._slots.release()
+
+    def _job(self, function, args):
+        self.metrics.job_started()
+        try:
+            return function(*args)
+        finally:
+            # a job which started a RunReport must not leave it to the next job of the thread
+            stop_report()
+            self.metrics.job_done()
+
+    def warm(self, function):
+        """
+        Start every worker thread and run function in each, e.g. to build its validators
+
+        :param function: a callable taking no argument
+        """
+        barrier = threading.Barrier(self.workers)
+
+        def warm_worker():
+            function()
+            # hold the thread until all the others have started, so that each job lands on a new thread
+            barrier.wait()
+
+        for future in [self._executor.submit(warm_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def load_converter(script_name):
+    """
+    Load a converter script (whose name is not importable as such) as a module, without running its main
+
+    :param script_name: a string, one of the values of CONVERTERS
+    :return: a module
+    """
+    module_name = os.path.splitext(script_name)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(LOCAL, script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class DatsService(object):
+    """
+    The jobs of the service, with everything they need loaded once
+    """
+
+    def __init__(self, schemas_path=DATS_schemasPath, context_mapping="dats_context_mapping.json",
+                 embed_contexts=False, contexts_path=DATS_contextsPath):
+        """
+
+        :param schemas_path: a string, the directory holding the DATS json schemas
+        :param context_mapping: a string, the DATS context mapping file, None for no JSON-LD
+        :param embed_contexts: a boolean, True to embed the JSON-LD contexts instead of their URL
+        :param contexts_path: a string, local copies of the JSON-LD contexts to seed the context cache with
+        """
+        self.registry = get_registry(schemas_path)
+        self.context_mapping = context_mapping
+        self.embed_contexts = embed_contexts
+        self.contexts_path = contexts_path
+        self.annotator = None
+        self.converters = {}
+
+    def warm(self):
+        """
+        Load the schemas, the JSON-LD contexts and the converters
+        """
+        start = time.perf_counter()
+        self.registry.schemas()
+        if self.context_mapping is not None and os.path.isfile(self.context_mapping):
+            mapping = load_context_mapping(self.context_mapping)
+            contexts = None
+            if self.embed_contexts:
+                contexts = get_context_cache()
+                if os.path.isdir(self.contexts_path):
+                    contexts.seed(self.contexts_path, mapping.values())
+            self.annotator = JsonLdAnnotator(mapping, contexts=contexts)
+        for source, script_name in CONVERTERS.items():
+            self.converters[source] = load_converter(script_name)
+        # the converters import pandas on first use
+        importlib.import_module("pandas")
+        logger.info("service warmed up in %.2fs", time.perf_counter() - start)
+
+    def warm_worker(self):
+        """
+        Build the validators of dataset_schema.json in the calling worker thread, see SchemaRegistry.get_validator
+        """
+        self.registry.get_fast_validator("dataset_schema.json")
+        self.registry.get_validator("dataset_schema.json")
+
+    def validate(self, instance, schema_filename="dataset_schema.json", max_errors=None):
+        """
+
+        :param instance: a dict, a DATS JSON document
+        :param schema_filename: a string
+        :param max_errors: an int, to report only the first max_errors errors
+        :return: a dict, whether the instance is valid and its errors, as dats_validation.validate_file
+        """
+        validator = self.registry.get_fast_validator(schema_filename)
+        errors = sorted(validator.errors(instance, max_errors), key=lambda e: [str(p) for p in e.absolute_path])
+        return {"valid": len(errors) == 0,
+                "errors": [{"path": list(error.absolute_path),
+                            "schema_path": list(error.absolute_schema_path),
+                            "message": error.message} for error in errors]}
+
+    def jsonld(self, instance):
+        """
+
+        :param instance: a dict, a DATS JSON catalogue
+        :return: a dict, its JSON-LD
+        """
+        if self.annotator is None:
+            raise ValueError("no context mapping, the service cannot produce JSON-LD")
+        return self.annotator.annotate(instance)
+
+    def convert(self, source, body):
+        """
+
+        :param source: a string, "imi" for an IMIPROJECTS csv, "records" for a records.json export
+        :param body: bytes, the content of the input file
+        :return: a dict, the DATS JSON catalogue
+        """
+        if source not in CONVERTERS:
+            raise ValueError("Unknown source %s, expected one of %s" % (source, ", ".join(CONVERTERS)))
+        converter = self.converters.get(source) or load_converter(CONVERTERS[source])
+        if source == "imi":
+            import pandas as pd
+
+            projects = list(converter.build_imi_projects(pd.read_csv(io.BytesIO(body))))
+            return converter.build_imi_catalogue(projects).toJSON()
+        records = converter.iter_records(io.StringIO(body.decode("utf-8")))
+        return converter.build_catalogue(list(converter.build_datasets(records))).toJSON()
+
+
+class DatsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes the requests to the jobs of the DatsService of the server, through its JobPool
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        endpoint = urlsplit(self.path).path
+        if endpoint == "/metrics":
+            self._reply(200, self.server.metrics.to_json())
+        elif endpoint == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": "unknown endpoint %s" % endpoint})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        endpoint = url.path
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status = 200
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            service = self.server.service
+            if url.path == "/validate":
+                max_errors = int(query["max_errors"]) if "max_errors" in query else None
+                result = self.server.pool.run(service.validate, json.loads(body),
+                                              query.get("schema", "dataset_schema.json"), max_errors)
+            elif url.path == "/jsonld":
+                result = self.server.pool.run(service.jsonld, json.loads(body))
+            elif url.path == "/convert":
+                result = self.server.pool.run(service.convert, query.get("source", ""), body)
+            else:
+                endpoint = "other"
+                status, result = 404, {"error": "unknown endpoint %s" % url.path}
+        except ServiceBusy as e:
+            status, result = 503, {"error": str(e)}
+        except ContextNotCachedError as e:
+            status, result = 502, {"error": str(e)}
+        except ValueError as e:
+            status, result = 400, {"error": str(e)}
+        except IOError as e:
+            status, result = 404, {"error": str(e)}
+        except Exception as e:
+            logger.exception("%s failed", self.path)
+            status, result = 500, {"error": str(e)}
+        self.server.metrics.record(endpoint, time.perf_counter() - start, error=status != 200)
+        self._reply(status, result)
+
+    def _reply(self, status, result):
+        content = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # the client address of a Unix socket is empty
+        logger.debug(format, *args)
+
+
+class TcpDatsRequestHandler(DatsRequestHandler):
+    # the headers and the body of a reply are written separately: without TCP_NODELAY, the body waits for the
+    # delayed ACK of the headers, some 40 ms
+    disable_nagle_algorithm = True
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, pool, port=8765, host="127.0.0.1", unix_socket=None):
+    """
+
+    :param service: a DatsService
+    :param pool: a JobPool
+    :param port: an int, the TCP port, 0 for any free port
+    :param host: a string
+    :param unix_socket: a string, the path of a Unix socket to listen on instead of the TCP port
+    :return: a server, to serve_forever
+    """
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, DatsRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), TcpDatsRequestHandler)
+    server.service = service
+    server.pool = pool
+    server.metrics = pool.metrics
+    return server
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Serve DATS conversion, validation and JSON-LD jobs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--unix-socket", default=None, help="listen on this Unix socket instead of the TCP port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="jobs run at the same time")
+    parser.add_argument("--max-queue", type=int, default=64, help="jobs waiting for a worker before turning down")
+    parser.add_argument("--schemas", default=DATS_schemasPath, help="the directory holding the DATS json schemas")
+    parser.add_argument("--context-mapping", default="dats_context_mapping.json",
+                        help="the DATS context mapping file used for JSON-LD")
+    parser.add_argument("--embed-contexts", action="store_true",
+                        help="embed the JSON-LD contexts, read from the local context cache, instead of their URL")
+    args = parser.parse_args()
+
+    dats_service = DatsService(args.schemas, args.context_mapping, args.embed_contexts)
+    dats_service.warm()
+    job_pool = JobPool(args.workers, args.max_queue, ServiceMetrics())
+    job_pool.warm(dats_service.warm_worker)
+    http_server = make_server(dats_service, job_pool, args.port, args.host, args.unix_socket)
+    logger.info("listening on %s", args.unix_socket or "%s:%d" % (args.host, http_server.server_address[1]))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        job_pool.shutdown()
@@ -0,0 +1,533 @@
+"""
+Process-wide registry of the DATS JSON schemas and of the validators built from them.
+
+The schemas of a directory are parsed once and handed to the RefResolver as its store, so that $refs are
+resolved from memory. Validators are cached by schema file name and modification time.
+
+Most instances are valid, so each schema is also compiled into a plain Python function (see dats_schema_compiler):
+the FastValidator answers from it and only asks jsonschema for the detail of the errors of invalid instances.
+
+The schemas themselves are checked against the JSON schema meta-schema by check_schemas, the outcome of each file
+cached on disk by content hash, so that checking an unchanged schema directory reads no more than its files:
+
+    python dats_validation.py --check-schemas [--schemas ../DATS/dats-tools/json-schemas]
+
+Run as a script to validate a whole directory of DATS instances across a process pool:
+
+    python dats_validation.py output/ --processes 8 --summary validation.json
+"""
+from os import listdir
+from os.path import isfile, join
+from urllib.parse import urldefrag
+from dats_instrumentation import stage
+from itertools import islice
+import argparse
+import glob
+import hashlib
+import importlib.util
+import logging
+import json
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_CHECKS = os.path.join(os.path.expanduser("~"), ".cache", "imi-datacatalogue", "schema-checks.json")
+
+
+class FastValidator(object):
+    """
+    A validator answering from the function compiled from its schema, with the interface of the Draft4Validator
+    """
+
+    def __init__(self, registry, schema_filename, check):
+        """
+
+        :param registry: the SchemaRegistry, whose Draft4Validator details the errors
+        :param schema_filename: a string, e.g. "dataset_schema.json"
+        :param check: a function telling whether an instance is valid, None when the schema could not be compiled
+        """
+        self.registry = registry
+        self.schema_filename = schema_filename
+        self._check = check
+
+    def is_valid(self, instance):
+        if self._check is None:
+            return self.registry.get_validator(self.schema_filename).is_valid(instance)
+        return self._check(instance)
+
+    def iter_errors(self, instance):
+        if self.is_valid(instance):
+            return iter(())
+        return self._checked_errors(self.registry.get_validator(self.schema_filename).iter_errors(instance))
+
+    def _checked_errors(self, errors):
+        found = False
+        for error in errors:
+            found = True
+            yield error
+        if not found:
+            # only a bug of the compiled function makes it reject what jsonschema accepts
+            logger.warning("%s: the compiled check rejects an instance jsonschema finds valid",
+                           self.schema_filename)
+
+    def errors(self, instance, max_errors=None):
+        """
+
+        :param instance: the instance to validate
+        :param max_errors: an int, to stop looking for errors after the first max_errors, all by default
+        :return: a list of ValidationError, in the order jsonschema finds them, empty when the instance is valid
+        """
+        return list(islice(self.iter_errors(instance), max_errors))
+
+    def validate(self, instance):
+        for error in self.iter_errors(instance):
+            raise error
+
+
+class PartValidator(object):
+    """
+    Validate a catalogue while it is written, one part at a time, so that it is never held in memory whole: each
+    part against the schema, as hasPart items are, then the envelope without its parts
+    """
+
+    def __init__(self, validator, max_errors=None):
+        """
+
+        :param validator: a FastValidator, or any validator with its errors method
+        :param max_errors: an int, to stop validating after the first max_errors errors, all by default
+        """
+        self.validator = validator
+        self.max_errors = max_errors
+        self.parts = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def _check(self, instance, where):
+        if self.max_errors is not None and self.errors >= self.max_errors:
+            return None
+        remaining = None if self.max_errors is None else self.max_errors - self.errors
+        with stage("validation", items=1):
+            errors = self.validator.errors(instance, remaining)
+        for error in sorted(errors, key=lambda e: [str(p) for p in e.absolute_path]):
+            logger.error("%s%s: %s", where, "".join("[%r]" % p for p in error.absolute_path), error.message)
+        self.errors += len(errors)
+        return not errors
+
+    def check_part(self, part_json):
+        """
+        Validate the JSON of a part, see write_catalogue
+
+        :param part_json: a dict
+        """
+        valid = self._check(part_json, "hasPart[%d]" % self.parts)
+        if valid is None:
+            self.skipped += 1
+        elif not valid:
+            self.invalid += 1
+        self.parts += 1
+
+    def check_envelope(self, envelope):
+        """
+        Validate the catalogue itself, with its hasPart empty
+
+        :param envelope: a dict
+        :return: boolean, whether the envelope and all the parts checked so far are valid
+        """
+        return self._check(envelope, "catalogue") is not False and self.invalid == 0
+
+
+class SchemaRegistry(object):
+    """
+    The parsed JSON schemas of one directory and the validators built from them
+    """
+
+    def __init__(self, schemas_path):
+        """
+
+        :param schemas_path: a string, the directory holding the json schemas
+        """
+        self.schemas_path = os.path.realpath(schemas_path)
+        self._lock = threading.RLock()
+        self._signature = None
+        self._mtimes = {}
+        self._schemas = {}
+        self._store = {}
+        self._compiled = {}
+        self._local = threading.local()
+
+    def _current_signature(self):
+        files = sorted(f for f in listdir(self.schemas_path) if isfile(join(self.schemas_path, f)))
+        return tuple((f, os.stat(join(self.schemas_path, f)).st_mtime_ns) for f in files)
+
+    def _refresh(self):
+        """
+        (Re)load the schemas if the directory content changed since they were last read
+        """
+        signature = self._current_signature()
+        if signature == self._signature:
+            return
+
+        with stage("schema_loading", items=len(signature)):
+            self._load(signature)
+
+    def _load(self, signature):
+        schemas = {}
+        store = {}
+        for schema_filename, _ in signature:
+            logger.debug("Loading schema %s", schema_filename)
+            with open(join(self.schemas_path, schema_filename), 'r') as schema_file:
+                schema = json.load(schema_file)
+            schemas[schema_filename] = schema
+            store['file://' + join(self.schemas_path, schema_filename)] = schema
+            if 'id' in schema:
+                store[urldefrag(schema['id'])[0]] = schema
+
+        self._schemas = schemas
+        self._store = store
+        self._compiled = {}
+        self._mtimes = dict(signature)
+        self._signature = signature
+
+    def schemas(self):
+        """
+
+        :return: a dict of schema file name to parsed schema
+        """
+        with self._lock:
+            self._refresh()
+            return self._schemas
+
+    def store(self):
+        """
+
+        :return: a dict of schema URI (both its id and its file:// location) to parsed schema
+        """
+        with self._lock:
+            self._refresh()
+            return self._store
+
+    def get_validator(self, schema_filename):
+        """
+        Return the Draft4Validator of a schema, building it only the first time the calling thread asks for it: the
+        RefResolver of a validator keeps the scope of the $ref being resolved, so threads cannot share validators
+
+        :param schema_filename: a string, e.g. "dataset_schema.json"
+        :return: a Draft4Validator
+        """
+        with self._lock:
+            self._refresh()
+            if schema_filename not in self._mtimes:
+                raise IOError("No schema %s in %s" % (schema_filename, self.schemas_path))
+            if getattr(self._local, "signature", None) != self._signature:
+                self._local.validators = {}
+                self._local.signature = self._signature
+            validator = self._local.validators.get(schema_filename)
+            if validator is None:
+                # imported here, the converters only pay for it when they validate
+                from jsonschema import RefResolver, Draft4Validator, FormatChecker
+
+                with stage("schema_loading"):
+                    schema = self._schemas[schema_filename]
+                    resolver = RefResolver(base_uri='file://' + join(self.schemas_path, schema_filename),
+                                           referrer=schema, store=self._store)
+                    validator = Draft4Validator(schema, resolver=resolver, format_checker=FormatChecker())
+                self._local.validators[schema_filename] = validator
+            return validator
+
+    def get_fast_validator(self, schema_filename):
+        """
+        Return the FastValidator of a schema, compiling the schema only the first time: the compiled functions
+        hold no state, all threads share them
+
+        :param schema_filename: a string, e.g. "dataset_schema.json"
+        :return: a FastValidator
+        """
+        with self._lock:
+            self._refresh()
+            if schema_filename not in self._mtimes:
+                raise IOError("No schema %s in %s" % (schema_filename, self.schemas_path))
+            validator = self._compiled.get(schema_filename)
+            if validator is None:
+                from jsonschema import FormatChecker
+                from dats_schema_compiler import NotCompilable, compile_schema
+
+                with stage("schema_loading"):
+                    try:
+                        check = compile_schema(self._schemas[schema_filename],
+                                               'file://' + join(self.schemas_path, schema_filename), self._store,
+                                               FormatChecker())
+                    except NotCompilable as e:
+                        logger.warning("Cannot compile %s, validating with jsonschema: %s", schema_filename, e)
+                        check = None
+                validator = self._compiled[schema_filename] = FastValidator(self, schema_filename, check)
+            return validator
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(schemas_path):
+    """
+    Return the process-wide SchemaRegistry of a schema directory
+
+    :param schemas_path: a string
+    :return: a SchemaRegistry
+    """
+    key = os.path.realpath(schemas_path)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = SchemaRegistry(key)
+            _registries[key] = registry
+        return registry
+
+
+def find_instances(location):
+    """
+    List the JSON instances to validate
+
+    :param location: a string, either a directory (all its *.json files) or a glob pattern, or a list of file paths
+    :return: a sorted list of file paths
+    """
+    if isinstance(location, (list, tuple)):
+        return sorted(location)
+    if os.path.isdir(location):
+        location = join(location, "*.json")
+    return sorted(path for path in glob.glob(location) if isfile(path))
+
+
+_worker_registry = None
+
+
+def _init_worker(schemas_path, schema_filename):
+    """
+    Process pool initializer: load the schemas and build the validator once per worker
+    """
+    global _worker_registry
+    _worker_registry = get_registry(schemas_path)
+    _worker_registry.get_fast_validator(schema_filename)
+
+
+def validate_file(instance_path, schema_filename, registry=None, max_errors=None):
+    """
+    Validate one JSON instance and describe the outcome
+
+    :param instance_path: a string
+    :param schema_filename: a string, e.g. "dataset_schema.json"
+    :param registry: a SchemaRegistry, the one of the worker process by default
+    :param max_errors: an int, to report only the first max_errors errors of an invalid instance
+    :return: a dict with the file, whether it is valid, its errors and the time spent on it
+    """
+    start = time.perf_counter()
+    registry = registry or _worker_registry
+    result = {"file": instance_path, "valid": False, "errors": []}
+    try:
+        with open(instance_path) as instance_file:
+            instance = json.load(instance_file)
+        validator = registry.get_fast_validator(schema_filename)
+        errors = sorted(validator.errors(instance, max_errors), key=lambda e: [str(p) for p in e.absolute_path])
+        result["errors"] = [{"path": list(error.absolute_path),
+                             "schema_path": list(error.absolute_schema_path),
+                             "message": error.message} for error in errors]
+        result["valid"] = len(errors) == 0
+    except (IOError, ValueError) as e:
+        result["errors"] = [{"path": [], "schema_path": [], "message": str(e)}]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def validate_files(location, schemas_path, schema_filename="dataset_schema.json", processes=None, max_errors=None):
+    """
+    Validate a directory or glob of JSON instances across a pool of processes
+
+    :param location: a string, a directory or a glob pattern, or a list of file paths
+    :param schemas_path: a string, the directory holding the json schemas
+    :param schema_filename: a string, the schema every instance is validated against
+    :param processes: an int, the number of worker processes (all CPUs by default, 1 to stay in process)
+    :param max_errors: an int, to report only the first max_errors errors of each invalid instance
+    :return: a dict summarizing the run, with one entry per file under "files"
+    """
+    start = time.perf_counter()
+    paths = find_instances(location)
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1 or len(paths) <= 1:
+        registry = get_registry(schemas_path)
+        results = [validate_file(path, schema_filename, registry, max_errors) for path in paths]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(paths) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(schemas_path, schema_filename)) as executor:
+            results = list(executor.map(validate_file, paths, [schema_filename] * len(paths), [None] * len(paths),
+                                        [max_errors] * len(paths), chunksize=chunksize))
+
+    valid = sum(1 for result in results if result["valid"])
+    return {"schema": schema_filename,
+            "valid": valid,
+            "invalid": len(results) - valid,
+            "seconds": time.perf_counter() - start,
+            "files": results}
+
+
+def _check_schema(schema_filename, content):
+    """
+    Check one schema against the draft 4 meta-schema
+
+    :param schema_filename: a string
+    :param content: bytes, the content of the schema file
+    :return: a dict with the file, whether it is a valid schema and its errors
+    """
+    from jsonschema import Draft4Validator
+
+    try:
+        schema = json.loads(content.decode("utf-8"))
+        errors = sorted(Draft4Validator(Draft4Validator.META_SCHEMA).iter_errors(schema),
+                        key=lambda e: [str(p) for p in e.absolute_path])
+        errors = ["%s: %s" % ("/".join(str(p) for p in error.absolute_path), error.message) for error in errors]
+    except ValueError as e:
+        errors = [str(e)]
+    return {"file": schema_filename, "valid": len(errors) == 0, "errors": errors}
+
+
+def _checker_version():
+    """
+    The version of jsonschema, read from the name of its installed metadata rather than by importing it (or
+    importlib.metadata), which would cost more than checking cached schemas
+    """
+    spec = importlib.util.find_spec("jsonschema")
+    if spec is not None and spec.origin:
+        site_packages = os.path.dirname(os.path.dirname(spec.origin))
+        for metadata in glob.glob(join(site_packages, "jsonschema-*.*-info")):
+            return "Draft4Validator " + os.path.splitext(os.path.basename(metadata))[0]
+    import jsonschema
+
+    return "Draft4Validator jsonschema-" + jsonschema.__version__
+
+
+def _load_schema_checks(cache_path):
+    if cache_path is None or not isfile(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        logger.warning("Ignoring the corrupt schema check cache %s", cache_path)
+        return {}
+
+
+def _save_schema_checks(cache_path, checks):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    with open(cache_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(checks, f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+
+def check_schemas(schemas_path, processes=None, cache_path=DEFAULT_SCHEMA_CHECKS):
+    """
+    Check every file of a schema directory against the draft 4 meta-schema, all of them even after a failure
+
+    The outcome of each file is cached in cache_path under the sha256 of its content and the version of jsonschema:
+    only the files not checked before are, across a pool of processes.
+
+    :param schemas_path: a string, the directory holding the json schemas
+    :param processes: an int, the number of worker processes (all CPUs by default, 1 to stay in process)
+    :param cache_path: a string, the JSON file caching the outcomes, None not to cache them
+    :return: a dict summarizing the run, with one entry per file under "files"
+    """
+    start = time.perf_counter()
+    contents = {}
+    for schema_filename in sorted(f for f in listdir(schemas_path) if isfile(join(schemas_path, f))):
+        with open(join(schemas_path, schema_filename), 'rb') as f:
+            contents[schema_filename] = f.read()
+    digests = {name: hashlib.sha256(content).hexdigest() for name, content in contents.items()}
+
+    checks = _load_schema_checks(cache_path)
+    version = _checker_version()
+    known = checks.setdefault(version, {})
+    pending = [name for name in contents if digests[name] not in known]
+
+    if pending:
+        processes = processes or os.cpu_count() or 1
+        if processes == 1 or len(pending) <= 1:
+            results = [_check_schema(name, contents[name]) for name in pending]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=min(processes, len(pending))) as executor:
+                results = list(executor.map(_check_schema, pending, [contents[name] for name in pending],
+                                            chunksize=max(1, len(pending) // (processes * 4))))
+        for name, result in zip(pending, results):
+            known[digests[name]] = {"valid": result["valid"], "errors": result["errors"]}
+        if cache_path is not None:
+            _save_schema_checks(cache_path, {version: known})
+
+    files = [dict(known[digests[name]], file=name, cached=name not in pending) for name in contents]
+    valid = sum(1 for result in files if result["valid"])
+    return {"checker": version,
+            "valid": valid,
+            "invalid": len(files) - valid,
+            "checked": len(pending),
+            "seconds": time.perf_counter() - start,
+            "files": files}
+
+
+def validate_schemas(schemas_path, processes=None, cache_path=None):
+    """
+    Check all the schemas of a directory with check_schemas, logging every error of the invalid ones
+
+    :param schemas_path: a string, the directory holding the json schemas
+    :param processes: an int, the number of worker processes
+    :param cache_path: a string, the file caching the outcomes, $DATS_SCHEMA_CHECKS or DEFAULT_SCHEMA_CHECKS by default
+    :return: boolean, whether all the schemas are valid
+    """
+    if cache_path is None:
+        cache_path = os.environ.get("DATS_SCHEMA_CHECKS", DEFAULT_SCHEMA_CHECKS)
+    summary = check_schemas(schemas_path, processes, cache_path)
+    for result in summary["files"]:
+        for error in result["errors"]:
+            logger.error("%s: %s", result["file"], error)
+    logger.info("%d schemas valid, %d invalid, %d checked, the others cached, %.2fs", summary["valid"],
+                summary["invalid"], summary["checked"], summary["seconds"])
+    return summary["invalid"] == 0
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Validate a directory or glob of DATS JSON instances")
+    parser.add_argument("location", nargs="?", help="a directory (all its *.json files) or a glob pattern")
+    parser.add_argument("--schemas", default=os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                                          "../DATS/dats-tools/json-schemas"),
+                        help="the directory holding the DATS json schemas")
+    parser.add_argument("--schema", default="dataset_schema.json", help="the schema instances are checked against")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="report only the first MAX_ERRORS errors of each invalid instance")
+    parser.add_argument("--check-schemas", action="store_true",
+                        help="instead, check the schemas themselves against the JSON schema meta-schema")
+    parser.add_argument("--schema-checks", default=os.environ.get("DATS_SCHEMA_CHECKS", DEFAULT_SCHEMA_CHECKS),
+                        help="the file caching the outcome of --check-schemas by schema content hash")
+    parser.add_argument("--summary", default=None, help="write the JSON summary to this file instead of stdout")
+    args = parser.parse_args()
+    if args.location is None and not args.check_schemas:
+        parser.error("a location is required, unless --check-schemas")
+
+    if args.check_schemas:
+        summary = check_schemas(args.schemas, args.processes, args.schema_checks)
+    else:
+        summary = validate_files(args.location, args.schemas, args.schema, args.processes, args.max_errors)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+    logger.info("%d valid, %d invalid, %.2fs", summary["valid"], summary["invalid"], summary["seconds"])
+    sys.exit(0 if summary["invalid"] == 0 else 1)
@@ -0,0 +1,57 @@
+"""
+Writers shared by the converter scripts.
+"""
+import json
+import uuid
+
+from dats_instrumentation import stage
+
+
+def write_catalogue_streaming(catalogue, parts, f, jsonld_f=None, annotator=None, references=None, check=None):
+    """
+    Write a catalogue as DATS JSON, serializing each part into hasPart as soon as it is produced,
+    and optionally as JSON-LD in the same pass
+
+    :param catalogue: a DatsObj, whose hasPart is left empty
+    :param parts: an iterable of DatsObj, e.g. a generator of converted projects or records
+    :param f: a text file object
+    :param jsonld_f: a text file object the JSON-LD is written to, None for no JSON-LD
+    :param annotator: a JsonLdAnnotator, required with jsonld_f
+    :param references: a ReferenceSerializer, to write the interned objects of the JSON-LD once and refer to them
+    :param check: a function called with the JSON of each part as it is written, e.g. PartValidator.check_part
+    :return: an int, the number of parts written
+    """
+    placeholder = "@hasPart-" + str(uuid.uuid4())
+    catalogue.set("hasPart", placeholder)
+    envelope = catalogue.toJSON()
+    before, after = json.dumps(envelope).split(json.dumps(placeholder))
+    f.write(before + "[")
+    if jsonld_f is not None:
+        annotator.annotate(envelope)
+        # the parts are in the scope of the context of the catalogue, embedded or not: they only refer to it by URL
+        context = annotator.context_mapping[annotator.base_schema]
+        jsonld_before, jsonld_after = json.dumps(envelope).split(json.dumps(placeholder))
+        jsonld_f.write(jsonld_before + "[")
+
+    count = 0
+    for part in parts:
+        separator = ", " if count > 0 else ""
+        with stage("to_json", items=1):
+            part_json = part.toJSON()
+        if check is not None:
+            check(part_json)
+        with stage("write", items=1):
+            f.write(separator + json.dumps(part_json))
+        if jsonld_f is not None:
+            with stage("jsonld", items=1):
+                if references is not None:
+                    part_json = references.to_json(part)
+                jsonld_f.write(separator + json.dumps(annotator.annotate(part_json, "hasPart", context)))
+        count += 1
+
+    f.write("]" + after)
+    if jsonld_f is not None:
+        jsonld_f.write("]" + jsonld_after)
+
+    catalogue.set("hasPart", [])
+    return count
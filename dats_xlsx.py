@@ -0,0 +1,193 @@
+"""
+Streaming reader of the IMI projects sheet kept as an Excel workbook, the master copy the CSV is exported from.
+
+The workbook is opened read-only with openpyxl, which parses the sheet XML row by row instead of loading the whole
+workbook: only the table of the strings shared by the cells is held in memory, since any row may refer to it. The
+cells are turned into the text they have in IMIPROJECTS.csv, and a block of rows at a time into a DataFrame whose
+columns are typed as pandas.read_csv types them: same header handling, same empty cells, same dtypes:
+
+    python dats_xlsx.py input/IMIPROJECTS.xlsx > IMIPROJECTS.csv
+"""
+from datetime import date, datetime, time
+import argparse
+import csv
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+
+# the cells pandas.read_csv reads as missing values, and as booleans, by default
+NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A",
+             "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+BOOLEAN_VALUES = {"True": True, "TRUE": True, "true": True, "False": False, "FALSE": False, "false": False}
+
+
+def is_workbook(path):
+    """
+
+    :param path: a string, an input file
+    :return: a boolean, whether it is read with read_xlsx rather than pandas.read_csv
+    """
+    return path.lower().endswith(XLSX_EXTENSIONS)
+
+
+def cell_text(value):
+    """
+    The CSV text of a cell, as it reads in IMIPROJECTS.csv
+
+    :param value: a cell value, as given by openpyxl
+    :return: a string
+    """
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if value.time() == time(0, 0):
+            return value.strftime("%d/%m/%Y")
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def iter_sheet_rows(path, sheet=None):
+    """
+    Read the rows of a sheet one at a time, without loading the workbook, empty rows skipped
+
+    :param path: a string, the .xlsx file
+    :param sheet: a string, the name of the sheet, the active one by default
+    :return: a generator of lists of str, the header row first
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.active
+        # the dimensions recorded by other tools than Excel may be wrong, and rows cut to them
+        worksheet.reset_dimensions()
+        width = None
+        for row in worksheet.iter_rows(values_only=True):
+            cells = [cell_text(value) for value in row]
+            if not any(cells):
+                continue
+            if width is None:
+                # trailing empty header cells are formatting, not columns
+                while cells and not cells[-1]:
+                    cells.pop()
+                width = len(cells)
+            else:
+                cells = (cells + [""] * width)[:width]
+            yield cells
+    finally:
+        # a read-only workbook keeps its file open until closed
+        workbook.close()
+
+
+def column_names(header):
+    """
+    The column names pandas.read_csv gives a header row
+
+    :param header: a list of str
+    :return: a list of str, "Unnamed: 3" for an empty cell, "Name.1" for the second "Name"
+    """
+    names = []
+    seen = set()
+    for position, name in enumerate(header):
+        name = name or "Unnamed: %d" % position
+        if name in seen:
+            suffix = 1
+            while "%s.%d" % (name, suffix) in seen:
+                suffix += 1
+            name = "%s.%d" % (name, suffix)
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _typed_column(values):
+    """
+    Type a column of cell texts as pandas.read_csv does: numbers, then booleans, else strings, NaN for missing cells
+
+    :param values: a pandas Series of str, of object dtype
+    :return: a pandas Series
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = values.where(~values.isin(NA_VALUES), np.nan)
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        pass
+    present = values.dropna()
+    if len(present) and present.isin(BOOLEAN_VALUES).all():
+        values = values.map(BOOLEAN_VALUES.get, na_action="ignore")
+        return values.astype(bool) if len(present) == len(values) else values
+    return values
+
+
+def _read_block(header, rows):
+    import pandas as pd
+
+    block = pd.DataFrame(rows, columns=range(len(header)), dtype=object)
+    return pd.DataFrame({name: _typed_column(block[position]) for position, name in enumerate(column_names(header))})
+
+
+def _iter_blocks(rows, header, chunksize):
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) == chunksize:
+            yield _read_block(header, block)
+            block = []
+    if block:
+        yield _read_block(header, block)
+
+
+def read_xlsx(path, sheet=None, chunksize=None):
+    """
+    Read an IMIPROJECTS sheet of a workbook as pandas.read_csv reads IMIPROJECTS.csv
+
+    :param path: a string, the .xlsx file
+    :param sheet: a string, the name of the sheet, the active one by default
+    :param chunksize: an int, to read the sheet chunksize rows at a time
+    :return: a pandas DataFrame, or a generator of DataFrames of chunksize rows when chunksize is given
+    """
+    rows = iter_sheet_rows(path, sheet)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("No rows in %s" % path)
+    if chunksize is not None:
+        return _iter_blocks(rows, header, chunksize)
+    return _read_block(header, rows)
+
+
+def read_projects_table(path, sheet=None, chunksize=None):
+    """
+    Read the IMI projects, from IMIPROJECTS.csv or from a workbook holding the same columns
+
+    :param path: a string, a .csv or .xlsx file
+    :param sheet: a string, the sheet of a workbook, the active one by default
+    :param chunksize: an int, to read the projects chunksize rows at a time
+    :return: a pandas DataFrame, or a generator of DataFrames when chunksize is given
+    """
+    if is_workbook(path):
+        return read_xlsx(path, sheet, chunksize)
+    import pandas as pd
+
+    return pd.read_csv(path, chunksize=chunksize)
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Write a sheet of a workbook as CSV to stdout, row by row")
+    parser.add_argument("workbook", help="the .xlsx file")
+    parser.add_argument("--sheet", default=None, help="the sheet to read, the active one by default")
+    args = parser.parse_args()
+
+    csv.writer(sys.stdout).writerows(iter_sheet_rows(args.workbook, args.sheet))
@@ -1,301 +1,503 @@
 __author__ = 'philippe rocca-serra'
 
-from jsonschema import RefResolver, Draft4Validator, FormatChecker
-from os import listdir
-from os.path import isfile, join
+from os.path import join
+from collections import namedtuple
+from functools import lru_cache
+import argparse
 import logging
 import json
 import os
 import uuid
 import re
-import time
-import urllib.request
-import urllib.parse
-import requests
-import pandas as pd
-import codecs
+import sys
 
-from ccmm.dats.datsobj import DatsObj, DATSEncoder
+from dats_instrumentation import instrumented, profiled, stage, start_report
+from dats_formats import COMPRESSIONS, FORMATS, catalogue_filename, write_catalogue
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-LOCAL =  os.path.dirname(__file__)
-# print(os.path.dirname(__file__))
-print("LOCAL ", LOCAL)
+# ccmm, jsonschema (through dats_validation) and numpy (through dats_search) are imported by the functions which
+# need them, see parse-ul-data.py
+LOCAL = os.path.dirname(__file__)
 
 DATS_schemasPath = os.path.join(LOCAL, "../DATS/dats-tools/json-schemas")
-DATS_contextsPath = os.path.join(os.path.dirname(__file__), "../DATS/dats-tools/json-contexts")
+DATS_contextsPath = os.path.join(LOCAL, "../DATS/dats-tools/json-contexts")
 
-print("DATS:", DATS_schemasPath)
 
-
-def get_schemas_store(path):
+def validate_dats_schemas():
     """
 
-    :param path: a string,
-    :return: an array, which holds all the json schemas defining the model
+    :return:
     """
-    files = [f for f in listdir(path) if isfile(join(path, f))]
-    store = []
-    for schema_filename in files:
-        schema_path = os.path.join(DATS_schemasPath, schema_filename)
-        print(schema_filename)
-        with open(schema_path, 'r') as schema_file:
-            schema = json.load(schema_file)
-            store.append({schema['id']:  schema})
+    from dats_validation import validate_schemas
 
-    return store
+    return validate_schemas(DATS_schemasPath)
 
 
-def validate_instance(path, filename, schema_filename, error_printing):
+class _JsonStream(object):
+    """
+    A text file read chunk by chunk, from which JSON values are decoded one at a time
     """
 
-    :param path:
-    :param filename:
-    :param schema_filename:
-    :param error_printing:
-    :return:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size):
+        if self.pos > self.chunk_size:
+            # drop what was consumed, so that the buffer only holds the value being decoded
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of JSON document")
+            self._fill(self.chunk_size)
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected %r at offset %d of the JSON buffer" % (char, self.pos))
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number may go on in the next chunk, it is complete only when followed by a delimiter
+                complete = end < len(self.buffer) and (not isinstance(value, (int, float)) or
+                                                       self.buffer[end] in ",]} \t\n\r")
+                if complete or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+
+def iter_records(f, key="docs", chunk_size=1 << 16):
     """
-    try:
-        schema_file = open(join(DATS_schemasPath, schema_filename))
-        schema = json.load(schema_file)
-        schemastore = get_schemas_store(DATS_schemasPath)
-        print(schemastore)
-        store = {schema['id']: schema}
-        resolver = RefResolver(base_uri='file://' + DATS_schemasPath + '/' + schema_filename, referrer=schema,
-                               store=store)
-        validator = Draft4Validator(schema, resolver=resolver, format_checker=FormatChecker())
-        logger.info("Validating %s against %s ", filename, schema_filename)
-
-        try:
-            instance_file = open(join(path, filename))
-            instance = json.load(instance_file)
-
-            if error_printing:
-                errors = sorted(validator.iter_errors(instance), key=lambda e: e.path)
-                for error in errors:
-                    print(error.message)
-
-                if len(errors) == 0:
+    Yield the elements of the "docs" array of a catalogue export as they are parsed, so that memory is bounded by
+    the largest single record rather than by the size of the export. The array may be nested in other objects, as
+    in Solr responses.
+
+    :param f: a text file object
+    :param key: a string, the name of the array holding the records
+    :param chunk_size: an int, the number of characters read at once
+    :return: a generator of dict
+    """
+    stream = _JsonStream(f, chunk_size)
+
+    def find_array():
+        stream.expect("{")
+        while True:
+            char = stream.peek()
+            if char == "}":
+                stream.pos += 1
+                return False
+            if char == ",":
+                stream.pos += 1
+                continue
+            name = stream.decode()
+            stream.expect(":")
+            char = stream.peek()
+            if name == key and char == "[":
+                stream.pos += 1
+                return True
+            if char == "{":
+                if find_array():
                     return True
-                else:
-                    return False
+            else:
+                stream.decode()
 
-            elif error_printing == 0:
-                errors = sorted(validator.iter_errors(instance), key=lambda e: e.path)
-                for error in errors:
-                    for suberror in sorted(error.context, key=lambda e: e.schema_path):
-                        print(list(suberror.schema_path), suberror.message)
+    if not find_array():
+        return
+    while True:
+        char = stream.peek()
+        if char == "]":
+            return
+        if char == ",":
+            stream.pos += 1
+            continue
+        yield stream.decode()
 
-                if len(errors) == 0:
-                    logger.info("...done")
-                    return True
-                else:
-                    return False
-            else:
-                try:
-                    validator.validate(instance, schema)
-                    logger.info("...done")
-                    return True
-                except Exception as e:
-                    logger.error(e)
-                    return False
-        except IOError as ioe:
-            print(ioe)
-            # finally:
-        #     instance_file.close()
-    except IOError as ioe2:
-        print(ioe2)
 
-    finally:
-        schema_file.close()
+# a cohort of subjects_number_per_cohort, e.g. "Cohort A: 367" or "2300 pre-diabetics"
+Cohort = namedtuple("Cohort", ["text", "name", "count"])
+
+# an entry of reference_publications, with its DOI or PubMed id when one is found
+Reference = namedtuple("Reference", ["text", "doi", "pmid"])
+
+_COHORT_PATTERNS = [re.compile(r"^(?P<name>.+?)\s*:\s*(?P<count>\d[\d,.]*)$"),
+                    re.compile(r"^(?:\(\d+\)\s*)?(?P<count>\d[\d,.]*)\s+(?P<name>.+)$")]
+_DOI_PATTERN = re.compile(r"\b(10\.\d{4,9}/\S+)")
+_PMID_PATTERN = re.compile(r"pubmed/(\d+)")
 
 
-def validate_dataset(path, filename, error_printing):
+def parse_cohort(token):
     """
 
-    :param path: string,
-    :param filename: string, the name of the json instance file
-    :param error_printing: int, 0 or 1 for suppressing or allowing output respectively
-    :return:
+    :param token: a string
+    :return: a Cohort, whose count is None when the token holds no number of subjects
     """
-    return validate_instance(path, filename, "dataset_schema.json", error_printing)
+    for pattern in _COHORT_PATTERNS:
+        match = pattern.match(token)
+        if match:
+            return Cohort(token, match.group("name").rstrip(":"), int(re.sub(r"[,.]", "", match.group("count"))))
+    return Cohort(token, token.rstrip(":"), None)
 
 
-def validate_schema(path, schemaFile):
+def parse_reference(token):
     """
 
-    :param path:
-    :param schemaFile:
-    :return:
+    :param token: a string
+    :return: a Reference
     """
-    try:
-        logger.info("Validating schema %s", schemaFile)
-        schema_file = open(join(path, schemaFile))
-        schema = json.load(schema_file)
-        try:
-            Draft4Validator.check_schema(schema)
-            return True
-        except Exception as e:
-            logger.error(e)
-            return False
-        logger.info("done.")
-    finally:
-        schema_file.close()
-
-
-def validate_schemas(path):
+    doi = _DOI_PATTERN.search(token)
+    pmid = _PMID_PATTERN.search(token)
+    return Reference(token, doi.group(1) if doi else None, pmid.group(1) if pmid else None)
+
+
+# multi-valued free-text fields: (record field, token name, separators as a regular expression, token parser)
+FIELD_RULES = [("study_type", "study_type", r";", None),
+               ("subjects_number_per_cohort", "cohorts", r";\s|\n|(?=\(\d+\)\s)", parse_cohort),
+               ("secondary_analysis", "assays", r":\s|;|,", None),
+               ("reference_publications", "bibrefs", r"DOI:|;\s|;$|\n", parse_reference),
+               ("body_system_or_organ_class", "organs", r":\s|;", None)]
+
+
+def compile_field_rules(rules):
     """
+    Compile the separators of each field rule once
 
-    :param path:
-    :return:
+    :param rules: a list of (record field, token name, separators, token parser) tuples
+    :return: a list of (record field, token name, compiled pattern, token parser) tuples
     """
-    result = True
-    files = [f for f in listdir(path) if isfile(join(path, f))]
-    for schemaFile in files:
-        result = result and validate_schema(path, schemaFile)
-    return result
+    return [(field, name, re.compile(separators), parser) for field, name, separators, parser in rules]
 
 
-def validate_dats_schemas():
+FIELD_TOKENIZERS = compile_field_rules(FIELD_RULES)
+
+
+def tokenize(value, pattern, parser=None):
     """
+    Split a free-text value in a single pass, dropping empty and repeated tokens
 
-    :return:
+    :param value: a string
+    :param pattern: a compiled regular expression matching the separators
+    :param parser: a callable turning a token into a typed value, None to keep strings
+    :return: a list
     """
-    return validate_schemas(DATS_schemasPath)
+    tokens = dict.fromkeys(token.strip() for token in pattern.split(value))
+    tokens.pop("", None)
+    if parser is None:
+        return list(tokens)
+    return [parser(token) for token in tokens]
 
 
-def inject_context(instance, schema_name):
-        """
-        Transform a DATS JSON into a JSON-LD by injecting @context and @type keywords
-        :return: a JSON-LD of the DATS JSON
-        """
+@lru_cache(maxsize=4096)
+def tokenize_cached(value, pattern, parser=None):
+    """
+    tokenize, remembering the tokens of the values met before: free-text values repeat a lot across the records
+    of an export, e.g. study_type
 
-        mapping_url = "dats_context_mapping.json"
-        base_schema = "dataset_schema.json"
-        storage = {}
-        with open(mapping_url, "r") as mappings:
-            # print("mapping_url: ", mapping_url)
-            context_mapping = json.load(mappings)["contexts"]
+    :return: a tuple
+    """
+    return tuple(tokenize(value, pattern, parser))
 
-            print("mapping: ", context_mapping)
-            main_context_url = context_mapping[base_schema]
-            print("main context url: ", main_context_url)
 
-            with open(instance, "r") as study_instance_file:
-                study_instance = json.load(study_instance_file)
+def record_tokens(record):
+    """
+    The values of the multi-valued fields of a catalogue record
 
-                study_instance["@context"] = main_context_url
-                study_instance["@type"] = schema_name.lower() + "_schema.json"
-                print("@Type: ", study_instance["@type"])
+    :param record: a dict, one of the docs of records.json
+    :return: a dict of token name to list of values, see FIELD_RULES
+    """
+    tokens = {"tags": record.get("tags", []),
+              "samples": [sample.lstrip() for sample in record.get("samples_type", [])],
+              "diseases": [record[field].lstrip() for field in ["indication", "disease"] if field in record]}
 
-                if study_instance["@type"] not in storage:
-                    print(context_mapping[study_instance["@type"]])
-                    schema_response = requests.get(context_mapping[study_instance["@type"]])
-                    print("RESPONSE: ",  schema_response)
+    for field, name, pattern, parser in FIELD_TOKENIZERS:
+        tokens[name] = list(tokenize_cached(record[field], pattern, parser)) if field in record else []
 
-                    response_json_context = schema_response.json()
-                    print("RESPONSE_JSON: ", response_json_context)
-                    # schema = response_json['data']
-                    # print(response_json['data'])
-                    # schema = json.load(response["data"])
+    return tokens
 
-                    storage[study_instance["@type"]] = response_json_context
 
-                for field in study_instance:
+def print_record_tokens(tokens):
+    """
+    Debug output of the values found in a record
+    """
+    if tokens["tags"]:
+        for tag in tokens["tags"]:
+            print("tag:", tag)
+    else:
+        print("NO TAGS")
+    for s_type in tokens["study_type"]:
+        print("study_type:", s_type)
+    for cohort in tokens["cohorts"]:
+        print("cohort: ", cohort.text)
+    for assay in tokens["assays"]:
+        print("assay: ", assay)
+    for ref in tokens["bibrefs"]:
+        print("bibref: ", ref.text)
+    for organ in tokens["organs"]:
+        print("organ: ", organ)
+    for sample in tokens["samples"]:
+        print("sample: ", sample)
+    for disease in tokens["diseases"]:
+        print("disease: ", disease)
+
+
+def category_values(category, values):
+    """
 
-                    if type(study_instance[field]) == list:
-                        prop = field + "_schema.json"
-                        if prop in context_mapping.keys():
-                            print("field:", field, "| ", prop)
-                            for item in study_instance[field]:
-                                item["@context"] = context_mapping[prop]
-                                item["@type"] = field.capitalize()
-                    elif type(study_instance[field]) == dict:
-                        prop = field + "_schema.json"
-                        study_instance[field]["@context"] = context_mapping[prop]
-                        study_instance[field]["@type"] = field.capitalize()
+    :param category: a string
+    :param values: a list of str
+    :return: a DatsObj, a CategoryValuesPair
+    """
+    from ccmm.dats.datsobj import DatsObj
 
-                print(study_instance)
-                return study_instance
+    return DatsObj("CategoryValuesPair", [("category", category),
+                                          ("categoryIRI", ""),
+                                          ("values", [DatsObj("Annotation", [("value", value), ("valueIRI", "")])
+                                                      for value in values])])
 
 
-if __name__ == '__main__':
+def build_dataset(record, tokens):
+    """
+    Build the DATS Dataset describing one record of the data catalogue
+
+    :param record: a dict, one of the docs of records.json
+    :param tokens: a dict, as returned by record_tokens
+    :return: a DatsObj
+    """
+    from ccmm.dats.datsobj import DatsObj
+
+    creators = []
+    if "contact_last_name" in record or "contact_email" in record:
+        person_atts = [("firstName", record.get("contact_first_name", "")),
+                       ("lastName", record.get("contact_last_name", "")),
+                       ("email", record.get("contact_email", ""))]
+        if "affiliation" in record:
+            person_atts.append(("affiliations", [DatsObj("Organization", [("name", record["affiliation"])])]))
+        creators.append(DatsObj("Person", person_atts))
+    elif "business_address" in record:
+        creators.append(DatsObj("Organization", [("name", record["business_address"])]))
+
+    types = []
+    if "data_type" in record:
+        type_atts = [("information", DatsObj("Annotation", [("value", record["data_type"]), ("valueIRI", "")]))]
+        if "platform" in record:
+            type_atts.append(("platform", DatsObj("Annotation", [("value", record["platform"]), ("valueIRI", "")])))
+        types.append(DatsObj("DataType", type_atts))
+
+    is_about = [DatsObj("Disease", [("name", disease)]) for disease in tokens["diseases"]]
+    if "organism" in record:
+        is_about.append(DatsObj("TaxonomicInformation", [("name", record["organism"])]))
+
+    dates = []
+    for date_field, date_type in [("created", "creation date"), ("modified", "modification date")]:
+        if date_field in record:
+            dates.append(DatsObj("Date", [("date", record[date_field]),
+                                          ("type", DatsObj("Annotation", [("value", date_type),
+                                                                          ("valueIRI", "")]))]))
+
+    publications = []
+    for ref in tokens["bibrefs"]:
+        pub_atts = [("title", ref.text)]
+        if ref.doi:
+            pub_atts.append(("identifier", DatsObj("Identifier", [("identifier", ref.doi),
+                                                                  ("identifierSource", "DOI")])))
+        elif ref.pmid:
+            pub_atts.append(("identifier", DatsObj("Identifier", [("identifier", ref.pmid),
+                                                                  ("identifierSource", "PubMed")])))
+        publications.append(DatsObj("Publication", pub_atts))
+    if "pubmed_link" in record:
+        publications.append(DatsObj("Publication", [
+            ("identifier", DatsObj("Identifier", [("identifier", record["pubmed_link"]),
+                                                  ("identifierSource", "PubMed")]))]))
+
+    dimensions = [DatsObj("Dimension", [("name", DatsObj("Annotation", [("value", cohort.name), ("valueIRI", "")])),
+                                        ("description", "number of subjects"),
+                                        ("values", [cohort.count])])
+                  for cohort in tokens["cohorts"] if cohort.count is not None]
+
+    extra_props = []
+    if tokens["cohorts"]:
+        extra_props.append(category_values("cohorts", [cohort.text for cohort in tokens["cohorts"]]))
+    for category, token_field in [("study type", "study_type"),
+                                  ("secondary analysis", "assays"),
+                                  ("body system or organ class", "organs"),
+                                  ("samples type", "samples")]:
+        if tokens[token_field]:
+            extra_props.append(category_values(category, tokens[token_field]))
+    for category, field in [("samples number", "samples_number"), ("project name", "project_name")]:
+        if field in record:
+            extra_props.append(category_values(category, [str(record[field])]))
+
+    return DatsObj("Dataset", [
+        ("identifier", DatsObj("Identifier", [("identifier", record["id"]),
+                                              ("identifierSource", "ELIXIR Luxembourg data catalogue")])),
+        ("title", record.get("title", "")),
+        ("description", record.get("notes", record.get("study_protocol_description", ""))),
+        ("creators", creators),
+        ("keywords", [DatsObj("Annotation", [("value", tag), ("valueIRI", "")]) for tag in tokens["tags"]]),
+        ("types", types),
+        ("isAbout", is_about),
+        ("dates", dates),
+        ("primaryPublications", publications),
+        ("dimensions", dimensions),
+        ("version", record.get("version", "")),
+        ("extraProperties", extra_props)
+    ])
+
+
+def build_datasets(records, debug=False):
+    """
+    Convert catalogue records into DATS Datasets
 
-    root_dir = os.path.dirname(os.path.realpath(__file__))
-    print("ROOT: ", root_dir)
-    output_dir = './output/'
+    :param records: an iterable of dict, e.g. the docs of records.json
+    :param debug: a boolean, True to print the values found in each record
+    :return: a generator of DatsObj
+    """
+    for record in records:
+        tokens = record_tokens(record)
+        if debug:
+            print_record_tokens(tokens)
+        yield build_dataset(record, tokens)
 
-    INPUT_DC = "./input/records.json"
 
-    with open(INPUT_DC) as json_doc:
-        data = json.load(json_doc)
-        for record in data['docs']:
-            if "tags" in record.keys():
-                for tag in record['tags']:
-                    print("tag:", tag)
-            else:
-                print("NO TAGS")
-
-            if "study_type" in record.keys():
-                s_types = record['study_type'].split(';')
-                for type in s_types:
-                    print("study_type:", type.lstrip())
-
-            if "subjects_number_per_cohort" in record.keys():
-                if "; " in record['subjects_number_per_cohort']:
-                    subjects_per_cohorts = record['subjects_number_per_cohort'].split('; ')
-                    for subject_per_cohort in subjects_per_cohorts:
-                        print(subject_per_cohort.lstrip())
-                # if ": " in record['subjects_number_per_cohort']:
-                #     subjects_per_cohorts = record['subjects_number_per_cohort'].split(': ')
-                #     for subject_per_cohort in subjects_per_cohorts:
-                #         print(subject_per_cohort.lstrip())
-                if "\n" in record['subjects_number_per_cohort']:
-                    cohorts = record['subjects_number_per_cohort'].split('\n')
-                    for cohort in cohorts:
-                        print("cohort: ", cohort.lstrip())
-
-            if "secondary_analysis" in record.keys():
-                if ": " in record['secondary_analysis']:
-                    assays = record['secondary_analysis'].split(': ')
-                    for assay in assays:
-                        print("assay: ", assay.lstrip())
-                elif ";" in record['secondary_analysis']:
-                    assays = record['secondary_analysis'].split(';')
-                    for assay in assays:
-                        print("assay: ", assay.lstrip())
-
-            if "reference_publications" in record.keys():
-                if "DOI:" in record['reference_publications']:
-                    refs = record['reference_publications'].split('DOI:')
-                    for ref in refs:
-                        print("bibref: ",ref.lstrip())
-
-                if ";" in record['reference_publications']:
-                    refs = record['reference_publications'].split(';')
-                    for ref in refs:
-                        print("bibref: ", ref.lstrip())
-
-            if "body_system_or_organ_class" in record.keys():
-                if ": " in record['body_system_or_organ_class']:
-                    organs = record['body_system_or_organ_class'].split(': ')
-                    for organ in organs:
-                        print(organ.lstrip())
-                elif ";" in record['body_system_or_organ_class']:
-                    organs = record['body_system_or_organ_class'].split(';')
-                    for organ in organs:
-                        print("organ: ",organ.lstrip())
-
-            if "samples_type" in record.keys():
-                # print(record["samples_type"])
-                samples = record['samples_type']
-                for sample in samples:
-                        print("sample: ", sample.lstrip())
-
-            if "indication" in record.keys():
-                # print(record["samples_type"])
-                disease = record['indication']
-                # for disease in diseases:
-                print("disease: ", disease.lstrip())
\ No newline at end of file
+def build_catalogue(datasets):
+    """
+    Build the DATS Dataset describing the whole data catalogue export, the records being its parts
+
+    :param datasets: a list of DatsObj
+    :return: a DatsObj
+    """
+    from ccmm.dats.datsobj import DatsObj
+
+    repo = DatsObj("DataRepository", [("name", "Elixir IMI Data Catalogue"),
+                                      ("access", DatsObj("Access", [("landingPage",
+                                                                     "https://datacatalog.elixir-luxembourg.org/"),
+                                                                    ("accessURL",
+                                                                     "https://datacatalog.elixir-luxembourg.org/")]))
+                                      ])
+
+    return DatsObj("Dataset", [
+        ("identifier", DatsObj("Identifier", [("identifier", "UL Cat#" + str(uuid.uuid4()))])),
+        ("title", "Datasets of the ELIXIR Luxembourg data catalogue"),
+        ("description", "Datasets of Innovative Medicine Initiative projects described in the ELIXIR Luxembourg \
+data catalogue"),
+        ("creators", [DatsObj("Organization", [("name", "ELIXIR Luxembourg")])]),
+        ("types", []),
+        ("hasPart", datasets),
+        ("storedIn", repo),
+        ("version", "0.1"),
+        ("extraProperties", [])
+    ])
+
+
+def main(argv=None):
+    """
+    Convert the data catalogue export, see --help
+
+    :param argv: a list of str, the command line arguments, sys.argv[1:] by default
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Convert an export of the data catalogue into DATS")
+    parser.add_argument("--input", default="./input/records.json", help="the records.json export")
+    parser.add_argument("--output-dir", default="./output/", help="where UL_datacatalogue_as_DATS.json is written")
+    parser.add_argument("--format", choices=FORMATS, default="json",
+                        help="json: one DATS document, jsonl: one dataset per line, msgpack: MessagePack")
+    parser.add_argument("--compression", choices=sorted(COMPRESSIONS), default="none",
+                        help="compress the catalogue while it is written")
+    parser.add_argument("--search-index", action="store_true",
+                        help="index the catalogue for dats_search.py queries, into catalogue.idx")
+    parser.add_argument("--debug", action="store_true", help="print the values found in each record")
+    parser.add_argument("--no-validation", action="store_true", help="do not validate the catalogue against DATS")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="stop validating at the first MAX_ERRORS errors instead of reporting them all")
+    parser.add_argument("--validate-schemas", action="store_true",
+                        help="only check that the DATS schemas are valid JSON schemas, and exit")
+    parser.add_argument("--report", default=None,
+                        help="write the wall time, CPU time, memory and item count of each stage to this JSON file")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also trace the memory allocated in each stage, which slows the run down")
+    parser.add_argument("--profile", default=None, help="dump cProfile statistics to this file")
+    args = parser.parse_args(argv)
+
+    if args.validate_schemas:
+        return 0 if validate_dats_schemas() else 1
+
+    output_dir = args.output_dir
+
+    INPUT_DC = args.input
+
+    report = start_report("parse-json-datacat-ul.py", args.trace_memory) if args.report else None
+    # set once an instance is invalid or an output cannot be written, for the exit status
+    failed = False
+
+    try:
+        with profiled(args.profile):
+            filename = catalogue_filename('UL_datacatalogue_as_DATS', args.format, args.compression)
+            streamed = None
+            if not args.no_validation:
+                from dats_validation import PartValidator, get_registry
+
+                # each dataset is validated as it is written: reading the catalogue back would hold it whole
+                validator = get_registry(DATS_schemasPath).get_fast_validator("dataset_schema.json")
+                streamed = PartValidator(validator, args.max_errors)
+            catalogue = build_catalogue([])
+            with open(INPUT_DC) as json_doc:
+                datasets = build_datasets(instrumented("read", iter_records(json_doc)), args.debug)
+                count = write_catalogue(catalogue, instrumented("build", datasets), join(output_dir, filename),
+                                        check=streamed.check_part if streamed is not None else None)
+            logger.info("%d datasets written to %s", count, filename)
+
+            if args.search_index:
+                from dats_search import build_index
+
+                with stage("search_index"):
+                    documents, terms = build_index([join(output_dir, filename)], join(output_dir, "catalogue.idx"))
+                logger.info("%d datasets, %d terms indexed into catalogue.idx", documents, terms)
+
+            if streamed is not None:
+                logger.info("Validating %s against dataset_schema.json, part by part", filename)
+                failed = not streamed.check_envelope(catalogue.toJSON())
+                logger.info("datasets: %d valid, %d invalid", streamed.parts - streamed.invalid - streamed.skipped,
+                            streamed.invalid)
+                if streamed.skipped:
+                    logger.info("%d datasets not validated, after the first %d errors", streamed.skipped,
+                                args.max_errors)
+
+    except IOError as ioe:
+        logger.error(ioe)
+        failed = True
+
+    if report is not None:
+        report.metadata.update(vars(args))
+        report.write(args.report)
+        report.log()
+        logger.info("run report written to %s", args.report)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
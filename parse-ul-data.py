@@ -1,83 +1,58 @@
 __author__ = 'philippe rocca-serra'
 
-from jsonschema import RefResolver, Draft4Validator, FormatChecker
-from os import listdir
 from os.path import isfile, join
+import argparse
 import logging
 import json
 import os
 import uuid
 import re
-import time
-import urllib.request
-import urllib.parse
-import requests
-import pandas as pd
-import codecs
-
-# this needs to be installed by copying ccmm folder in this directory
-# from https://github.com/dcppc/crosscut-metadata/tree/master/ccmm
-from ccmm.dats.datsobj import DatsObj, DATSEncoder
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-LOCAL =  os.path.dirname(__file__)
-# print(os.path.dirname(__file__))
-print("LOCAL ", LOCAL)
-
-DATS_schemasPath = os.path.join(LOCAL, "../DATS/dats-tools/json-schemas")
-DATS_contextsPath = os.path.join(os.path.dirname(__file__), "../DATS/dats-tools/json-contexts")
+import hashlib
+import shutil
+import sys
 
-print("DATS:", DATS_schemasPath)
+from dats_instrumentation import active_report, instrumented, profiled, stage, start_report
+from dats_formats import COMPRESSIONS, FORMATS, catalogue_filename, read_catalogue, write_catalogue
+from dats_organizations import OrganizationRegistry, is_organization_name
+from dats_xlsx import read_projects_table
 
+logger = logging.getLogger(__name__)
 
-def get_schemas_store(path):
-    """
-
-    :param path: a string,
-    :return: an array, which holds all the json schemas defining the model
-    """
-    files = [f for f in listdir(path) if isfile(join(path, f))]
-    store = []
-    for schema_filename in files:
-        schema_path = os.path.join(DATS_schemasPath, schema_filename)
-        print(schema_filename)
-        with open(schema_path, 'r') as schema_file:
-            schema = json.load(schema_file)
-            store.append({schema['id']:  schema})
+# pandas, jsonschema and numpy (through dats_search) take most of the start-up time: they are imported by the
+# functions which need them, so that short runs such as --help or --validate-schemas do without them, and so are
+# ccmm (to be installed by copying the ccmm folder of https://github.com/dcppc/crosscut-metadata/tree/master/ccmm
+# in this directory) and the modules using it or jsonschema: dats_interning, dats_jsonld and dats_validation
+LOCAL = os.path.dirname(__file__)
 
-    return store
+DATS_schemasPath = os.path.join(LOCAL, "../DATS/dats-tools/json-schemas")
+DATS_contextsPath = os.path.join(LOCAL, "../DATS/dats-tools/json-contexts")
 
 
-def validate_instance(path, filename, schema_filename, error_printing):
+def validate_instance(path, filename, schema_filename, error_printing, max_errors=None):
     """
 
     :param path:
     :param filename:
     :param schema_filename:
     :param error_printing:
+    :param max_errors: int, to report only the first max_errors errors, all by default
     :return:
     """
+    from dats_validation import get_registry
+
     try:
-        schema_file = open(join(DATS_schemasPath, schema_filename))
-        schema = json.load(schema_file)
-        schemastore = get_schemas_store(DATS_schemasPath)
-        print(schemastore)
-        store = {schema['id']: schema}
-        resolver = RefResolver(base_uri='file://' + DATS_schemasPath + '/' + schema_filename, referrer=schema,
-                               store=store)
-        validator = Draft4Validator(schema, resolver=resolver, format_checker=FormatChecker())
+        validator = get_registry(DATS_schemasPath).get_fast_validator(schema_filename)
         logger.info("Validating %s against %s ", filename, schema_filename)
 
         try:
-            instance_file = open(join(path, filename))
-            instance = json.load(instance_file)
+            with stage("read_output"):
+                instance = read_catalogue(join(path, filename))
 
             if error_printing:
-                errors = sorted(validator.iter_errors(instance), key=lambda e: e.path)
+                with stage("validation", items=1):
+                    errors = sorted(validator.errors(instance, max_errors), key=lambda e: e.path)
                 for error in errors:
-                    print(error.message)
+                    logger.error(error.message)
 
                 if len(errors) == 0:
                     return True
@@ -85,10 +60,11 @@ def validate_instance(path, filename, schema_filename, error_printing):
                     return False
 
             elif error_printing == 0:
-                errors = sorted(validator.iter_errors(instance), key=lambda e: e.path)
+                with stage("validation", items=1):
+                    errors = sorted(validator.errors(instance, max_errors), key=lambda e: e.path)
                 for error in errors:
                     for suberror in sorted(error.context, key=lambda e: e.schema_path):
-                        print(list(suberror.schema_path), suberror.message)
+                        logger.error("%s %s", list(suberror.schema_path), suberror.message)
 
                 if len(errors) == 0:
                     logger.info("...done")
@@ -97,170 +73,387 @@ def validate_instance(path, filename, schema_filename, error_printing):
                     return False
             else:
                 try:
-                    validator.validate(instance, schema)
+                    with stage("validation", items=1):
+                        validator.validate(instance)
                     logger.info("...done")
                     return True
                 except Exception as e:
                     logger.error(e)
                     return False
         except IOError as ioe:
-            print(ioe)
-            # finally:
-        #     instance_file.close()
+            logger.error(ioe)
     except IOError as ioe2:
-        print(ioe2)
+        logger.error(ioe2)
 
-    finally:
-        schema_file.close()
 
-
-def validate_dataset(path, filename, error_printing):
+def validate_dataset(path, filename, error_printing, max_errors=None):
     """
 
     :param path: string,
     :param filename: string, the name of the json instance file
     :param error_printing: int, 0 or 1 for suppressing or allowing output respectively
+    :param max_errors: int, to report only the first max_errors errors, all by default
     :return:
     """
-    return validate_instance(path, filename, "dataset_schema.json", error_printing)
+    return validate_instance(path, filename, "dataset_schema.json", error_printing, max_errors)
 
 
-def validate_schema(path, schemaFile):
+def validate_dats_schemas():
     """
 
-    :param path:
-    :param schemaFile:
     :return:
     """
-    try:
-        logger.info("Validating schema %s", schemaFile)
-        schema_file = open(join(path, schemaFile))
-        schema = json.load(schema_file)
-        try:
-            Draft4Validator.check_schema(schema)
-            return True
-        except Exception as e:
-            logger.error(e)
-            return False
-        logger.info("done.")
-    finally:
-        schema_file.close()
+    from dats_validation import validate_schemas
+
+    return validate_schemas(DATS_schemasPath)
 
 
-def validate_schemas(path):
+# columns holding ':'-separated organization names, with the role given to each organization
+ORGANIZATION_COLUMNS = [("EFPIAcompanies", "EFPIA partner"),
+                        ("Univerisities", "University"),
+                        ("SMEs", "SME"),
+                        ("PatientOrganisations", "Patient Organisations"),
+                        ("ThirdParties", "Third Parties"),
+                        ("Partners", "Partners")]
+
+# columns turned into Dataset extraProperties, with their category label
+DATASET_PROPERTY_COLUMNS = [("IMIProgram", "IMI Program"),
+                            ("IMICall", "IMI Call"),
+                            ("Project Status Group (based on End Date)", "Project Status Group"),
+                            ("TypeOfAction", "Type of Action"),
+                            ("FAIRification", "FAIRification"),
+                            ("FAIRplus: responsible public partner", "FAIRplus: responsible public partner"),
+                            ("FAIRplus: responsible EFPIA partner", "FAIRplus: responsible EFPIA partner"),
+                            ("EFPIA project lead", "EFPIA project lead")]
+
+# funding columns of the sheet, written as "18 170 217", with the category of their typed extra property in the
+# Grant of the project and the name of their integer column in the grants table
+FUNDING_COLUMNS = [("IMIFunding", "IMI funding", "imi_funding"),
+                   ("EFPIAFunding", "EFPIA funding", "efpia_funding"),
+                   ("OtherFunding", "Other funding", "other_funding"),
+                   ("TotalCost", "Total Cost", "total_cost")]
+
+
+def text_column(column):
     """
+    Vectorized conversion of a DataFrame column to strings, empty cells (NaN) becoming ""
 
-    :param path:
-    :return:
+    :param column: a pandas Series
+    :return: a pandas Series of str
     """
-    result = True
-    files = [f for f in listdir(path) if isfile(join(path, f))]
-    for schemaFile in files:
-        result = result and validate_schema(path, schemaFile)
-    return result
+    import pandas as pd
 
+    if pd.api.types.is_float_dtype(column):
+        # integer columns with empty cells are read as float, keep "115303" rather than "115303.0"
+        integral = column.dropna()
+        if (integral == integral.round()).all():
+            column = column.astype("Int64")
+    return column.astype("string").fillna("").astype(object)
 
-def validate_dats_schemas():
+
+def split_column(column, separator=":"):
     """
+    Vectorized split of a multi-valued column, empty cells giving an empty list
 
-    :return:
+    :param column: a pandas Series of str, as returned by text_column
+    :param separator: a string
+    :return: a list of lists of str
     """
-    return validate_schemas(DATS_schemasPath)
+    values = column.str.split(separator)
+    values[column == ""] = None
+    return [value or [] for value in values.tolist()]
 
 
-def inject_context(instance, schema_name):
-        """
-        Transform a DATS JSON into a JSON-LD by injecting @context and @type keywords
-        :return: a JSON-LD of the DATS JSON
-        """
+def amount_column(column):
+    """
+    Vectorized parsing of amounts written with blanks between thousands, e.g. "18 170 217"
 
-        mapping_url = "dats_context_mapping.json"
-        base_schema = "dataset_schema.json"
-        storage = {}
-        with open(mapping_url, "r") as mappings:
-            # print("mapping_url: ", mapping_url)
-            context_mapping = json.load(mappings)["contexts"]
+    :param column: a pandas Series
+    :return: a pandas Series of Int64, <NA> for empty or unreadable cells
+    """
+    import pandas as pd
 
-            print("mapping: ", context_mapping)
-            main_context_url = context_mapping[base_schema]
-            print("main context url: ", main_context_url)
+    text = text_column(column).str.replace(r"\s", "", regex=True)
+    return pd.to_numeric(text.where(text != "", None), errors="coerce").astype("Int64")
 
-            with open(instance, "r") as study_instance_file:
-                study_instance = json.load(study_instance_file)
 
-                study_instance["@context"] = main_context_url
-                study_instance["@type"] = schema_name.lower() + "_schema.json"
-                print("@Type: ", study_instance["@type"])
+def date_column(column):
+    """
 
-                if study_instance["@type"] not in storage:
-                    print(context_mapping[study_instance["@type"]])
-                    schema_response = requests.get(context_mapping[study_instance["@type"]])
-                    print("RESPONSE: ",  schema_response)
+    :param column: a pandas Series of dates written as 01/03/2012
+    :return: a pandas Series of datetime64, NaT for "-" and empty cells
+    """
+    import pandas as pd
 
-                    response_json_context = schema_response.json()
-                    print("RESPONSE_JSON: ", response_json_context)
-                    # schema = response_json['data']
-                    # print(response_json['data'])
-                    # schema = json.load(response["data"])
+    return pd.to_datetime(text_column(column), format="%d/%m/%Y", errors="coerce")
 
-                    storage[study_instance["@type"]] = response_json_context
 
-                for field in study_instance:
+def typed_columns(df):
+    """
+    Vectorized parsing of the funding amounts into integers and of the project dates into ISO-8601 dates, whole
+    columns at once. The cells which are neither empty (nor "-" for dates) nor readable are logged, and counted per
+    column in the parse_failures metadata of the active RunReport.
 
-                    if type(study_instance[field]) == list:
-                        prop = field + "_schema.json"
-                        if prop in context_mapping.keys():
-                            print("field:", field, "| ", prop)
-                            for item in study_instance[field]:
-                                item["@context"] = context_mapping[prop]
-                                item["@type"] = field.capitalize()
-                    elif type(study_instance[field]) == dict:
-                        prop = field + "_schema.json"
-                        study_instance[field]["@context"] = context_mapping[prop]
-                        study_instance[field]["@type"] = field.capitalize()
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a dict of column name to list of int, or of str such as "2012-03-01" for dates, None for missing values
+    """
+    columns = {}
+    with stage("normalize", items=len(df)):
+        parsed = {column: amount_column(df[column]) for column, _, _ in FUNDING_COLUMNS}
+        parsed.update((column, date_column(df[column])) for column in ["StartDate", "EndDate"])
+
+        for column, values in parsed.items():
+            text = text_column(df[column]).str.strip()
+            failed = text[values.isna() & (text != "") & (text != "-")]
+            if len(failed):
+                logger.warning("%d unreadable %s values, e.g. %r", len(failed), column, failed.iloc[0])
+                report = active_report()
+                if report is not None:
+                    failures = report.metadata.setdefault("parse_failures", {})
+                    failures[column] = failures.get(column, 0) + len(failed)
+
+            if values.dtype.kind == "M":
+                values = values.dt.strftime("%Y-%m-%d")
+            columns[column] = values.astype(object).where(values.notna(), None).tolist()
+    return columns
+
+
+def normalize_projects(df):
+    """
+    Normalize the columns of an IMIPROJECTS sheet once, so that DATS objects can be built from plain values
 
-                print(study_instance)
-                return study_instance
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a dict of column name to list of normalized values
+    """
+    columns = typed_columns(df)
 
+    keywords = text_column(df["Keywords"])
+    columns["Keywords"] = split_column(keywords)
 
-if __name__ == '__main__':
+    for org_column, _ in ORGANIZATION_COLUMNS:
+        columns[org_column] = split_column(text_column(df[org_column]))
 
-    root_dir = os.path.dirname(os.path.realpath(__file__))
-    print("ROOT: ", root_dir)
-    output_dir = './output/'
+    for prop_column, _ in DATASET_PROPERTY_COLUMNS:
+        columns[prop_column] = text_column(df[prop_column]).tolist()
 
-    INPUT_DC = "./input/IMIPROJECTS.csv"
-    df = pd.read_csv(INPUT_DC)
+    coordinator = text_column(df["Project Coordinator Name"])
+    email = text_column(df["Project Contact  email"])
+    coordinator_bits = coordinator.str.split(",")
+    has_person = (coordinator != "") & (email != "")
+    columns["CoordinatorFullName"] = coordinator_bits.str[0].where(has_person, None).tolist()
+    columns["CoordinatorAffiliation"] = coordinator_bits.str[1].fillna("").tolist()
+    columns["Project Contact  email"] = email.tolist()
 
-    try:
+    identifiers, acronyms, grants = zip(*project_keys(df)) if len(df) else ([], [], [])
+    columns["Identifier"] = list(identifiers)
+    columns["Project Acronym"] = list(acronyms)
+    columns["GrantAgreementNo"] = list(grants)
+    columns["Description"] = (text_column(df["ShortDescription"]) + ". SUMMARY: " +
+                              text_column(df["Summary"])).tolist()
+
+    return columns
+
+
+def project_keys(df):
+    """
+    The keys identifying the projects of a sheet, independently of their position in it
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a list of (identifier, acronym, grant agreement number) tuples
+    """
+    acronym = text_column(df["Project Acronym"])
+    grant = text_column(df["GrantAgreementNo"])
+    identifier = "IMI-Cat#" + grant.where(grant != "", acronym)
+    return list(zip(identifier.tolist(), acronym.tolist(), grant.tolist()))
+
+
+def project_file_name(identifier):
+    """
+
+    :param identifier: a string, a project identifier such as "IMI-Cat#115303"
+    :return: a string, the name of the file holding that project in sharded output
+    """
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', identifier) + ".json"
+
+
+def build_imi_project(identifier, acronym, description, start, end, keywords, organizations, person, properties,
+                      interner=None, registry=None, amounts=(), grant=""):
+    """
+    Build the DATS Dataset describing one IMI project from already normalized values. Annotations, dates,
+    organizations and extra properties are taken from the interner, so that projects share them.
+
+    :param identifier: a string, see project_keys
+    :param acronym: a string
+    :param description: a string
+    :param start: a string, the ISO-8601 start date, or None
+    :param end: a string, the ISO-8601 end date, or None
+    :param keywords: a list of str
+    :param organizations: a list of (list of organization names, role) tuples
+    :param person: a (fullName, email, affiliation) tuple or None
+    :param properties: a list of (category, value) tuples
+    :param interner: a DatsInterner, a new one by default
+    :param registry: an OrganizationRegistry, to link the project to canonical organizations, see
+        resolve_organizations
+    :param amounts: a list of (category, int or None) tuples, the funding of the project
+    :param grant: a string, the grant agreement number, "" when unknown
+    :return: a DatsObj
+    """
+    from ccmm.dats.datsobj import DatsObj
+    from dats_interning import DatsInterner
 
-        # id = DatsObj("Identifier", [("identifier", "https://fairsharing.org/FAIRsharing.xfrgsf"),
-        #                             ("identifierSource", "FAIRSHARING")])
+    if interner is None:
+        interner = DatsInterner()
 
-        repo = DatsObj("DataRepository", [("name","Elixir IMI Data Catalogue"),
-                                          ("description",
-                                          "A catalogue of European Union Innovative \
+    dates = [interner.intern("Date", [("date", date), ("type", interner.annotation(date_type))])
+             for date, date_type in [(start, "start date"), (end, "end date")] if date is not None]
+
+    d_kwds = [interner.annotation(kwd) for kwd in keywords]
+
+    d_orgs = []
+    for names, role_value in organizations:
+        for org in names:
+            if not is_organization_name(org):
+                continue
+            if registry is None:
+                d_orgs.append(interner.organization(org, [role_value]))
+            else:
+                # the name stays the one of the sheet, the identifier is the one of the canonical organization
+                organization = registry.register(org, identifier, role_value)
+                d_orgs.append(interner.organization(org.strip(), [role_value], organization.id))
+
+    creators = [d_orgs]
+    if person is not None:
+        full_name, email, affiliation = person
+        creators.append(DatsObj("Person", [
+            ("fullName", full_name),
+            ("email", email),
+            ("affiliations", [affiliation])
+        ]))
+
+    dataset_extra_props = [interner.category_values(category, [value]) for category, value in properties
+                           if value != ""]
+
+    # typed values rather than Annotations, so that the amounts sort and add up as numbers
+    funding = [DatsObj("CategoryValuesPair", [("category", category), ("categoryIRI", ""), ("values", [amount])])
+               for category, amount in amounts if amount is not None]
+    grants = []
+    if grant != "" or funding:
+        grant_atts = []
+        if grant != "":
+            grant_atts.append(("identifier", DatsObj("Identifier", [("identifier", grant),
+                                                                    ("identifierSource", "IMI")])))
+            grant_atts.append(("name", "IMI grant #:" + grant))
+        grant_atts.append(("funders", [interner.organization("IMI")]))
+        grant_atts.append(("extraProperties", funding))
+        grants.append(DatsObj("Grant", grant_atts))
+
+    return DatsObj("Dataset", [
+        ("identifier", DatsObj("Identifier", [("identifier", identifier)])),
+        ("title", acronym),
+        ("description", description),
+        ("distributions", []),
+        ("creators", creators),
+        ("keywords", d_kwds),
+        ("dates", dates),
+        ("types", []),
+        ("producedBy", []),
+        ("acknowledges", grants),
+        ("storedIn", ""),
+        ("isAbout", [d_kwds]),
+        ("version", ""),
+        ("isAbout", []),
+        ("extraProperties", [dataset_extra_props])
+    ])
+
+
+def resolve_organizations(registry, chunks):
+    """
+    Resolve the organization names of a whole sheet before any of its projects is converted, so that the
+    organizations the projects are linked to do not depend on the order of the rows
+
+    :param registry: an empty OrganizationRegistry
+    :param chunks: an iterable of pandas DataFrames, the sheet whole or chunk by chunk
+    :return: the registry
+    """
+    names = set()
+    with stage("resolve_organizations") as stats:
+        for chunk in chunks:
+            for org_column, _ in ORGANIZATION_COLUMNS:
+                for row in split_column(text_column(chunk[org_column])):
+                    names.update(name for name in row if is_organization_name(name))
+        registry.resolve_all(names)
+        if stats is not None:
+            stats.items += len(names)
+    return registry
+
+
+def build_imi_projects(df, interner=None, registry=None):
+    """
+    Column-vectorized conversion of an IMIPROJECTS sheet into DATS Datasets, one per row
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :param interner: a DatsInterner shared by the projects, a new one by default
+    :param registry: an OrganizationRegistry, to link the projects to canonical organizations, see
+        resolve_organizations
+    :return: a generator of DatsObj
+    """
+    from dats_interning import DatsInterner
+
+    columns = normalize_projects(df)
+    if interner is None:
+        interner = DatsInterner()
+
+    org_columns = [columns[org_column] for org_column, _ in ORGANIZATION_COLUMNS]
+    org_roles = [role for _, role in ORGANIZATION_COLUMNS]
+    prop_columns = [columns[prop_column] for prop_column, _ in DATASET_PROPERTY_COLUMNS]
+    prop_categories = [category for _, category in DATASET_PROPERTY_COLUMNS]
+    amount_columns = [columns[column] for column, _, _ in FUNDING_COLUMNS]
+    amount_categories = [category for _, category, _ in FUNDING_COLUMNS]
+
+    rows = zip(columns["Identifier"], columns["Project Acronym"], columns["Description"], columns["StartDate"],
+               columns["EndDate"], columns["Keywords"], zip(*org_columns), columns["CoordinatorFullName"],
+               columns["Project Contact  email"], columns["CoordinatorAffiliation"], zip(*prop_columns),
+               zip(*amount_columns), columns["GrantAgreementNo"])
+
+    for identifier, acronym, description, start, end, keywords, orgs, full_name, email, affiliation, props, amounts, \
+            grant in rows:
+        person = (full_name, email, affiliation) if full_name is not None else None
+        yield build_imi_project(identifier, acronym, description, start, end, keywords,
+                                list(zip(orgs, org_roles)), person, list(zip(prop_categories, props)),
+                                interner, registry, list(zip(amount_categories, amounts)), grant)
+
+
+def build_imi_catalogue(imi_projects):
+    """
+    Build the DATS Dataset describing the whole IMI catalogue, the projects being its parts
+
+    :param imi_projects: a list of DatsObj
+    :return: a DatsObj
+    """
+    from ccmm.dats.datsobj import DatsObj
+
+    repo = DatsObj("DataRepository", [("name","Elixir IMI Data Catalogue"),
+                                      ("description",
+                                      "A catalogue of European Union Innovative \
 Medicine projects and their associated datasets"),
-                                          ("access", DatsObj("Access", [("landingPage",
-                                                                         "https://datacatalog.elixir-luxembourg.org/"),
-                                                                        ("accessURL",
-                                                                         "https://datacatalog.elixir-luxembourg.org/")])
-                                           )
-                                          ])
-        imi_projects = []
-
-        IMI_funder = DatsObj("Organization", [("name", "IMI")])
-
-        IMI_catalogue_distribution = DatsObj("DatasetDistribution", [("name", "IMI catalogue distribution"),
-                                                              ("conformsTo", DatsObj("DataStandard",
-                                                                                    [("name", "DATS")])),
-                                                              ])
-
-        imi_project_catalogue = DatsObj("Dataset", [
-            ("identifier", DatsObj("Identifier", [("identifier", "IMI Cat#" + str(uuid.uuid4()))])),
-            ("title", "A collection of European Union Innovative \
+                                      ("access", DatsObj("Access", [("landingPage",
+                                                                     "https://datacatalog.elixir-luxembourg.org/"),
+                                                                    ("accessURL",
+                                                                     "https://datacatalog.elixir-luxembourg.org/")])
+                                       )
+                                      ])
+    IMI_funder = DatsObj("Organization", [("name", "IMI")])
+
+    IMI_catalogue_distribution = DatsObj("DatasetDistribution", [("name", "IMI catalogue distribution"),
+                                                          ("conformsTo", DatsObj("DataStandard",
+                                                                                [("name", "DATS")])),
+                                                          ])
+
+    imi_project_catalogue = DatsObj("Dataset", [
+        ("identifier", DatsObj("Identifier", [("identifier", "IMI Cat#" + str(uuid.uuid4()))])),
+        ("title", "A collection of European Union Innovative \
 Medicine projects and their associated datasets"),
-            ("description", "Data Catalogue will directly impact the range of sources and ease with which projects can\
+        ("description", "Data Catalogue will directly impact the range of sources and ease with which projects can\
 access data sources. With the eTRIKS Data Catalogue, researchers will be able to create awareness and \
 recognition of their data contribution and demonstrate value of partner projects. Users will have the \
 opportunity to find and access selected datasets. The repository will fuel dissemination of results \
@@ -268,288 +461,519 @@ with better outcomes for research projects as well as driving success for patien
 landscape. \
 The support from IMI having new and retrospective projects to suggest filling in the catalogue will be\
 of great value to leverage the benefits for all stakeholders."),
-            ("distributions", []),
-            ("creators", [IMI_funder]),
-            ("keywords", []),
-            ("dates", []),
-            ("types", []),
-            ("producedBy", []),
-            ("hasPart", imi_projects),
-            ("storedIn", repo),
-            ("isAbout", []),
-            ("version", "0.1"),
-            ("isAbout", []),
-            ("distributions", [IMI_catalogue_distribution]),
-            ("extraProperties", [])
-        ])
-
-        # print("catalogue: ", imi_project_catalogue)
-
-        for i in range(0, len(df)):
-
-            if df["StartDate"][i] != "-":
-                start_date = DatsObj("Date", [("date", df["StartDate"][i]),
-                                                ("type", DatsObj("Annotation", [("value", "start date"),
-                                                                                ("valueIRI", "")]))
-                                                ])
+        ("distributions", []),
+        ("creators", [IMI_funder]),
+        ("keywords", []),
+        ("dates", []),
+        ("types", []),
+        ("producedBy", []),
+        ("hasPart", imi_projects),
+        ("storedIn", repo),
+        ("isAbout", []),
+        ("version", "0.1"),
+        ("isAbout", []),
+        ("distributions", [IMI_catalogue_distribution]),
+        ("extraProperties", [])
+    ])
+
+    return imi_project_catalogue
+
+
+def read_imi_projects(input_file, chunksize=1000, interner=None, registry=None, sheet=None):
+    """
+    Read an IMIPROJECTS sheet chunk by chunk and convert it, so that only one chunk is held in memory
+
+    :param input_file: a string, the path to the csv file, or to a workbook with the same columns
+    :param chunksize: an int, the number of rows read at once
+    :param interner: a DatsInterner shared across the chunks, a new one by default
+    :param registry: an OrganizationRegistry, to link the projects to canonical organizations
+    :param sheet: a string, the sheet of a workbook, the active one by default
+    :return: a generator of DatsObj
+    """
+    from dats_interning import DatsInterner
+
+    if interner is None:
+        interner = DatsInterner()
+    for chunk in instrumented("read", read_projects_table(input_file, sheet, chunksize), len):
+        yield from instrumented("build", build_imi_projects(chunk, interner, registry))
+
+
+def write_project_shard(output_dir, key, imi_project):
+    """
+    Write one project to its own file under output_dir/projects
+
+    :param output_dir: a string
+    :param key: an (identifier, acronym, grant agreement number) tuple, see project_keys
+    :param imi_project: a DatsObj
+    :return: a dict, the manifest entry of the project
+    """
+    identifier, acronym, grant = key
+    with stage("to_json", items=1):
+        content = json.dumps(imi_project.toJSON()).encode("utf-8")
+    project_file = "projects/" + project_file_name(identifier)
+    with stage("write", items=1), open(join(output_dir, project_file), 'wb') as f:
+        f.write(content)
+
+    return {"identifier": identifier,
+            "acronym": acronym,
+            "grantAgreementNo": grant,
+            "file": project_file,
+            "size": len(content),
+            "sha256": hashlib.sha256(content).hexdigest()}
+
+
+def write_sharded_index(imi_project_catalogue, entries, output_dir, filename):
+    """
+    Write the catalogue, listing the project files by reference, and the manifest.json describing them
+
+    :param imi_project_catalogue: a DatsObj
+    :param entries: a list of dict, the manifest entries returned by write_project_shard
+    :param output_dir: a string
+    :param filename: a string, the name of the catalogue file
+    """
+    from ccmm.dats.datsobj import DatsObj
+
+    references = [DatsObj("Dataset", [("@id", entry["file"]),
+                                      ("identifier", DatsObj("Identifier", [("identifier", entry["identifier"])])),
+                                      ("title", entry["acronym"])]) for entry in entries]
+
+    imi_project_catalogue.set("hasPart", references)
+    with open(join(output_dir, filename), 'w', encoding='utf-8') as f:
+        json.dump(imi_project_catalogue.toJSON(), f)
+
+    with open(join(output_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump({"catalogue": filename, "projects": entries}, f, indent=2)
+
+
+def write_catalogue_sharded(imi_project_catalogue, chunks, output_dir, filename, registry=None):
+    """
+    Write each project to its own file under output_dir/projects, the catalogue listing them by reference,
+    together with a manifest.json mapping identifier, acronym and grant number to file, size and sha256
+
+    :param imi_project_catalogue: a DatsObj
+    :param chunks: an iterable of pandas DataFrames, e.g. pd.read_csv(..., chunksize=...)
+    :param output_dir: a string
+    :param filename: a string, the name of the catalogue file
+    :param registry: an OrganizationRegistry, to link the projects to canonical organizations, see
+        resolve_organizations
+    :return: a list of dict, the manifest entries
+    """
+    from dats_interning import DatsInterner
+
+    os.makedirs(join(output_dir, "projects"), exist_ok=True)
+
+    interner = DatsInterner()
+    entries = []
+    for chunk in instrumented("read", chunks, len):
+        for key, imi_project in zip(project_keys(chunk),
+                                    instrumented("build", build_imi_projects(chunk, interner, registry))):
+            entries.append(write_project_shard(output_dir, key, imi_project))
+
+    write_sharded_index(imi_project_catalogue, entries, output_dir, filename)
+    return entries
+
+
+INCREMENTAL_STATE_FILENAME = ".imi_incremental_state.json"
+
+
+def row_fingerprints(df):
+    """
+    Vectorized fingerprint of the content of each row of a sheet
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a list of hexadecimal strings
+    """
+    import pandas as pd
+
+    text = pd.DataFrame({column: text_column(df[column]) for column in df.columns})
+    return [format(h, "016x") for h in pd.util.hash_pandas_object(text, index=False).tolist()]
+
+
+def converter_fingerprint():
+    """
+    Rows converted by another version of this script cannot be reused
+
+    :return: a string, the sha256 of this script
+    """
+    with open(os.path.realpath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def register_projects(registry, df):
+    """
+    Record the organizations of each project of a sheet, in the order the conversion of the sheet would, without
+    converting it
+
+    :param registry: an OrganizationRegistry, see resolve_organizations
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :return: a list of str, the identifiers of the organizations of each row
+    """
+    org_columns = [split_column(text_column(df[org_column])) for org_column, _ in ORGANIZATION_COLUMNS]
+    org_roles = [role for _, role in ORGANIZATION_COLUMNS]
+    organization_ids = []
+    for (identifier, _, _), orgs in zip(project_keys(df), zip(*org_columns)):
+        organization_ids.append(" ".join(registry.register(name, identifier, role).id
+                                         for names, role in zip(orgs, org_roles)
+                                         for name in names if is_organization_name(name)))
+    return organization_ids
+
+
+def update_catalogue_incremental(imi_project_catalogue, df, output_dir, filename, registry=None):
+    """
+    Bring a sharded catalogue up to date with a sheet, reconverting only the rows added or changed since the
+    previous run (according to the fingerprints kept in output_dir/.imi_incremental_state.json) and dropping
+    the projects removed from the sheet
+
+    :param imi_project_catalogue: a DatsObj
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :param output_dir: a string
+    :param filename: a string, the name of the catalogue file
+    :param registry: an empty OrganizationRegistry, to link the projects to canonical organizations as
+        write_catalogue_sharded does: it is filled from the whole sheet, and the rows whose organizations resolve
+        to other identifiers than in the previous run are converted again
+    :return: a (list of written project file paths, list of removed project file paths) tuple
+    """
+    state_path = join(output_dir, INCREMENTAL_STATE_FILENAME)
+    manifest_path = join(output_dir, "manifest.json")
+    state = {}
+    entries_by_id = {}
+    if isfile(state_path) and isfile(manifest_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get("converter") != converter_fingerprint():
+            logger.info("converter changed since the previous run, rebuilding every project")
+            state = {}
+        else:
+            with open(manifest_path, 'r') as f:
+                entries_by_id = {entry["identifier"]: entry for entry in json.load(f)["projects"]}
+    previous_rows = state.get("rows", {})
+
+    keys = project_keys(df)
+    fingerprints = row_fingerprints(df)
+    if registry is not None:
+        # the organizations of a row may change with the other rows of the sheet
+        resolve_organizations(registry, [df])
+        fingerprints = [fingerprint + "/" + hashlib.sha1(ids.encode("utf-8")).hexdigest()[:16]
+                        for fingerprint, ids in zip(fingerprints, register_projects(registry, df))]
+    row_keys = [acronym + "/" + grant for _, acronym, grant in keys]
+
+    changed = [previous_rows.get(row_key, {}).get("fingerprint") != fingerprint or identifier not in entries_by_id
+               for row_key, fingerprint, (identifier, _, _) in zip(row_keys, fingerprints, keys)]
+    changed_df = df[changed]
+    identifiers = list(dict.fromkeys(identifier for identifier, _, _ in keys))
+
+    os.makedirs(join(output_dir, "projects"), exist_ok=True)
+    written = []
+    for key, imi_project in zip(project_keys(changed_df), build_imi_projects(changed_df, registry=registry)):
+        entry = write_project_shard(output_dir, key, imi_project)
+        entries_by_id[entry["identifier"]] = entry
+        written.append(join(output_dir, entry["file"]))
+
+    removed = []
+    for identifier in set(entries_by_id) - set(identifiers):
+        project_path = join(output_dir, entries_by_id.pop(identifier)["file"])
+        if isfile(project_path):
+            os.remove(project_path)
+        removed.append(project_path)
+
+    if written or removed or not isfile(join(output_dir, filename)):
+        write_sharded_index(imi_project_catalogue, [entries_by_id[identifier] for identifier in identifiers],
+                            output_dir, filename)
+
+    state = {"converter": converter_fingerprint(),
+             "rows": {row_key: {"fingerprint": fingerprint, "identifier": identifier}
+                      for row_key, fingerprint, (identifier, _, _) in zip(row_keys, fingerprints, keys)}}
+    with open(state_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(state_path + ".tmp", state_path)
+
+    return written, removed
+
+
+def build_project_tables(df, registry=None):
+    """
+    Flat, typed tables of an IMIPROJECTS sheet for analytics, each with the IMIProgram of its project
+
+    :param df: a pandas DataFrame, as read from IMIPROJECTS.csv
+    :param registry: an OrganizationRegistry filled while converting the sheet, to add canonical organization ids
+    :return: a dict of table name ("projects", "organizations", "keywords", "grants") to pandas DataFrame
+    """
+    import pandas as pd
+
+    identifiers, acronyms, _ = zip(*project_keys(df)) if len(df) else ([], [], [])
+    program = text_column(df["IMIProgram"])
+    keys = pd.DataFrame({"identifier": list(identifiers), "IMIProgram": program.where(program != "", None)},
+                        index=df.index)
+
+    projects = keys.assign(acronym=list(acronyms),
+                           grant_agreement_no=amount_column(df["GrantAgreementNo"]),
+                           call=text_column(df["IMICall"]),
+                           type_of_action=text_column(df["TypeOfAction"]),
+                           status=text_column(df["Project Status Group (based on End Date)"]),
+                           start_date=date_column(df["StartDate"]),
+                           end_date=date_column(df["EndDate"]),
+                           short_description=text_column(df["ShortDescription"]))
+
+    grant_table = keys.assign(call=projects["call"],
+                              **{amount: amount_column(df[column]) for column, _, amount in FUNDING_COLUMNS})
+
+    memberships = []
+    for org_column, role in ORGANIZATION_COLUMNS:
+        names = keys.assign(organization=split_column(text_column(df[org_column])), role=role)
+        memberships.append(names.explode("organization"))
+    organizations = pd.concat(memberships, ignore_index=True).dropna(subset=["organization"])
+    organizations = organizations[organizations["organization"].map(is_organization_name)]
+    organizations = organizations.assign(organization=organizations["organization"].str.strip())
+    if registry is not None:
+        organizations = organizations.assign(organization_id=organizations["organization"].map(
+            lambda name: getattr(registry.get(name), "id", None)))
+
+    keywords = keys.assign(keyword=split_column(text_column(df["Keywords"]))).explode("keyword")
+    keywords = keywords.assign(keyword=keywords["keyword"].str.strip())
+    keywords = keywords[keywords["keyword"].notna() & (keywords["keyword"] != "")]
+
+    return {"projects": projects.reset_index(drop=True),
+            "organizations": organizations.reset_index(drop=True),
+            "keywords": keywords.reset_index(drop=True),
+            "grants": grant_table.reset_index(drop=True)}
+
+
+def write_project_tables(tables, tables_dir):
+    """
+    Write each table as a Parquet dataset partitioned by IMIProgram, e.g. tables/grants/IMIProgram=IMI2/...,
+    replacing the previous export
+
+    :param tables: a dict of table name to pandas DataFrame, see build_project_tables
+    :param tables_dir: a string
+    :return: a list of the directories written
+    """
+    written = []
+    for name, table in tables.items():
+        table_dir = join(tables_dir, name)
+        if os.path.isdir(table_dir):
+            shutil.rmtree(table_dir)
+        table.to_parquet(table_dir, engine="pyarrow", partition_cols=["IMIProgram"], index=False)
+        written.append(table_dir)
+    return written
+
+
+def main(argv=None):
+    """
+    Convert the IMI projects sheet, see --help
+
+    :param argv: a list of str, the command line arguments, sys.argv[1:] by default
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Convert the IMI projects sheet into a DATS catalogue")
+    parser.add_argument("--input", default="./input/IMIPROJECTS.csv",
+                        help="the IMIPROJECTS csv file, or an .xlsx workbook with the same columns")
+    parser.add_argument("--sheet", default=None, help="the sheet of an .xlsx input, the active one by default")
+    parser.add_argument("--output-dir", default="./output/", help="where IMI_datacatalogue_as_DATS.json is written")
+    parser.add_argument("--streaming", action="store_true",
+                        help="read the sheet in chunks and write each project as soon as it is converted")
+    parser.add_argument("--sharded", action="store_true",
+                        help="write each project to its own file, with a manifest.json index")
+    parser.add_argument("--incremental", action="store_true",
+                        help="sharded output, reconverting and validating only the rows changed since the last run")
+    parser.add_argument("--format", choices=FORMATS, default="json",
+                        help="json: one DATS document, jsonl: one project per line, msgpack: MessagePack "
+                             "(default and streaming modes)")
+    parser.add_argument("--compression", choices=sorted(COMPRESSIONS), default="none",
+                        help="compress the catalogue while it is written (default and streaming modes)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="also write the projects, organizations, keywords and grants as Parquet tables, "
+                             "partitioned by IMIProgram, under tables/")
+    parser.add_argument("--search-index", action="store_true",
+                        help="index the catalogue for dats_search.py queries, into catalogue.idx")
+    parser.add_argument("--chunksize", type=int, default=1000, help="rows read at once in streaming and sharded modes")
+    parser.add_argument("--jsonld", action="store_true",
+                        help="also write IMI_datacatalogue_as_DATS.jsonld, in the same pass "
+                             "(default and streaming modes)")
+    parser.add_argument("--context-mapping", default="dats_context_mapping.json",
+                        help="the DATS context mapping file used for JSON-LD")
+    parser.add_argument("--jsonld-references", action="store_true",
+                        help="in JSON-LD, write shared annotations and organizations once and refer to them by @id")
+    parser.add_argument("--embed-contexts", action="store_true",
+                        help="embed the JSON-LD contexts, read from the local context cache, instead of their URL")
+    parser.add_argument("--no-validation", action="store_true", help="do not validate the catalogue against DATS")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="stop validating at the first MAX_ERRORS errors instead of reporting them all")
+    parser.add_argument("--validate-schemas", action="store_true",
+                        help="only check that the DATS schemas are valid JSON schemas, and exit")
+    parser.add_argument("--report", default=None,
+                        help="write the wall time, CPU time, memory and item count of each stage to this JSON file")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also trace the memory allocated in each stage, which slows the run down")
+    parser.add_argument("--profile", default=None, help="dump cProfile statistics to this file")
+    args = parser.parse_args(argv)
+    if args.streaming and args.jsonld and args.format != "json":
+        parser.error("--streaming --jsonld writes the JSON-LD together with the json format only")
+
+    if args.validate_schemas:
+        return 0 if validate_dats_schemas() else 1
+
+    output_dir = args.output_dir
+
+    INPUT_DC = args.input
+
+    report = start_report("parse-ul-data.py", args.trace_memory) if args.report else None
+    # set once an instance is invalid or an output cannot be written, for the exit status
+    failed = False
+
+    try:
+        with profiled(args.profile):
+            # id = DatsObj("Identifier", [("identifier", "https://fairsharing.org/FAIRsharing.xfrgsf"),
+            #                             ("identifierSource", "FAIRSHARING")])
+
+            filename = 'IMI_datacatalogue_as_DATS.json'
+            if not (args.sharded or args.incremental):
+                filename = catalogue_filename('IMI_datacatalogue_as_DATS', args.format, args.compression)
+            jsonld_filename = 'IMI_datacatalogue_as_DATS.jsonld'
+
+            from dats_interning import DatsInterner, ReferenceSerializer
+
+            interner = DatsInterner()
+            registry = OrganizationRegistry()
+            references = None
+            annotator = None
+            if args.jsonld:
+                from dats_jsonld import JsonLdAnnotator, get_context_cache, load_context_mapping
+
+                if args.jsonld_references:
+                    references = ReferenceSerializer(interner)
+                contexts = None
+                if args.embed_contexts:
+                    contexts = get_context_cache()
+                    if os.path.isdir(DATS_contextsPath):
+                        contexts.seed(DATS_contextsPath, load_context_mapping(args.context_mapping).values())
+                annotator = JsonLdAnnotator(load_context_mapping(args.context_mapping), contexts=contexts)
+
+            changed_files = None
+            streamed = None
+
+            if args.incremental:
+                imi_project_catalogue = build_imi_catalogue([])
+                changed_files, removed_files = update_catalogue_incremental(imi_project_catalogue,
+                                                                            read_projects_table(INPUT_DC, args.sheet),
+                                                                            output_dir, filename, registry)
+                logger.info("%d projects written, %d removed", len(changed_files), len(removed_files))
+            elif args.sharded:
+                imi_project_catalogue = build_imi_catalogue([])
+                resolve_organizations(registry, read_projects_table(INPUT_DC, args.sheet, args.chunksize))
+                entries = write_catalogue_sharded(imi_project_catalogue,
+                                                  read_projects_table(INPUT_DC, args.sheet, args.chunksize),
+                                                  output_dir, filename, registry)
+                logger.info("%d projects written to %s", len(entries), join(output_dir, "projects"))
+            elif args.streaming:
+                imi_project_catalogue = build_imi_catalogue([])
+                # a first pass over the sheet, reading it chunk by chunk too
+                resolve_organizations(registry, read_projects_table(INPUT_DC, args.sheet, args.chunksize))
+                if not args.no_validation:
+                    from dats_validation import PartValidator, get_registry
+
+                    # each project is validated as it is written: reading the catalogue back would hold it whole
+                    validator = get_registry(DATS_schemasPath).get_fast_validator("dataset_schema.json")
+                    streamed = PartValidator(validator, args.max_errors)
+                with open(join(output_dir, jsonld_filename) if annotator else os.devnull, 'w', encoding='utf-8') as ld:
+                    count = write_catalogue(imi_project_catalogue,
+                                            read_imi_projects(INPUT_DC, args.chunksize, interner, registry,
+                                                              args.sheet),
+                                            join(output_dir, filename), ld if annotator else None, annotator,
+                                            references, streamed.check_part if streamed is not None else None)
+                logger.info("%d projects written to %s", count, filename)
             else:
-                start_date = DatsObj("Date", [("date", "None"),
-                                                ("type", DatsObj("Annotation", [("value", "start date"),
-                                                                                ("valueIRI", "")]))
-                                                ])
-
-            # print(start_date)
-
-            if df["EndDate"][i] != "-":
-                end_date = DatsObj("Date", [("date", df["EndDate"][i]),
-                                                ("type", DatsObj("Annotation", [("value", "end date"),
-                                                                                ("valueIRI", "")]))
-                                                ])
+                with stage("read") as stats:
+                    df = read_projects_table(INPUT_DC, args.sheet)
+                    if stats is not None:
+                        stats.items += len(df)
+                resolve_organizations(registry, [df])
+                imi_projects = list(instrumented("build", build_imi_projects(df, interner, registry)))
+                imi_project_catalogue = build_imi_catalogue(imi_projects)
+
+                imi_catalogue_json = None
+                if filename.endswith(".json") or (annotator and references is None):
+                    with stage("to_json", items=len(imi_projects)):
+                        imi_catalogue_json = imi_project_catalogue.toJSON()
+                if annotator:
+                    # taken before write_catalogue, which leaves the hasPart of the catalogue empty
+                    with stage("jsonld", items=len(imi_projects)):
+                        if references is not None:
+                            jsonld_json = references.to_json(imi_project_catalogue)
+                        else:
+                            jsonld_json = imi_catalogue_json
+
+                if filename.endswith(".json"):
+                    with stage("write", items=len(imi_projects)), \
+                            open(join(output_dir, filename), 'w', encoding='utf-8') as f:
+                        json.dump(imi_catalogue_json, f)
+                else:
+                    write_catalogue(imi_project_catalogue, imi_projects, join(output_dir, filename))
+
+                if annotator:
+                    with stage("jsonld"), open(join(output_dir, jsonld_filename), 'w', encoding='utf-8') as f:
+                        json.dump(annotator.annotate(jsonld_json), f)
+
+            if len(registry) or args.incremental:
+                with stage("organizations", items=len(registry)), \
+                        open(join(output_dir, "organizations.json"), 'w', encoding='utf-8') as f:
+                    registry.dump(f)
+                logger.info("%d organizations written to organizations.json", len(registry))
+
+            if args.search_index:
+                from dats_search import build_index
+
+                with stage("search_index"):
+                    documents, terms = build_index([join(output_dir, filename)], join(output_dir, "catalogue.idx"))
+                logger.info("%d projects, %d terms indexed into catalogue.idx", documents, terms)
+
+            if args.parquet:
+                with stage("parquet"):
+                    tables = build_project_tables(read_projects_table(INPUT_DC, args.sheet),
+                                                  registry if len(registry) else None)
+                    write_project_tables(tables, join(output_dir, "tables"))
+                logger.info("tables %s written to %s", ", ".join(tables), join(output_dir, "tables"))
+
+            if args.no_validation:
+                pass
+            elif streamed is not None:
+                logger.info("Validating %s against dataset_schema.json, part by part", filename)
+                failed = not streamed.check_envelope(imi_project_catalogue.toJSON())
+                logger.info("projects: %d valid, %d invalid", streamed.parts - streamed.invalid - streamed.skipped,
+                            streamed.invalid)
+                if streamed.skipped:
+                    logger.info("%d projects not validated, after the first %d errors", streamed.skipped,
+                                args.max_errors)
+            elif changed_files is not None:
+                from dats_validation import validate_files
+
+                if changed_files or removed_files:
+                    failed = not validate_dataset(output_dir, filename, 1, args.max_errors)
+                if changed_files:
+                    summary = validate_files(changed_files, DATS_schemasPath, max_errors=args.max_errors)
+                    logger.info("changed projects: %d valid, %d invalid", summary["valid"], summary["invalid"])
+                    failed = failed or summary["invalid"] > 0
             else:
-                end_date = DatsObj("Date", [("date", "None"),
-                                                ("type", DatsObj("Annotation", [("value", "end date"),
-                                                                                ("valueIRI", "")]))
-                                                ])
-
-            d_kwds = []
-            if df["Keywords"][i] != "" and not isinstance(df["Keywords"][i], float):
-                kwds = df["Keywords"][i].split(":")
-                for kwd in kwds:
-                    d_kwd = DatsObj("Annotation", [("value", kwd), ("valueIRI", "")])
-                    d_kwds.append(d_kwd)
-
-            d_grant = ""
-            if df["GrantAgreementNo"][i] != "":
-                d_grant = DatsObj("Grant", [
-                    ("name", "IMI grant #:" + str(df["GrantAgreementNo"][i])),
-                    ("extraProperties", [])
-                     ])
+                failed = not validate_dataset(output_dir, filename, 1, args.max_errors)
+                if args.sharded:
+                    from dats_validation import validate_files
 
-            grant_extra_props = []
-            if df["EFPIAFunding"][i] != "":
-                efpia_funds = DatsObj("CategoryValuesPair", [("category", "EFPIA funding"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", str(df["EFPIAFunding"][i])),
-                                                                               ("valueIRI", "")])])])
-                grant_extra_props.append(efpia_funds)
+                    summary = validate_files(join(output_dir, "projects"), DATS_schemasPath,
+                                             max_errors=args.max_errors)
+                    logger.info("projects: %d valid, %d invalid", summary["valid"], summary["invalid"])
+                    failed = failed or summary["invalid"] > 0
 
-            if df["IMIFunding"][i] != "":
-                imi_funds = DatsObj("CategoryValuesPair", [("category", "IMI funding"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", str(df["IMIFunding"][i])),
-                                                                               ("valueIRI", "")])])])
-                grant_extra_props.append(imi_funds)
+    except IOError as ioe:
+        logger.error(ioe)
+        failed = True
 
-            if df["OtherFunding"][i] != "":
-                other_funds = DatsObj("CategoryValuesPair", [("category", "Other funding"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", str(df["OtherFunding"][i])),
-                                                                               ("valueIRI", "")])])])
-                grant_extra_props.append(other_funds)
-
-            if df["TotalCost"][i] != "":
-                other_funds = DatsObj("CategoryValuesPair", [("category", "Total Cost"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", str(df["TotalCost"][i])),
-                                                                               ("valueIRI", "")])])])
-                grant_extra_props.append(other_funds)
-
-            d_orgs = []
-
-            # DEALING WITH EFPIA
-            if not isinstance(df["EFPIAcompanies"][i], float):
-
-                role = DatsObj("Annotation", [("value", "EFPIA partner"),
-                                              ("valueIRI", "")])
-
-                efpia_orgs = df["EFPIAcompanies"][i].split(':')
-
-                for org in efpia_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            # DEALING WITH UNIVERSITIES
-            if not isinstance(df["Univerisities"][i], float):
-
-                role = DatsObj("Annotation", [("value", "University"),
-                                              ("valueIRI", "")])
-
-                uni_orgs = df["Univerisities"][i].split(':')
-
-                for org in uni_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            # DEALING WITH SMES
-            if not isinstance(df["SMEs"][i], float):
-
-                role = DatsObj("Annotation", [("value", "SME"),
-                                              ("valueIRI", "")])
-
-                sme_orgs = df["SMEs"][i].split(':')
-
-                for org in sme_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            # DEALING WITH PATIENT ORGs
-            if not isinstance(df["PatientOrganisations"][i], float):
-
-                role = DatsObj("Annotation", [("value", "Patient Organisations"),
-                                              ("valueIRI", "")])
-
-                patient_orgs = df["PatientOrganisations"][i].split(':')
-
-                for org in patient_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            # DEALING WITH PATIENT ORGs
-            if not isinstance(df["ThirdParties"][i], float):
-
-                role = DatsObj("Annotation", [("value", "Third Parties"),
-                                              ("valueIRI", "")])
-
-                thirdp_orgs = df["ThirdParties"][i].split(':')
-
-                for org in thirdp_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            # DEALING WITH PARTNERS
-            if not isinstance(df["Partners"][i], float):
-
-                role = DatsObj("Annotation", [("value", "Partners"),
-                                              ("valueIRI", "")])
-
-                partners_orgs = df["Partners"][i].split(':')
-
-                for org in partners_orgs:
-                    d_org = DatsObj("Organization", [("name", org), ("roles", [role])])
-                    d_orgs.append(d_org)
-
-            if df["Project Coordinator Name"][i] != "" and df["Project Contact  email"][i] != "":
-
-                person_bits = df["Project Coordinator Name"][i].split(",")
-                d_person = DatsObj("Person",[
-                        ("fullName", person_bits[0]),
-                        ("email", df["Project Contact  email"][i]),
-                        ("affiliations",[person_bits[1]])
-                            ])
-
-            dataset_extra_props = []
-
-            if df["IMIProgram"][i] != "":
-                imi_prog = DatsObj("CategoryValuesPair", [("category", "IMI Program"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["IMIProgram"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(imi_prog)
-
-            if df["IMICall"][i] != "":
-                imi_call = DatsObj("CategoryValuesPair", [("category", "IMI Call"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", str(df["IMICall"][i])),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(imi_call)
-
-            if df["Project Status Group (based on End Date)"][i] != "":
-                imi_status = DatsObj("CategoryValuesPair", [("category", "Project Status Group"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["Project Status Group (based on End Date)"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(imi_status)
-
-            if df["TypeOfAction"][i] != "":
-                imi_toa = DatsObj("CategoryValuesPair", [("category", "Type of Action"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["TypeOfAction"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(imi_toa)
-
-            if df["FAIRification"][i] != "":
-                fairified = DatsObj("CategoryValuesPair", [("category", "FAIRification"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["FAIRification"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(fairified)
-
-            if df["FAIRplus: responsible public partner"][i] != "":
-                fairplus_resp = DatsObj("CategoryValuesPair", [("category", "FAIRplus: responsible public partner"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["FAIRplus: responsible public partner"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(fairplus_resp)
-
-            if df["FAIRplus: responsible EFPIA partner"][i] != "":
-                fairplus_efpia_resp = DatsObj("CategoryValuesPair", [("category", "FAIRplus: responsible EFPIA partner"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["FAIRplus: responsible EFPIA partner"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(fairplus_efpia_resp)
-
-            if df["EFPIA project lead"][i] != "":
-                fairplus_efpia_resp = DatsObj("CategoryValuesPair", [("category", "EFPIA project lead"),
-                                                          ("categoryIRI", ""),
-                                                          ("values", [DatsObj("Annotation",
-                                                                              [("value", df["EFPIA project lead"][i]),
-                                                                               ("valueIRI", "")])])])
-                dataset_extra_props.append(fairplus_efpia_resp)
-
-            imi_project = DatsObj("Dataset", [
-                ("identifier", DatsObj("Identifier", [("identifier", "IMI-Cat#" + str(i))])),
-                ("title", df["Project Acronym"][i]),
-                ("description", df["ShortDescription"][i] + ". SUMMARY: " + df["Summary"][i]),
-                ("distributions", []),
-                ("creators", [d_orgs, d_person]),
-                ("keywords", d_kwds),
-                ("dates", [start_date,end_date]),
-                ("types", []),
-                ("producedBy", []),
-                ("storedIn", ""),
-                ("isAbout", [d_kwds]),
-                ("version", ""),
-                ("isAbout", []),
-                ("extraProperties", [dataset_extra_props])
-               ])
-
-            imi_projects.append(imi_project)
-
-        imi_project_catalogue.set("hasPart", imi_projects)
-
-        DATSEncoder().encode(imi_project_catalogue)
-        # imi_data_jstr = json.dumps(cls=DATSEncoder)
-
-        # print(imi_project_catalogue.toJSON())
-        # imi_data_jstr = json.dumps(imi_project_catalogue.__dict__)
-
-        # print("FULL CATALOGUE:", imi_data_jstr)
-
-        script_dir = os.path.dirname(__file__)
-        print("DIR", script_dir)
-        filename = 'IMI_datacatalogue_as_DATS.json'
-        with open(join(output_dir, filename), 'w', encoding='utf-8') as f:
-            json.dump(imi_project_catalogue.toJSON(), f)
-
-        # print("validating: ", script_dir, filename)
-        validate_dataset(script_dir, filename, 1)
-
-        # script_dir = os.path.dirname(__file__)
-        # this_instance = inject_context(filename, "Dataset")
-        # with open("IMI_datacatalogue_as_DATS.jsonld", 'w', encoding='utf-8') as otherf:
-        #     json.dump(this_instance, otherf, ensure_ascii=False, indent=4)
+    if report is not None:
+        report.metadata.update(vars(args))
+        report.write(args.report)
+        report.log()
+        logger.info("run report written to %s", args.report)
+    return 1 if failed else 0
 
-    except IOError as ioe:
-        print(ioe)
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Fixtures shared by the tests: the converter scripts loaded as modules, and the inputs shipped in input/
+
+The converters need ccmm (see parse-ul-data.py); the tests which validate their output also need the DATS schemas
+next to this repository, in ../DATS/dats-tools/json-schemas.
+"""
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+IMI_INPUT = os.path.join(ROOT, "input", "IMIPROJECTS.csv")
+DATS_SCHEMAS = os.path.join(ROOT, "../DATS/dats-tools/json-schemas")
+
+if ROOT not in sys.path:
+    # the scripts import the modules sitting next to them
+    sys.path.insert(0, ROOT)
+
+
+def load_script(script_name):
+    """
+    Load one of the converter scripts, whose names are not importable as such, as a module
+
+    :param script_name: a string, e.g. "parse-ul-data.py"
+    :return: a module
+    """
+    pytest.importorskip("ccmm")
+    module_name = os.path.splitext(script_name)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def converter():
+    """
+    parse-ul-data.py, as a module
+    """
+    return load_script("parse-ul-data.py")
+
+
+@pytest.fixture(scope="session")
+def dats_schemas():
+    """
+    The directory of the DATS schemas, the tests validating their output are skipped without it
+    """
+    if not os.path.isdir(DATS_SCHEMAS):
+        pytest.skip("no DATS schemas in %s" % DATS_SCHEMAS)
+    return DATS_SCHEMAS
+
+
+@pytest.fixture
+def context_mapping(tmp_path):
+    """
+    A dats_context_mapping.json referring to the contexts by URL, which the converters do not fetch unless they
+    embed them
+    """
+    path = tmp_path / "dats_context_mapping.json"
+    base = "https://w3id.org/dats/context/sdo/"
+    path.write_text(json.dumps({"contexts": {
+        "dataset_schema.json": base + "dataset_sdo_context.jsonld",
+        "identifier_info_schema.json": base + "identifier_info_sdo_context.jsonld",
+        "organization_schema.json": base + "organization_sdo_context.jsonld",
+        "annotation_schema.json": base + "annotation_sdo_context.jsonld",
+        "category_values_pair_schema.json": base + "category_values_pair_sdo_context.jsonld",
+        "date_info_schema.json": base + "date_info_sdo_context.jsonld"}}))
+    return str(path)
@@ -0,0 +1,41 @@
+"""
+The converters exit with a non-zero status when an instance is invalid or an output cannot be written
+"""
+import json
+import shutil
+
+import pytest
+
+from conftest import IMI_INPUT
+
+
+@pytest.fixture
+def strict_schemas(dats_schemas, tmp_path):
+    """
+    A copy of the DATS schemas whose Dataset requires a property no project has
+    """
+    path = tmp_path / "schemas"
+    shutil.copytree(dats_schemas, str(path))
+    with open(str(path / "dataset_schema.json"), encoding="utf-8") as f:
+        schema = json.load(f)
+    schema["required"] = schema.get("required", []) + ["noSuchProperty"]
+    with open(str(path / "dataset_schema.json"), "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", [[], ["--streaming"], ["--sharded"]])
+def test_valid_catalogue(converter, dats_schemas, tmp_path, mode):
+    assert converter.main(["--input", IMI_INPUT, "--output-dir", str(tmp_path)] + mode) == 0
+
+
+@pytest.mark.parametrize("mode", [[], ["--streaming"], ["--sharded"]])
+def test_invalid_catalogue(converter, strict_schemas, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(converter, "DATS_schemasPath", strict_schemas)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    assert converter.main(["--input", IMI_INPUT, "--output-dir", str(output_dir)] + mode) == 1
+
+
+def test_unwritable_output(converter, tmp_path):
+    assert converter.main(["--input", IMI_INPUT, "--output-dir", str(tmp_path / "missing"), "--no-validation"]) == 1
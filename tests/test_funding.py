@@ -0,0 +1,28 @@
+"""
+The funding of a project is acknowledged as a DATS Grant, with its amounts as numbers
+"""
+import json
+
+from conftest import IMI_INPUT
+
+
+def test_grant(converter, tmp_path):
+    assert converter.main(["--input", IMI_INPUT, "--output-dir", str(tmp_path), "--no-validation"]) == 0
+    with open(str(tmp_path / "IMI_datacatalogue_as_DATS.json"), encoding="utf-8") as f:
+        projects = {project["identifier"]["identifier"]: project for project in json.load(f)["hasPart"]}
+
+    grant, = projects["IMI-Cat#115303"]["acknowledges"]
+    assert grant["@type"] == "Grant"
+    assert grant["identifier"]["identifier"] == "115303"
+    assert [funder["name"] for funder in grant["funders"]] == ["IMI"]
+    amounts = {pair["category"]: pair["values"] for pair in grant["extraProperties"]}
+    assert amounts["IMI funding"] == [18170217]
+
+    funding = {category for _, category, _ in converter.FUNDING_COLUMNS}
+    for project in projects.values():
+        for pair in project["extraProperties"][0]:
+            assert pair["category"] not in funding
+        for grant in project["acknowledges"]:
+            for pair in grant["extraProperties"]:
+                assert pair["category"] in funding
+                assert all(isinstance(value, int) for value in pair["values"])
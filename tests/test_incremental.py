@@ -0,0 +1,58 @@
+"""
+An incremental conversion gives the same files as a conversion from scratch of the same sheet
+"""
+import json
+import os
+
+import pandas as pd
+
+from conftest import IMI_INPUT
+
+
+def convert(converter, input_path, output_dir, mode):
+    argv = ["--input", input_path, "--output-dir", str(output_dir), "--no-validation", mode]
+    assert converter.main(argv) == 0
+
+
+def output_files(output_dir):
+    """
+    The content of the files of a sharded output, the identifier of the catalogue (a random uuid) masked
+    """
+    files = {}
+    for directory, _, names in os.walk(str(output_dir)):
+        for name in names:
+            if name == ".imi_incremental_state.json":
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, str(output_dir))] = f.read()
+    index = json.loads(files["IMI_datacatalogue_as_DATS.json"])
+    index["identifier"]["identifier"] = None
+    files["IMI_datacatalogue_as_DATS.json"] = index
+    return files
+
+
+def test_incremental_equals_from_scratch(converter, tmp_path):
+    df = pd.read_csv(IMI_INPUT)
+    # the only rows naming "Firalis SAS" without its location, which the organization was named after
+    dropped = df.index[df["Partners"].fillna("").str.split(":").map(lambda names: "Firalis SAS" in names)]
+    assert len(dropped) == 2
+    edited = df.drop(dropped)
+    edited.loc[3, "Keywords"] = "a new keyword:" + str(edited.loc[3, "Keywords"])
+    edited.loc[20, "SMEs"] = str(edited.loc[20, "SMEs"]) + ":A New SME AS, Oslo, Norway"
+    edited_input = str(tmp_path / "edited.csv")
+    edited.to_csv(edited_input, index=False)
+
+    incremental = tmp_path / "incremental"
+    from_scratch = tmp_path / "from_scratch"
+    incremental.mkdir()
+    from_scratch.mkdir()
+    convert(converter, IMI_INPUT, incremental, "--incremental")
+    convert(converter, edited_input, incremental, "--incremental")
+    convert(converter, edited_input, from_scratch, "--sharded")
+
+    files = output_files(incremental)
+    assert sorted(files) == sorted(output_files(from_scratch))
+    for name, content in output_files(from_scratch).items():
+        assert files[name] == content, name
+    assert b"A New SME AS" in files["organizations.json"]
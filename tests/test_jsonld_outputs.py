@@ -0,0 +1,28 @@
+"""
+The JSON-LD written next to the catalogue holds every project, whatever the format of the catalogue
+"""
+import json
+
+import pytest
+
+from conftest import IMI_INPUT
+from dats_formats import FORMATS, catalogue_filename, iter_catalogue
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+@pytest.mark.parametrize("references", [False, True])
+def test_jsonld_has_every_project(converter, context_mapping, tmp_path, output_format, references):
+    if output_format == "msgpack":
+        pytest.importorskip("msgpack")
+    argv = ["--input", IMI_INPUT, "--output-dir", str(tmp_path), "--format", output_format, "--jsonld",
+            "--context-mapping", context_mapping, "--no-validation"]
+    if references:
+        argv.append("--jsonld-references")
+    assert converter.main(argv) == 0
+
+    _, parts = iter_catalogue(str(tmp_path / catalogue_filename("IMI_datacatalogue_as_DATS", output_format)))
+    projects = sum(1 for _ in parts)
+    with open(str(tmp_path / "IMI_datacatalogue_as_DATS.jsonld"), encoding="utf-8") as f:
+        jsonld = json.load(f)
+    assert projects > 0
+    assert len(jsonld["hasPart"]) == projects
@@ -0,0 +1,57 @@
+"""
+The organizations of the catalogue depend on the names of the sheet, not on the order of its rows, and the projects
+keep the names of the sheet
+"""
+import doctest
+import json
+
+import pandas as pd
+
+import dats_organizations
+from conftest import IMI_INPUT
+
+
+def test_doctest():
+    assert doctest.testmod(dats_organizations).failed == 0
+
+
+def convert(converter, input_path, output_dir):
+    assert converter.main(["--input", input_path, "--output-dir", str(output_dir), "--no-validation"]) == 0
+    with open(str(output_dir / "organizations.json"), encoding="utf-8") as f:
+        organizations = json.load(f)
+    with open(str(output_dir / "IMI_datacatalogue_as_DATS.json"), encoding="utf-8") as f:
+        catalogue = json.load(f)
+    return organizations, catalogue
+
+
+def project_organizations(catalogue):
+    return {project["identifier"]["identifier"]:
+            sorted((organization["name"], organization["identifier"]["identifier"])
+                   for organization in project["creators"][0])
+            for project in catalogue["hasPart"]}
+
+
+def test_row_order(converter, tmp_path):
+    df = pd.read_csv(IMI_INPUT)
+    reversed_input = str(tmp_path / "reversed.csv")
+    df.iloc[::-1].to_csv(reversed_input, index=False)
+    (tmp_path / "in_order").mkdir()
+    (tmp_path / "reversed").mkdir()
+
+    organizations, catalogue = convert(converter, IMI_INPUT, tmp_path / "in_order")
+    reversed_organizations, reversed_catalogue = convert(converter, reversed_input, tmp_path / "reversed")
+
+    assert organizations == reversed_organizations
+    assert project_organizations(catalogue) == project_organizations(reversed_catalogue)
+
+
+def test_sheet_names(converter, tmp_path):
+    organizations, catalogue = convert(converter, IMI_INPUT, tmp_path)
+    names = {name for entry in organizations["organizations"].values() for name in entry["aliases"]}
+    linked = project_organizations(catalogue)
+    assert {name for project in linked.values() for name, _ in project} == names
+    # one organization, under both the names of the sheet
+    leiden = organizations["names"]["academisch ziekenhuis leiden"]
+    entries = {entry for project in linked.values() for entry in project}
+    assert ("Academisch Ziekenhuis Leiden", leiden) in entries
+    assert ("Academisch Ziekenhuis Leiden, Leiden, Netherlands", leiden) in entries
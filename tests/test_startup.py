@@ -0,0 +1,24 @@
+"""
+Loading a converter script stays within the start-up budget of benchmarks/bench_startup.py, without loading any of
+the modules only some code paths need
+"""
+import os
+import statistics
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_startup import HEAVY_MODULES, SCRIPTS, import_time  # noqa: E402
+
+BUDGET_SECONDS = 0.1
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+def test_import_budget(script):
+    imports = [import_time(script) for _ in range(3)]
+    assert imports[0][1] == [], "%s imports %s, out of %s" % (script, imports[0][1], HEAVY_MODULES)
+    assert statistics.median(seconds for seconds, _ in imports) <= BUDGET_SECONDS
@@ -0,0 +1,66 @@
+"""
+--streaming writes the catalogue the in-memory conversion writes, in memory which does not grow with the sheet
+"""
+import json
+import tracemalloc
+
+from conftest import IMI_INPUT
+
+# the streamed conversion of the sheet repeated SCALE times may allocate at most GROWTH more at its peak than the
+# one of the sheet itself
+SCALE = 4
+GROWTH = 0.5
+CHUNKSIZE = 28
+
+
+def read_catalogue(path):
+    """
+    The catalogue written to path, its random identifier masked
+    """
+    with open(str(path), encoding="utf-8") as f:
+        catalogue = json.load(f)
+    catalogue["identifier"]["identifier"] = None
+    return catalogue
+
+
+def repeat_rows(input_path, scale, output_path):
+    with open(input_path, encoding="utf-8") as f:
+        header = f.readline()
+        rows = f.read().rstrip("\n") + "\n"
+    with open(str(output_path), "w", encoding="utf-8") as f:
+        f.write(header + rows * scale)
+
+
+def test_streamed_equals_in_memory(converter, tmp_path):
+    (tmp_path / "in_memory").mkdir()
+    (tmp_path / "streamed").mkdir()
+    argv = ["--input", IMI_INPUT, "--no-validation"]
+    assert converter.main(argv + ["--output-dir", str(tmp_path / "in_memory")]) == 0
+    assert converter.main(argv + ["--output-dir", str(tmp_path / "streamed"), "--streaming",
+                                  "--chunksize", str(CHUNKSIZE)]) == 0
+
+    in_memory = read_catalogue(tmp_path / "in_memory" / "IMI_datacatalogue_as_DATS.json")
+    assert len(in_memory["hasPart"]) > CHUNKSIZE
+    assert read_catalogue(tmp_path / "streamed" / "IMI_datacatalogue_as_DATS.json") == in_memory
+    organizations = "organizations.json"
+    assert (tmp_path / "streamed" / organizations).read_bytes() == (tmp_path / "in_memory" / organizations).read_bytes()
+
+
+def test_streamed_peak_memory(converter, dats_schemas, tmp_path):
+    scaled_input = tmp_path / "scaled.csv"
+    repeat_rows(IMI_INPUT, SCALE, scaled_input)
+
+    def peak(input_path):
+        argv = ["--input", str(input_path), "--output-dir", str(tmp_path), "--streaming", "--chunksize",
+                str(CHUNKSIZE)]
+        tracemalloc.start()
+        try:
+            assert converter.main(argv) == 0
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # validation included, once untraced for the imports and the caches filled by a first conversion
+    converter.main(["--input", IMI_INPUT, "--output-dir", str(tmp_path), "--streaming"])
+    small, large = peak(IMI_INPUT), peak(scaled_input)
+    assert large <= small * (1 + GROWTH), "peak grew from %d to %d bytes" % (small, large)